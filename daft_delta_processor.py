@@ -1,12 +1,19 @@
-import json
 import os
-import time
 from datetime import datetime, timezone
 from typing import Dict, Any, List
 import pyodbc
-import daft
 from daft.io import IOConfig, AzureConfig
 from azure.storage.blob import BlobServiceClient
+from telemetry_metrics import calculate_metrics
+from telemetry_quality import TelemetryValidator, QuarantineWriter, DEFAULT_QUARANTINE_THRESHOLD, quarantine_rows
+from telemetry_pipeline import TelemetryPipeline, PipelineStage
+from telemetry_spool import TelemetrySpool
+from telemetry_schemas import ROLLUP_TABLES, CURRENT_STATE_TABLE, ALERTS_TABLE, QUARANTINE_TABLE, build_table
+from telemetry_storage import get_profile, write_delta_table, merge_delta_table
+from telemetry_current_state import CurrentStateTracker
+from telemetry_anomalies import AnomalyDetector
+from telemetry_rollups import ROLLUP_KEY, RollupAggregator
+import telemetry_json
 
 STORAGE_CONNECTION = "DefaultEndpointsProtocol=https;EndpointSuffix=core.windows.net;AccountName=windfarm6storage;AccountKey=X7YVa9h/iiKRdw0sYlgaUkb8RFi3U+FRnKR/86DkYxiT8WB4KVPOeBxvGdp0yHDYRMAVVa1FpyIF+AStPVbVPQ==;BlobEndpoint=https://windfarm6storage.blob.core.windows.net/;FileEndpoint=https://windfarm6storage.file.core.windows.net/;QueueEndpoint=https://windfarm6storage.queue.core.windows.net/;TableEndpoint=https://windfarm6storage.table.core.windows.net/"
 
@@ -16,11 +23,13 @@ STORAGE_ACCOUNT_NAME = "windfarm6storage"
 STORAGE_ACCOUNT_KEY = "X7YVa9h/iiKRdw0sYlgaUkb8RFi3U+FRnKR/86DkYxiT8WB4KVPOeBxvGdp0yHDYRMAVVa1FpyIF+AStPVbVPQ=="
 CONTAINER_NAME = "telemetry-data"
 DELTA_TABLE_PATH = "delta-lake-turbine-telemetry"
+QUARANTINE_TABLE_PATH = QUARANTINE_TABLE
+SPOOL_DIR = f"telemetry_spool/{DELTA_TABLE_PATH}"
 
 class FixedTelemetryDeltaProcessor:
     """Процесор з правильним Daft API"""
     
-    def __init__(self):
+    def __init__(self, storage_profile=None):
         
         # Azure Storage
         self.blob_service = BlobServiceClient.from_connection_string(STORAGE_CONNECTION)
@@ -34,6 +43,24 @@ class FixedTelemetryDeltaProcessor:
             )
         )
         
+        # Доступ deltalake до сховища; Parquet пишеться за профілем зберігання таблиці
+        self.storage_options = {'account_name': STORAGE_ACCOUNT_NAME, 'account_key': STORAGE_ACCOUNT_KEY}
+        self.storage_profile = get_profile(storage_profile, DELTA_TABLE_PATH)
+        
+        # Перевірка якості пакетами; відбраковані записи пишуться у карантин у фоні
+        self.validator = TelemetryValidator()
+        self.quarantine = QuarantineWriter(self._write_quarantine_batch)
+        
+        # Локальний спул: записи не губляться під час збоїв сховища
+        self.spool = TelemetrySpool(SPOOL_DIR, self._replay_spooled)
+        
+        # Агрегати по турбінах (1 хв / 10 хв / 1 год) пишуться у таблиці rollup, коли вікно закривається
+        self.rollups = RollupAggregator(self._write_rollup_rows, state_path="telemetry_spool/rollups/rollup_state.json")
+        # Компактна таблиця останнього стану турбін, оновлюється пакетним MERGE
+        self.current_state = CurrentStateTracker(self._merge_current_state)
+        # Детектор аномалій; контрольна точка стану поруч зі спулом
+        self.anomalies = AnomalyDetector(self._write_alerts, checkpoint_path=f"telemetry_spool/{ALERTS_TABLE}/anomaly_state.npz")
+        
         print(" Processor ініціалізовано")
     
     def ensure_container_exists(self):
@@ -92,7 +119,7 @@ class FixedTelemetryDeltaProcessor:
         finally:
             conn.close()
     
-    def enrich_telemetry_data(self, telemetry_data: Dict[str, Any]) -> Dict[str, Any]:
+    def enrich_telemetry_data(self, telemetry_data: Dict[str, Any], quality_score: float = 1.0, quality_flags: int = 0) -> Dict[str, Any]:
         """Збагачення телеметрії"""
         turbine_id = telemetry_data.get('turbine_id')
         print(f" Збагачення для {turbine_id}")
@@ -112,7 +139,9 @@ class FixedTelemetryDeltaProcessor:
                 'enrichment_version': '2.1_Fixed_Daft',
                 'source': 'Azure SQL Database WindFarmDB',
                 'processed_by': 'Fixed Daft Delta Processor',
-                'sql_metadata_loaded': len(turbine_metadata) > 0
+                'sql_metadata_loaded': len(turbine_metadata) > 0,
+                'data_quality_score': quality_score,
+                'quality_flags': quality_flags
             }
         }
         
@@ -121,65 +150,79 @@ class FixedTelemetryDeltaProcessor:
     
     def _calculate_metrics(self, telemetry_data: Dict[str, Any], turbine_metadata: Dict[str, Any]) -> Dict[str, Any]:
         """Розрахунок метрик"""
-        metrics = {}
-        
         try:
-            if 'output_power' in telemetry_data and 'nominal_power_kw' in turbine_metadata:
-                output_power = float(telemetry_data['output_power'])
-                nominal_power = float(turbine_metadata['nominal_power_kw'])
-                metrics['efficiency_percent'] = round((output_power / nominal_power) * 100, 2) if nominal_power > 0 else 0
-
-            if 'output_power' in telemetry_data:
-                power = float(telemetry_data['output_power'])
-                if power > 100:
-                    metrics['operational_status'] = 'generating'
-                elif power > 0:
-                    metrics['operational_status'] = 'low_generation'
-                else:
-                    metrics['operational_status'] = 'stopped'
-            
-            if all(field in telemetry_data for field in ['voltage', 'current', 'power_factor']):
-                voltage = float(telemetry_data['voltage'])
-                current = float(telemetry_data['current'])
-                power_factor = float(telemetry_data['power_factor'])
-                calculated_power = (voltage * current * power_factor * 1.732) / 1000
-                metrics['calculated_power_kw'] = round(calculated_power, 2)
-        
+            return calculate_metrics(telemetry_data, turbine_metadata.get('nominal_power_kw'), variant='three_phase')
         except (ValueError, TypeError, ZeroDivisionError) as e:
             print(f" Помилка розрахунку: {e}")
-        
-        return metrics
+            return {}
+    
+    def _write_delta_records(self, records: List[Dict[str, Any]]):
+        """Запис пакету плоских записів у Delta Lake одним комітом"""
+        delta_path = f"az://{CONTAINER_NAME}/{DELTA_TABLE_PATH}"
+        # Пакет будується за схемою з реєстру: без виведення типів і злиття схем при коміті
+        write_delta_table(delta_path, build_table(DELTA_TABLE_PATH, records), self.storage_options, self.storage_profile)
+    
+    def _write_rollup_rows(self, window: str, rows: List[Dict[str, Any]]):
+        """Upsert закритих вікон агрегатів: повторний запис вікна замінює рядок"""
+        table_path = ROLLUP_TABLES[window]
+        merge_delta_table(f"az://{CONTAINER_NAME}/{table_path}", build_table(table_path, rows), key=ROLLUP_KEY,
+                          storage_options=self.storage_options)
+        print(f" Агрегати {window}: {len(rows)} вікон -> {table_path}")
+    
+    def _merge_current_state(self, rows: List[Dict[str, Any]]):
+        """MERGE змінених станів турбін у turbine_current_state"""
+        merge_delta_table(f"az://{CONTAINER_NAME}/{CURRENT_STATE_TABLE}", build_table(CURRENT_STATE_TABLE, rows),
+                          key='turbine_id', order_by='timestamp', storage_options=self.storage_options)
+        print(f" Поточний стан: оновлено {len(rows)} турбін")
+    
+    def _write_alerts(self, alerts: List[Dict[str, Any]]):
+        """Запис сповіщень детектора аномалій"""
+        write_delta_table(f"az://{CONTAINER_NAME}/{ALERTS_TABLE}", build_table(ALERTS_TABLE, alerts), self.storage_options)
+        for alert in alerts:
+            print(f" Аномалія {alert['turbine_id']}: {alert['metric']} ({alert['kind']}, оцінка {alert['score']:.1f})")
+    
+    def _upload_blob(self, blob_name: str, data: str):
+        blob_client = self.blob_service.get_blob_client(
+            container=CONTAINER_NAME,
+            blob=blob_name
+        )
+        blob_client.upload_blob(data, overwrite=True)
+    
+    def _replay_spooled(self, target: str, records: List[Dict[str, Any]]):
+        """Передача накопичених у спулі записів, коли сховище знову доступне"""
+        if target == 'delta':
+            self._write_delta_records(records)
+        elif target == 'blob':
+            for record in records:
+                self._upload_blob(record['blob_name'], record['data'])
     
     def save_to_delta_lake_fixed(self, enriched_data: Dict[str, Any]):
         """Збереження в Delta Lake через Daft"""
+        # Підготовка даних
+        flat_data = self._prepare_flat_data_fixed(enriched_data)
+        self.rollups.update([flat_data])
+        self.current_state.update([flat_data])
+        self.anomalies.process([flat_data])
+        
+        # Поки спул не спорожнів, нові записи йдуть за ним, щоб не чекати на недоступне сховище
+        if self.spool.has_pending():
+            self.spool.append('delta', flat_data)
+            print(f" Delta Lake: запис у спулі (очікують {self.spool.total_bytes} байт)")
+            return
+        
         try:
             print(" Збереження в Delta Lake ")
-            
-            # Підготовка даних
-            flat_data = self._prepare_flat_data_fixed(enriched_data)
-            
-            # Створення DataFrame
-            df = daft.from_pydict({
-                key: [value] for key, value in flat_data.items()
-            })
-            
-            # Шлях для Delta Lake
-            current_time = datetime.now(timezone.utc)
-            delta_path = f"az://{CONTAINER_NAME}/{DELTA_TABLE_PATH}"
-            
-            print(f" Збереження в: {delta_path}")
+            print(f" Збереження в: az://{CONTAINER_NAME}/{DELTA_TABLE_PATH}")
             
             # Збереження через Daft (правильний API)
-            df.write_deltalake(
-                delta_path,
-                io_config=self.io_config,
-                mode="append"
-            )
+            self._write_delta_records([flat_data])
             
             print(f" УСПІШНО збережено в Delta Lake!")
             
         except Exception as e:
             print(f" Помилка Delta Lake: {e}")
+            self.spool.append('delta', flat_data)
+            print(" Запис збережено у локальний спул для повторної передачі")
             self._save_json_backup(enriched_data)
     
     def _prepare_flat_data_fixed(self, enriched_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -226,7 +269,8 @@ class FixedTelemetryDeltaProcessor:
     
         enrichment_info = enriched_data.get('enrichment_info', {})
         flat_data.update({
-            'data_quality_score': 1.0, 
+            'data_quality_score': float(enrichment_info.get('data_quality_score', 1.0)),
+            'quality_flags': int(enrichment_info.get('quality_flags', 0)),
             'enrichment_version': str(enrichment_info.get('enrichment_version', '')),
             'sql_metadata_loaded': bool(enrichment_info.get('sql_metadata_loaded', False)),
         })
@@ -235,41 +279,89 @@ class FixedTelemetryDeltaProcessor:
     
     def _save_json_backup(self, enriched_data: Dict[str, Any]):
         """JSON backup"""
+        current_time = datetime.now(timezone.utc)
+        turbine_id = enriched_data.get('turbine_id', 'unknown')
+        
+        blob_name = f"enriched-telemetry-backup/year={current_time.year}/month={current_time.month:02d}/day={current_time.day:02d}/turbine={turbine_id}/enriched_{current_time.strftime('%H%M%S')}.json"
+        json_data = telemetry_json.dumps(enriched_data)
+        
         try:
-            current_time = datetime.now(timezone.utc)
-            turbine_id = enriched_data.get('turbine_id', 'unknown')
-            
-            blob_name = f"enriched-telemetry-backup/year={current_time.year}/month={current_time.month:02d}/day={current_time.day:02d}/turbine={turbine_id}/enriched_{current_time.strftime('%H%M%S')}.json"
-            
-            blob_client = self.blob_service.get_blob_client(
-                container=CONTAINER_NAME,
-                blob=blob_name
-            )
-            
-            json_data = json.dumps(enriched_data, ensure_ascii=False, indent=2)
-            blob_client.upload_blob(json_data, overwrite=True)
+            if self.spool.has_pending():
+                self.spool.append('blob', {'blob_name': blob_name, 'data': json_data})
+                print(f" JSON backup у спулі: {blob_name}")
+                return
             
+            self._upload_blob(blob_name, json_data)
             print(f" JSON backup: {blob_name}")
             
         except Exception as e:
             print(f" JSON backup помилка: {e}")
+            self.spool.append('blob', {'blob_name': blob_name, 'data': json_data})
+            print(" JSON backup збережено у локальний спул для повторної передачі")
+    
+    def _write_quarantine_batch(self, records: List[Dict[str, Any]]):
+        """Пакетний запис відбракованих записів у карантинну Delta таблицю"""
+        delta_path = f"az://{CONTAINER_NAME}/{QUARANTINE_TABLE_PATH}"
+        # Фіксована схема з реєстру: типи не залежать від того, які поля зіпсовані у пакеті
+        write_delta_table(delta_path, build_table(QUARANTINE_TABLE, quarantine_rows(records)), self.storage_options)
+        print(f" Карантин: {len(records)} записів -> {delta_path}")
     
     def process_telemetry_batch(self, telemetry_list: List[Dict[str, Any]]):
         """Обробка пакету"""
         print(f"\n Обробка пакету з {len(telemetry_list)} записів")
         
+        # Якість даних рахується одним проходом по всьому пакету
+        quality = self.validator.validate(telemetry_list)
+        
         for i, telemetry in enumerate(telemetry_list, 1):
             print(f"\n--- Запис {i}/{len(telemetry_list)} ---")
             
+            quality_score = float(quality['quality_score'][i - 1])
+            quality_flags = int(quality['violation_mask'][i - 1])
+            
+            if quality_score < DEFAULT_QUARANTINE_THRESHOLD:
+                print(f" Запис у карантин: якість {quality_score}")
+                self.quarantine.submit(telemetry, quality_flags, quality_score)
+                continue
+            
             # Збагачення
-            enriched_data = self.enrich_telemetry_data(telemetry)
+            enriched_data = self.enrich_telemetry_data(telemetry, quality_score, quality_flags)
             
             # Збереження в Delta Lake (виправлена версія)
             self.save_to_delta_lake_fixed(enriched_data)
-            
-            time.sleep(1)
         
         print(f"\n Пакет оброблено!")
+    
+    def _quality_stage(self, telemetry: Dict[str, Any]):
+        """Етап конвеєра: перевірка якості, відбраковані записи - у карантин"""
+        quality = self.validator.validate([telemetry])
+        quality_score = float(quality['quality_score'][0])
+        quality_flags = int(quality['violation_mask'][0])
+        
+        if quality_score < DEFAULT_QUARANTINE_THRESHOLD:
+            self.quarantine.submit(telemetry, quality_flags, quality_score)
+            return None
+        return telemetry, quality_score, quality_flags
+    
+    def build_pipeline(self, enrich_concurrency: int = 4, write_concurrency: int = 1,
+                       queue_size: int = 100, report_interval: float = None) -> TelemetryPipeline:
+        """Конвеєр: перевірка якості -> збагачення (SQL) -> запис у Delta Lake"""
+        return TelemetryPipeline([
+            PipelineStage('quality', self._quality_stage, queue_size=queue_size, run_in_thread=False),
+            PipelineStage('enrich', lambda item: self.enrich_telemetry_data(*item),
+                          concurrency=enrich_concurrency, queue_size=queue_size),
+            PipelineStage('write', self.save_to_delta_lake_fixed,
+                          concurrency=write_concurrency, queue_size=queue_size),
+        ], report_interval=report_interval)
+    
+    def process_telemetry_pipeline(self, telemetry_list: List[Dict[str, Any]], **pipeline_options):
+        """Обробка пакету через конвеєр: збагачення і запис перекриваються в часі"""
+        pipeline = self.build_pipeline(**pipeline_options)
+        stats = pipeline.run_sync(telemetry_list)
+        
+        print(f"\n Конвеєр завершено за {stats['elapsed_seconds']} с")
+        pipeline.print_gauges()
+        return stats
 
 def main():
     
@@ -300,6 +392,11 @@ def main():
     ]
     
     processor.process_telemetry_batch(test_telemetry)
+    processor.quarantine.close()
+    processor.rollups.close()
+    processor.current_state.close()
+    processor.anomalies.close()
+    processor.spool.close()
     
     print(" ДЕМОНСТРАЦІЯ ЗАВЕРШЕНА!")
 
@@ -0,0 +1,296 @@
+"""
+Векторизований симулятор парку турбін: стан усіх турбін у масивах NumPy, розклад через timer wheel
+"""
+
+import argparse
+import asyncio
+import inspect
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Callable, Iterator, Optional, Tuple
+
+import numpy as np
+
+import telemetry_json
+from telemetry_transports import create_transport
+from turbine_simulator import SENSOR_RANGES, MAX_VARIATION, TELEMETRY_MIN_INTERVAL, TELEMETRY_MAX_INTERVAL
+
+PARAMETERS = tuple(SENSOR_RANGES)
+PARAM_INDEX = {param: i for i, param in enumerate(PARAMETERS)}
+
+# Округлення як у TurbineSimulator.generate_telemetry_data
+ROUNDING = {
+    'output_power': 1,
+    'rotor_rpm': 2,
+    'max_power_limit': 1,
+    'voltage': 0,
+    'current': 1,
+    'power_factor': 3,
+}
+
+
+class TimerWheel:
+    """Однорівневе колесо таймерів: слот на кожен тік, інтервали коротші за оберт колеса"""
+
+    def __init__(self, slots: int = 64):
+        self.slots = slots
+        self.current_tick = 0
+        self._wheel: List[List[np.ndarray]] = [[] for _ in range(slots)]
+
+    def schedule(self, turbine_indexes: np.ndarray, delays: np.ndarray):
+        """Планування турбін через delays тіків (1 <= delay < slots)"""
+        if len(turbine_indexes) == 0:
+            return
+        if delays.max() >= self.slots:
+            raise ValueError(f"Інтервал {delays.max()} перевищує розмір колеса {self.slots}")
+        target_slots = (self.current_tick + delays) % self.slots
+        order = np.argsort(target_slots, kind='stable')
+        sorted_slots = target_slots[order]
+        boundaries = np.flatnonzero(np.diff(sorted_slots)) + 1
+        for group in np.split(order, boundaries):
+            self._wheel[target_slots[group[0]]].append(turbine_indexes[group])
+
+    def advance(self) -> np.ndarray:
+        """Перехід до наступного тіку; повертає турбіни, час яких настав"""
+        self.current_tick += 1
+        slot = self._wheel[self.current_tick % self.slots]
+        if not slot:
+            return np.empty(0, dtype=np.int64)
+        due = np.concatenate(slot)
+        slot.clear()
+        return due
+
+
+class SimulationClock:
+    """
+    Годинник симуляції: тік - одна віртуальна секунда від start.
+
+    speedup=1.0 - реальний час, speedup=60 - хвилина даних за секунду,
+    speedup=None - без обмеження, наступний тік одразу після прийому пакету приймачем.
+    """
+
+    def __init__(self, start: datetime = None, speedup: Optional[float] = 1.0):
+        if speedup is not None and speedup <= 0:
+            raise ValueError("speedup має бути додатним або None")
+        self.start = start or datetime.utcnow()
+        self.speedup = speedup
+        self._real_start: Optional[float] = None
+        self._origin_tick = 0
+
+    def begin(self, tick: int):
+        """Прив'язка тіку до поточного реального часу"""
+        self._real_start = time.monotonic()
+        self._origin_tick = tick
+
+    def now(self, tick: int) -> datetime:
+        return self.start + timedelta(seconds=tick)
+
+    def timestamp(self, tick: int) -> str:
+        return self.now(tick).isoformat() + 'Z'
+
+    async def wait(self, tick: int):
+        """Очікування реального моменту, що відповідає наступному тіку"""
+        if self.speedup is None:
+            # Лише віддаємо керування event loop (асинхронні приймачі, Ctrl+C)
+            await asyncio.sleep(0)
+            return
+        target = self._real_start + (tick + 1 - self._origin_tick) / self.speedup
+        await asyncio.sleep(max(0.0, target - time.monotonic()))
+
+
+class FleetSimulator:
+    """Симуляція тисяч турбін в одному процесі"""
+
+    def __init__(self, fleet_size: int, min_interval: int = TELEMETRY_MIN_INTERVAL,
+                 max_interval: int = TELEMETRY_MAX_INTERVAL, seed: Optional[int] = None,
+                 turbine_ids: List[str] = None):
+        self.fleet_size = fleet_size
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.rng = np.random.default_rng(seed)
+        self.turbine_ids = np.array(turbine_ids or [f"TURBINE_{str(i + 1).zfill(3)}" for i in range(fleet_size)], dtype=object)
+
+        self.min_values = np.array([SENSOR_RANGES[p]['min'] for p in PARAMETERS], dtype=np.float64)
+        self.max_values = np.array([SENSOR_RANGES[p]['max'] for p in PARAMETERS], dtype=np.float64)
+        self.decimals = [ROUNDING[p] for p in PARAMETERS]
+
+        self.values = self._initialize_values()
+        self.wheel = TimerWheel(slots=max_interval + 1)
+        # Перші повідомлення розподіляються по всьому інтервалу, щоб не було сплеску на старті
+        self.wheel.schedule(np.arange(fleet_size), self.rng.integers(1, max_interval + 1, fleet_size))
+
+        self.messages_generated = 0
+
+    def _initialize_values(self) -> np.ndarray:
+        """Початкові значення близько до типових (±20%), як у TurbineSimulator._initialize_values"""
+        typical = np.array([SENSOR_RANGES[p]['typical'] for p in PARAMETERS], dtype=np.float64)
+        initial = self.rng.uniform(typical * 0.8, typical * 1.2, size=(self.fleet_size, len(PARAMETERS)))
+        return np.clip(initial, self.min_values, self.max_values)
+
+    def step(self, turbine_indexes: np.ndarray) -> np.ndarray:
+        """Один крок випадкового блукання (±10%) для вибраних турбін; повертає нові значення"""
+        previous = self.values[turbine_indexes]
+        variation = previous * MAX_VARIATION
+        low = np.maximum(self.min_values, previous - variation)
+        high = np.minimum(self.max_values, previous + variation)
+        # Як random.uniform: межі можуть перехреститися, коли max_power_limit вийшов за діапазон
+        values = low + (high - low) * self.rng.random(previous.shape)
+
+        for column, decimals in enumerate(self.decimals):
+            values[:, column] = np.round(values[:, column], decimals)
+
+        self._calculate_derived_parameters(values)
+        self.values[turbine_indexes] = values
+        return values
+
+    def _calculate_derived_parameters(self, values: np.ndarray):
+        """Векторизований аналог TurbineSimulator._calculate_derived_parameters"""
+        power = values[:, PARAM_INDEX['output_power']]
+        voltage = values[:, PARAM_INDEX['voltage']]
+        power_factor = values[:, PARAM_INDEX['power_factor']]
+        current = values[:, PARAM_INDEX['current']]
+        max_power_limit = values[:, PARAM_INDEX['max_power_limit']]
+
+        # P = U * I * cos(φ) * √3 (для 3-фазної системи); розрахований струм змішується з генерованим
+        active = (power > 0) & (voltage > 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            calculated_current = (power * 1000) / (voltage * power_factor * 1.732)
+        current[active] = np.round((current[active] + calculated_current[active]) / 2, 1)
+
+        # max_power_limit має бути більшим за поточну потужність
+        below = max_power_limit < power
+        if below.any():
+            max_power_limit[below] = np.round(power[below] * self.rng.uniform(1.1, 1.3, below.sum()), 1)
+
+    def tick(self) -> np.ndarray:
+        """Один тік (секунда): турбіни, яким час надсилати, отримують нові значення і новий інтервал"""
+        due = self.wheel.advance()
+        if len(due):
+            self.step(due)
+            self.wheel.schedule(due, self.rng.integers(self.min_interval, self.max_interval + 1, len(due)))
+        return due
+
+    def build_messages(self, turbine_indexes: np.ndarray, timestamp: str) -> List[Dict[str, Any]]:
+        """Повідомлення у форматі TurbineSimulator.generate_telemetry_data"""
+        rows = self.values[turbine_indexes].tolist()
+        ids = self.turbine_ids[turbine_indexes].tolist()
+        messages = [
+            {'turbine_id': turbine_id, 'timestamp': timestamp, **dict(zip(PARAMETERS, row))}
+            for turbine_id, row in zip(ids, rows)
+        ]
+        self.messages_generated += len(messages)
+        return messages
+
+    def generate(self, duration: float, clock: SimulationClock = None) -> Iterator[Tuple[datetime, List[Dict[str, Any]]]]:
+        """Синхронна генерація duration віртуальних секунд без очікування (для наборів даних)"""
+        clock = clock or SimulationClock(speedup=None)
+        end_tick = self.wheel.current_tick + int(duration)
+        while self.wheel.current_tick < end_tick:
+            due = self.tick()
+            if len(due):
+                yield clock.now(self.wheel.current_tick), self.build_messages(due, clock.timestamp(self.wheel.current_tick))
+
+    async def run(self, sink: Callable[[List[Dict[str, Any]]], Any], duration: Optional[float] = None,
+                  clock: SimulationClock = None):
+        """Кожний тік відправляє у sink повідомлення турбін, час яких настав; duration - у віртуальних секундах"""
+        clock = clock or SimulationClock()
+        start_tick = self.wheel.current_tick
+        clock.begin(start_tick)
+        while duration is None or self.wheel.current_tick - start_tick < duration:
+            due = self.tick()
+            if len(due):
+                messages = self.build_messages(due, clock.timestamp(self.wheel.current_tick))
+                result = sink(messages)
+                if inspect.isawaitable(result):
+                    await result
+            await clock.wait(self.wheel.current_tick)
+
+
+class JsonLinesSink:
+    """Локальний приймач: повідомлення у файл JSON Lines"""
+
+    def __init__(self, path: str):
+        self.file = open(path, 'a', encoding='utf-8')
+        self.messages = 0
+
+    def __call__(self, messages: List[Dict[str, Any]]):
+        self.file.write(''.join(telemetry_json.dumps(message, pretty=False) + '\n' for message in messages))
+        self.file.flush()
+        self.messages += len(messages)
+
+    def close(self):
+        self.file.close()
+
+
+class CountingSink:
+    """Приймач, що лише рахує повідомлення (для вимірювання швидкості генерації)"""
+
+    def __init__(self):
+        self.messages = 0
+
+    def __call__(self, messages: List[Dict[str, Any]]):
+        self.messages += len(messages)
+
+
+async def run_with_transport(fleet: FleetSimulator, transport, duration: Optional[float] = None,
+                             clock: SimulationClock = None):
+    """Симуляція з відправкою кожного тіку одним пакетом через пул з'єднань транспорту"""
+    await transport.connect()
+    try:
+        await fleet.run(transport, duration, clock)
+    finally:
+        await transport.disconnect()
+
+
+def benchmark_fleet(fleet_size: int = 50_000, ticks: int = 600):
+    """Швидкість генерації без очікування реального часу"""
+    fleet = FleetSimulator(fleet_size, seed=0)
+    sink = CountingSink()
+    start = time.perf_counter()
+    for _, messages in fleet.generate(ticks):
+        sink(messages)
+    elapsed = time.perf_counter() - start
+    print(f" Турбін: {fleet_size}, тіків: {ticks}, повідомлень: {sink.messages}")
+    print(f"   {elapsed:.2f} с, {sink.messages / elapsed:,.0f} повідомлень/с, {ticks / elapsed:,.0f} тіків/с")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Векторизований симулятор парку турбін")
+    parser.add_argument('--turbines', type=int, default=10_000)
+    parser.add_argument('--duration', type=float, default=None, help="віртуальних секунд; без значення - до Ctrl+C")
+    parser.add_argument('--speedup', type=float, default=1.0, help="прискорення віртуального часу")
+    parser.add_argument('--unthrottled', action='store_true', help="генерація так швидко, як приймає sink")
+    parser.add_argument('--start', default=None, help="початок віртуального часу (ISO 8601)")
+    parser.add_argument('--output', default='fleet_telemetry.jsonl')
+    parser.add_argument('--transport', default=None,
+                        help="замість --output: file:шлях, socket:хост:порт, mqtt:хост:порт[/топік], iothub:all_connections.json")
+    parser.add_argument('--pool-size', type=int, default=2, help="кількість з'єднань транспорту")
+    parser.add_argument('--encoding', choices=['json', 'msgpack', 'arrow'], default='json', help="формат тіла для --transport")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    fleet = FleetSimulator(args.turbines, seed=args.seed)
+    clock = SimulationClock(
+        start=datetime.fromisoformat(args.start.replace('Z', '')) if args.start else None,
+        speedup=None if args.unthrottled else args.speedup
+    )
+    speed = "без обмеження" if clock.speedup is None else f"x{clock.speedup:g}"
+    print(f" Симуляція {args.turbines} турбін -> {args.transport or args.output} (від {clock.start.isoformat()}Z, {speed})")
+
+    try:
+        if args.transport:
+            asyncio.run(run_with_transport(fleet, create_transport(args.transport, args.pool_size, args.encoding), args.duration, clock))
+        else:
+            sink = JsonLinesSink(args.output)
+            try:
+                asyncio.run(fleet.run(sink, args.duration, clock))
+            finally:
+                sink.close()
+    except KeyboardInterrupt:
+        print("\n Зупинка симуляції...")
+    finally:
+        print(f" Згенеровано повідомлень: {fleet.messages_generated}")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -50,18 +50,19 @@ SENSOR_RANGES = {
 # Назви турбін
 TURBINE_IDS = [f"TURBINE_{str(i+1).zfill(3)}" for i in range(DEVICE_COUNT)]
 
-def generate_realistic_telemetry(previous_values=None):
-    """Генерація телеметричних даних з 10% варіацією"""
+def generate_realistic_telemetry(previous_values=None, rng=None):
+    """Генерація телеметричних даних з 10% варіацією (rng - numpy Generator або random.Random для відтворюваності)"""
+    rng = rng or random
     
     if previous_values is None:
         # Початкові значення
         data = {
-            'output_power': random.uniform(800, 1600),
-            'rotor_rpm': random.uniform(8, 25),
-            'max_power_limit': random.uniform(1400, 1700),
-            'voltage': random.uniform(400, 650),
-            'current': random.uniform(1000, 2500),
-            'power_factor': random.uniform(0.85, 0.92)
+            'output_power': rng.uniform(800, 1600),
+            'rotor_rpm': rng.uniform(8, 25),
+            'max_power_limit': rng.uniform(1400, 1700),
+            'voltage': rng.uniform(400, 650),
+            'current': rng.uniform(1000, 2500),
+            'power_factor': rng.uniform(0.85, 0.92)
         }
     else:
         # Варіація не більше 10% від попередніх значень
@@ -71,7 +72,7 @@ def generate_realistic_telemetry(previous_values=None):
                 variation = prev_value * 0.1
                 min_val = max(SENSOR_RANGES[key]['min'], prev_value - variation)
                 max_val = min(SENSOR_RANGES[key]['max'], prev_value + variation)
-                data[key] = random.uniform(min_val, max_val)
+                data[key] = rng.uniform(min_val, max_val)
     
     # Розрахунок струму на основі потужності та напруги
     if data['output_power'] > 0 and data['voltage'] > 0:
@@ -0,0 +1,331 @@
+"""
+Генератор навантаження з відкритим циклом: заданий темп повідомлень і вимірювання затримки до запису
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from fleet_simulator import FleetSimulator, JsonLinesSink
+
+# Поля відправки, що проходять через збагачення до записаного рядка
+SEND_FIELDS = ('message_id', 'sent_at', 'sent_at_ns')
+
+
+class RateProfile:
+    """Профіль темпу: послідовність фаз (тривалість, початковий та кінцевий темп, повідомлень/с)"""
+
+    def __init__(self, phases: Sequence[Tuple[float, float, float]]):
+        if not phases:
+            raise ValueError("Профіль потребує хоча б однієї фази")
+        for duration, start_rate, end_rate in phases:
+            if duration <= 0 or start_rate < 0 or end_rate < 0:
+                raise ValueError(f"Некоректна фаза профілю: {duration}, {start_rate}, {end_rate}")
+        self.phases = list(phases)
+
+    @classmethod
+    def parse(cls, spec: str) -> 'RateProfile':
+        """Рядок 'темп:секунд' або 'від-до:секунд' через кому, напр. '500:30,500-5000:120,5000:60'"""
+        phases = []
+        for part in spec.split(','):
+            rates, duration = part.strip().split(':')
+            start_rate, _, end_rate = rates.partition('-')
+            phases.append((float(duration), float(start_rate), float(end_rate or start_rate)))
+        return cls(phases)
+
+    @property
+    def duration(self) -> float:
+        return sum(phase[0] for phase in self.phases)
+
+    def send_offsets(self) -> np.ndarray:
+        """
+        Заплановані моменти відправки (секунди від старту) для всіх повідомлень.
+
+        Для лінійної фази кількість повідомлень N(t) = r0*t + (r1 - r0)*t^2 / (2D);
+        момент n-го повідомлення - корінь N(t) = n.
+        """
+        offsets = []
+        phase_start = 0.0
+        sent_before = 0.0
+        for duration, start_rate, end_rate in self.phases:
+            total = (start_rate + end_rate) / 2 * duration
+            # Номери повідомлень, що припадають на фазу, відносно її початку
+            n = np.arange(np.ceil(sent_before), sent_before + total) - sent_before
+            slope = (end_rate - start_rate) / duration
+            if abs(slope) < 1e-12:
+                t = n / start_rate if start_rate else n
+            else:
+                t = (-start_rate + np.sqrt(start_rate ** 2 + 2 * slope * n)) / slope
+            offsets.append(phase_start + t)
+            sent_before += total
+            phase_start += duration
+        return np.concatenate(offsets)
+
+
+class LatencyHistogram:
+    """
+    Гістограма затримок у стилі HdrHistogram (мікросекунди).
+
+    Лог-лінійні кошики: 2 значущі цифри точності для будь-якого діапазону значень,
+    запис пакетом через numpy.
+    """
+
+    SUB_BUCKET_BITS = 8
+
+    def __init__(self, highest_us: int = 3_600_000_000):
+        self.sub_bucket_count = 1 << self.SUB_BUCKET_BITS
+        self.sub_bucket_half = self.sub_bucket_count >> 1
+        bucket_count = max(1, int(highest_us).bit_length() - self.SUB_BUCKET_BITS + 1)
+        self.highest_us = int(highest_us)
+        self.counts = np.zeros((bucket_count + 1) * self.sub_bucket_half, dtype=np.int64)
+        self.total = 0
+        self.min_us: Optional[int] = None
+        self.max_us = 0
+        self.sum_us = 0
+
+    def _index(self, values: np.ndarray) -> np.ndarray:
+        _, exponent = np.frexp(np.maximum(values, 1).astype(np.float64))
+        bucket = np.maximum(0, exponent - self.SUB_BUCKET_BITS)
+        return bucket * self.sub_bucket_half + (values >> bucket)
+
+    def _value_at(self, index: int) -> int:
+        """Найбільше значення, еквівалентне кошику (як highestEquivalentValue у HdrHistogram)"""
+        bucket = max(0, index // self.sub_bucket_half - 1)
+        sub_bucket = index - bucket * self.sub_bucket_half
+        return ((sub_bucket + 1) << bucket) - 1
+
+    def record(self, latencies_us: np.ndarray):
+        """Запис пакету затримок; значення поза діапазоном обмежуються highest_us"""
+        values = np.clip(np.asarray(latencies_us, dtype=np.int64), 0, self.highest_us)
+        if len(values) == 0:
+            return
+        self.counts += np.bincount(self._index(values), minlength=len(self.counts))[:len(self.counts)]
+        self.total += len(values)
+        self.sum_us += int(values.sum())
+        self.max_us = max(self.max_us, int(values.max()))
+        low = int(values.min())
+        self.min_us = low if self.min_us is None else min(self.min_us, low)
+
+    def merge(self, other: 'LatencyHistogram'):
+        self.counts += other.counts
+        self.total += other.total
+        self.sum_us += other.sum_us
+        self.max_us = max(self.max_us, other.max_us)
+        if other.min_us is not None:
+            self.min_us = other.min_us if self.min_us is None else min(self.min_us, other.min_us)
+
+    def percentile(self, percentile: float) -> int:
+        if self.total == 0:
+            return 0
+        target = max(1, int(np.ceil(percentile / 100.0 * self.total)))
+        index = int(np.searchsorted(np.cumsum(self.counts), target))
+        return min(self._value_at(index), self.max_us)
+
+    def summary(self) -> Dict[str, Any]:
+        """Основні перцентилі в мілісекундах"""
+        summary = {'count': self.total}
+        if self.total:
+            summary['min_ms'] = self.min_us / 1000
+            summary['mean_ms'] = round(self.sum_us / self.total / 1000, 3)
+            for percentile in (50, 90, 99, 99.9, 99.99):
+                summary[f"p{percentile:g}_ms"] = self.percentile(percentile) / 1000
+            summary['max_ms'] = self.max_us / 1000
+        return summary
+
+    def percentile_distribution(self, ticks_per_half: int = 5) -> List[Tuple[float, float, int]]:
+        """Розподіл (значення мс, перцентиль, кількість) з логарифмічним кроком як у .hgrm"""
+        rows = []
+        if self.total == 0:
+            return rows
+        percentile = 0.0
+        step = 100.0 / (2 * ticks_per_half)
+        while percentile < 100.0 - 1e-9:
+            value = self.percentile(percentile)
+            count = int(np.ceil(percentile / 100.0 * self.total))
+            rows.append((value / 1000, percentile / 100.0, count))
+            percentile += step
+            if (100.0 - percentile) < step * 2:
+                step /= 2
+            if step < 1e-4:
+                break
+        rows.append((self.max_us / 1000, 1.0, self.total))
+        return rows
+
+    def save(self, path: str):
+        """Збереження розподілу у текстовому форматі HdrHistogram (.hgrm)"""
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"{'Value':>12} {'Percentile':>14} {'TotalCount':>10} {'1/(1-Percentile)':>16}\n\n")
+            for value, percentile, count in self.percentile_distribution():
+                inverse = f"{1 / (1 - percentile):16.2f}" if percentile < 1.0 else f"{'inf':>16}"
+                f.write(f"{value:12.3f} {percentile:14.12f} {count:10d} {inverse}\n")
+            summary = self.summary()
+            f.write(f"#[Mean    = {summary.get('mean_ms', 0):12.3f}, Max = {summary.get('max_ms', 0):12.3f}]\n")
+            f.write(f"#[Total count = {self.total:12d}, Unit = ms]\n")
+
+
+class OpenLoopLoadGenerator:
+    """
+    Відкритий цикл: повідомлення відправляються за розкладом профілю незалежно від того,
+    чи встигає обробка. Затримка рахується від ЗАПЛАНОВАНОГО моменту відправки (sent_at),
+    тому черга перед обробкою входить у виміри (без coordinated omission).
+    """
+
+    def __init__(self, profile: RateProfile, fleet: FleetSimulator, enricher=None,
+                 output_dir: str = "delta_lake_output/loadtest", max_batch: int = 1000,
+                 report_interval: float = 5.0):
+        if enricher is None:
+            from telemetry_enrichment_demo import TelemetryEnricher
+            enricher = TelemetryEnricher()
+        self.profile = profile
+        self.fleet = fleet
+        self.enricher = enricher
+        self.output_dir = output_dir
+        self.max_batch = max_batch
+        self.report_interval = report_interval
+        os.makedirs(output_dir, exist_ok=True)
+
+        self.run_id = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+        self.sink = JsonLinesSink(os.path.join(output_dir, f"enriched_{self.run_id}.jsonl"))
+        # latency - від запланованої відправки; service - від фактичної (для порівняння)
+        self.latency = LatencyHistogram()
+        self.service = LatencyHistogram()
+
+        self._cursor = 0
+        self.sent = 0
+        self.written = 0
+        self.dropped = 0
+        self.max_queue_depth = 0
+
+    def _next_messages(self, planned_ns: np.ndarray) -> List[Dict[str, Any]]:
+        """Повідомлення симулятора для наступних турбін по колу з позначками відправки"""
+        count = len(planned_ns)
+        turbines = (self._cursor + np.arange(count)) % self.fleet.fleet_size
+        self._cursor = (self._cursor + count) % self.fleet.fleet_size
+        self.fleet.step(turbines)
+        timestamp = datetime.fromtimestamp(planned_ns[0] / 1e9, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+        messages = self.fleet.build_messages(turbines, timestamp)
+        for offset, (message, sent_ns) in enumerate(zip(messages, planned_ns.tolist())):
+            message['message_id'] = self.sent + offset
+            message['sent_at'] = datetime.fromtimestamp(sent_ns / 1e9, timezone.utc).isoformat()
+            message['sent_at_ns'] = sent_ns
+        self.sent += count
+        return messages
+
+    async def _produce(self, queue: asyncio.Queue, offsets: np.ndarray):
+        start_ns = time.time_ns()
+        start = time.perf_counter()
+        planned_ns = start_ns + (offsets * 1e9).astype(np.int64)
+        position = 0
+        while position < len(offsets):
+            elapsed = time.perf_counter() - start
+            due = int(np.searchsorted(offsets, elapsed, side='right'))
+            if due == position:
+                await asyncio.sleep(offsets[position] - elapsed)
+                continue
+            due = min(due, position + self.max_batch)
+            # Черга не обмежена: розклад відправки не чекає на обробку
+            queue.put_nowait((time.time_ns(), self._next_messages(planned_ns[position:due])))
+            self.max_queue_depth = max(self.max_queue_depth, queue.qsize())
+            position = due
+        await queue.put(None)
+
+    def _process(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        records = self.enricher.enrich_batch_flat(messages, passthrough=SEND_FIELDS)
+        if records:
+            self.sink(records)
+        return records
+
+    async def _consume(self, queue: asyncio.Queue):
+        finished = False
+        while not finished:
+            batches = [await queue.get()]
+            # Під навантаженням забираємо все накопичене одним пакетом
+            while not queue.empty() and sum(len(b[1]) for b in batches if b) < self.max_batch:
+                batches.append(queue.get_nowait())
+            finished = batches[-1] is None
+            batches = [batch for batch in batches if batch is not None]
+            if not batches:
+                continue
+
+            messages = [message for _, batch in batches for message in batch]
+            records = await asyncio.to_thread(self._process, messages)
+            done_ns = time.time_ns()
+
+            self.written += len(records)
+            self.dropped += len(messages) - len(records)
+            planned = np.fromiter((record['sent_at_ns'] for record in records), dtype=np.int64, count=len(records))
+            self.latency.record((done_ns - planned) // 1000)
+            for actual_ns, batch in batches:
+                self.service.record(np.full(len(batch), (done_ns - actual_ns) // 1000))
+
+    async def _report(self, queue: asyncio.Queue, start: float):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            elapsed = time.perf_counter() - start
+            print(f"   {elapsed:6.1f} с: відправлено {self.sent}, записано {self.written}, "
+                  f"черга {queue.qsize()}, p99 {self.latency.percentile(99) / 1000:.1f} мс")
+
+    async def run(self) -> Dict[str, Any]:
+        """Прогін профілю; повертає підсумок і зберігає гістограми у output_dir"""
+        offsets = self.profile.send_offsets()
+        print(f" Навантаження: {len(offsets)} повідомлень за {self.profile.duration:g} с "
+              f"({self.fleet.fleet_size} турбін) -> {self.sink.file.name}")
+
+        queue: asyncio.Queue = asyncio.Queue()
+        start = time.perf_counter()
+        reporter = asyncio.create_task(self._report(queue, start)) if self.report_interval else None
+        try:
+            await asyncio.gather(self._produce(queue, offsets), self._consume(queue))
+        finally:
+            if reporter:
+                reporter.cancel()
+            self.sink.close()
+        elapsed = time.perf_counter() - start
+
+        self.latency.save(os.path.join(self.output_dir, f"latency_{self.run_id}.hgrm"))
+        self.service.save(os.path.join(self.output_dir, f"service_{self.run_id}.hgrm"))
+        return {
+            'planned': len(offsets),
+            'sent': self.sent,
+            'written': self.written,
+            'quarantined': self.dropped,
+            'elapsed_seconds': round(elapsed, 3),
+            'achieved_rate': round(self.written / elapsed, 1) if elapsed else 0.0,
+            'max_queue_depth': self.max_queue_depth,
+            'latency': self.latency.summary(),
+            'service_time': self.service.summary(),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Генератор навантаження з відкритим циклом")
+    parser.add_argument('--profile', default='1000:60', help="фази 'темп:секунд' або 'від-до:секунд' через кому")
+    parser.add_argument('--turbines', type=int, default=10_000)
+    parser.add_argument('--output-dir', default='delta_lake_output/loadtest')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    generator = OpenLoopLoadGenerator(RateProfile.parse(args.profile), FleetSimulator(args.turbines, seed=args.seed),
+                                      output_dir=args.output_dir)
+    try:
+        result = asyncio.run(generator.run())
+    finally:
+        generator.enricher.close()
+
+    print("\n Результат:")
+    print(f"   Відправлено: {result['sent']}, записано: {result['written']}, у карантині: {result['quarantined']}")
+    print(f"   Досягнутий темп: {result['achieved_rate']} зап/с, макс. черга: {result['max_queue_depth']} пакетів")
+    for name in ('latency', 'service_time'):
+        summary = result[name]
+        if summary['count']:
+            print(f"   {name}: p50 {summary['p50_ms']} мс, p99 {summary['p99_ms']} мс, "
+                  f"p99.9 {summary['p99.9_ms']} мс, max {summary['max_ms']} мс")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -1,8 +1,8 @@
 import pyodbc
-import json
 import os
 from datetime import datetime
 from typing import Dict, List
+import telemetry_json
 
 class SQLToFileCacheLoader:
     """Завантажувач метаданих з Azure SQL DB до файлового кешу"""
@@ -186,7 +186,7 @@ class SQLToFileCacheLoader:
             }
             
             with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(cache_data, f, ensure_ascii=False, indent=2)
+                telemetry_json.dump(cache_data, f)
             
             print(f" Збережено у файловий кеш: {filepath} ({cache_data['count']} записів)")
         except Exception as e:
@@ -308,7 +308,7 @@ def test_cache_usage():
     try:
         # Тест завантаження турбіни
         with open(f"{cache_dir}/turbines_lookup.json", 'r', encoding='utf-8') as f:
-            turbines_cache = json.load(f)
+            turbines_cache = telemetry_json.load(f)
             turbines_data = turbines_cache['data']
         
         if 'TURBINE_001' in turbines_data:
@@ -317,7 +317,7 @@ def test_cache_usage():
         
         # Тест завантаження сенсорів турбіни
         with open(f"{cache_dir}/turbine_sensors_lookup.json", 'r', encoding='utf-8') as f:
-            sensors_cache = json.load(f)
+            sensors_cache = telemetry_json.load(f)
             sensors_data = sensors_cache['data']
         
         if 'TURBINE_001' in sensors_data:
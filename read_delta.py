@@ -1,43 +1,80 @@
+import json
 import pandas as pd
+import pyarrow as pa
 import pyarrow.parquet as pq
 from azure.storage.blob import BlobServiceClient
-from io import BytesIO
+from telemetry_query_cache import QueryResultCache, DEFAULT_MEMORY_BYTES
+from telemetry_blob_cache import ParquetFileCache, DEFAULT_CACHE_DIR
+from telemetry_delta_snapshot import BlobDeltaSource, CachedSnapshot, file_batches, partition_types
 
 STORAGE_CONNECTION = "DefaultEndpointsProtocol=https;EndpointSuffix=core.windows.net;AccountName=windfarm6storage;AccountKey=X7YVa9h/iiKRdw0sYlgaUkb8RFi3U+FRnKR/86DkYxiT8WB4KVPOeBxvGdp0yHDYRMAVVa1FpyIF+AStPVbVPQ==;BlobEndpoint=https://windfarm6storage.blob.core.windows.net/"
 
 CONTAINER_NAME = "telemetry-data"
 DELTA_TABLE_PATH = "delta-lake-turbine-telemetry-full"
+CURRENT_STATE_TABLE = "turbine_current_state"
+# Тека дискового кешу результатів (None - лише пам'ять)
+QUERY_CACHE_DIR = "query_cache"
 
 class DeltaLakeReader:
     """Читач Delta Lake файлів"""
     
-    def __init__(self):
+    def __init__(self, cache_dir: str = None, cache_bytes: int = DEFAULT_MEMORY_BYTES,
+                 file_cache_dir: str = DEFAULT_CACHE_DIR):
         self.blob_service = BlobServiceClient.from_connection_string(STORAGE_CONNECTION)
+        # Результати запитів за (таблиця, версія Delta, параметри): повтор до нового коміту не читає Parquet
+        self.cache = QueryResultCache(cache_bytes, directory=cache_dir)
+        # Закомічені Parquet файли незмінні: локальні копії та футери за іменем blob і etag
+        self.file_cache = ParquetFileCache(file_cache_dir)
+        self._blob_properties = {}
+        # Стан таблиці з журналу: checkpoint + лише коміти після останньої відомої версії
+        self.snapshot = CachedSnapshot(self._source(DELTA_TABLE_PATH))
+    
+    def _source(self, table_path: str) -> BlobDeltaSource:
+        return BlobDeltaSource(self.blob_service, CONTAINER_NAME, table_path, self.file_cache)
+    
+    def table_version(self, table_path: str = DELTA_TABLE_PATH) -> int:
+        """Поточна версія таблиці - номер останнього коміту в _delta_log (одне перелічення, без завантажень)"""
+        return self._source(table_path).latest_version()
+    
+    def _cache_version(self) -> int:
+        """Версія таблиці для ключа кешу; -1, якщо її не вдалося визначити"""
+        try:
+            return self.table_version()
+        except Exception as e:
+            print(f" Помилка визначення версії таблиці: {e}")
+            return -1
+    
+    def _cached(self, query: str, params: dict, compute, version: int = None):
+        """
+        Результат запиту з кешу для версії таблиці (None - поточна, одне перелічення журналу);
+        без версії (помилка переліку) - без кешу
+        """
+        if version is None:
+            version = self._cache_version()
+        if version < 0:
+            return compute()
+        return self.cache.get_or_compute(DELTA_TABLE_PATH, version, query, params, compute)
     
     def list_delta_files(self):
-        """Показати всі файли в Delta Lake"""
+        """Показати активні файли Delta Lake (зі знімку журналу: без checkpoint і видалених файлів)"""
         print(" Файли в Delta Lake:")
         print("=" * 50)
         
-        container_client = self.blob_service.get_container_client(CONTAINER_NAME)
-        
-        blobs = container_client.list_blobs(name_starts_with=DELTA_TABLE_PATH)
+        state = self.snapshot.refresh()
         
         parquet_files = []
-        json_files = []
         
-        for blob in blobs:
-            file_size = f"{blob.size / 1024:.1f} KB" if blob.size else "0 KB"
-            print(f" {blob.name} ({file_size})")
-            
-            if blob.name.endswith('.parquet'):
-                parquet_files.append(blob.name)
-            elif blob.name.endswith('.json'):
-                json_files.append(blob.name)
+        for path, add in sorted(state.files.items()):
+            blob_name = f"{DELTA_TABLE_PATH}/{path}"
+            file_size = f"{add['size'] / 1024:.1f} KB" if add.get('size') else "0 KB"
+            print(f" {blob_name} ({file_size})")
+            parquet_files.append(blob_name)
+        
+        json_files = [f"{DELTA_TABLE_PATH}/_delta_log/{version:020d}.json" for version in range(state.version + 1)]
         
         print(f"\n Знайдено:")
         print(f"   • Parquet файлів: {len(parquet_files)}")
-        print(f"   • JSON файлів: {len(json_files)}")
+        print(f"   • Версій журналу: {len(json_files)}")
         
         return parquet_files, json_files
     
@@ -46,17 +83,17 @@ class DeltaLakeReader:
         try:
             print(f"\n Читання файлу: {blob_name}")
             
-            # Завантажити файл з Azure
+            # Завантажити файл з Azure (лише якщо його немає в локальному кеші)
             blob_client = self.blob_service.get_blob_client(
                 container=CONTAINER_NAME,
                 blob=blob_name
             )
             
-            blob_data = blob_client.download_blob().readall()
+            etag, _ = self._properties(blob_name, blob_client)
+            path = self.file_cache.file_path(blob_name, etag, lambda: blob_client.download_blob().readall())
             
             # Прочитати як Parquet
-            buffer = BytesIO(blob_data)
-            df = pd.read_parquet(buffer)
+            df = pd.read_parquet(path)
             
             print(f" Файл прочитано успішно!")
             print(f" Розмір: {len(df)} рядків, {len(df.columns)} колонок")
@@ -68,22 +105,31 @@ class DeltaLakeReader:
             print(f" Помилка читання {blob_name}: {e}")
             return None
     
+    def _properties(self, blob_name: str, blob_client=None):
+        """(etag, розмір) blob: з останнього переліку, інакше один запит властивостей"""
+        if blob_name not in self._blob_properties:
+            blob_client = blob_client or self.blob_service.get_blob_client(container=CONTAINER_NAME, blob=blob_name)
+            properties = blob_client.get_blob_properties()
+            self._blob_properties[blob_name] = (properties.etag, properties.size)
+        return self._blob_properties[blob_name]
+    
+    def read_parquet_metadata(self, blob_name: str):
+        """Метадані Parquet файлу (схема, row groups, статистика) без завантаження даних"""
+        blob_client = self.blob_service.get_blob_client(container=CONTAINER_NAME, blob=blob_name)
+        etag, size = self._properties(blob_name, blob_client)
+        return self.file_cache.metadata(
+            blob_name, etag, size,
+            lambda offset, length: blob_client.download_blob(offset=offset, length=length).readall()
+        )
+    
     def read_all_delta_data(self):
-        """Прочитати всі дані з Delta Lake"""
+        """Прочитати всі дані з Delta Lake (результат кешується до нового коміту в таблицю)"""
         print("\n Читання всіх даних з Delta Lake...")
         
-        parquet_files, _ = self.list_delta_files()
-        
-        all_data = []
+        table = self._cached('read_all_delta_data', {}, self._download_all_data)
         
-        for file_name in parquet_files:
-            df = self.read_parquet_file(file_name)
-            if df is not None:
-                all_data.append(df)
-        
-        if all_data:
-            # Об'єднати всі DataFrame
-            combined_df = pd.concat(all_data, ignore_index=True)
+        if table is not None:
+            combined_df = table.to_pandas()
             
             print(f"\n РЕЗУЛЬТАТ:")
             print(f" Всього записів: {len(combined_df)}")
@@ -112,38 +158,143 @@ class DeltaLakeReader:
             print(" Не вдалося прочитати жодного файлу")
             return None
     
+    def _download_all_data(self):
+        """Активні файли знімку таблиці -> Arrow таблиця (None, якщо нічого не прочитано)"""
+        state = self.snapshot.refresh()
+        source = self.snapshot.source
+        types = partition_types(state.metadata)
+        
+        all_data = []
+        
+        for path, add in sorted(state.files.items()):
+            try:
+                batches = list(file_batches(source.file_path(add), add, types=types))
+                if batches:
+                    all_data.append(pa.Table.from_batches(batches))
+            except Exception as e:
+                print(f" Помилка читання {path}: {e}")
+        
+        if not all_data:
+            return None
+        
+        # Об'єднати всі файли
+        return pa.concat_tables(all_data, promote_options='permissive')
+    
+    def read_turbine_stats(self):
+        """Статистика по турбінах: кількість записів, потужність, перший та останній запис (кешується)"""
+        # Версія визначається один раз і спільна для обох рівнів кешу
+        version = self._cache_version()
+        
+        def compute():
+            table = self._cached('read_all_delta_data', {}, self._download_all_data, version)
+            if table is None or 'turbine_id' not in table.column_names:
+                return None
+            df = table.to_pandas()
+            aggregations = {'records': ('turbine_id', 'size')}
+            if 'output_power' in df.columns:
+                aggregations.update(mean_power_kw=('output_power', 'mean'), max_power_kw=('output_power', 'max'))
+            if 'timestamp' in df.columns:
+                aggregations.update(first_record=('timestamp', 'min'), last_record=('timestamp', 'max'))
+            stats = df.groupby('turbine_id', observed=True).agg(**aggregations).reset_index()
+            return pa.Table.from_pandas(stats, preserve_index=False)
+        
+        table = self._cached('turbine_stats', {}, compute, version)
+        if table is None:
+            print(" Немає даних для статистики по турбінах")
+            return None
+        
+        stats = table.to_pandas()
+        print(f"\n Статистика по {len(stats)} турбінах (кеш: {self.cache.stats()})")
+        return stats
+    
+    def read_current_state(self):
+        """Поточний стан турбін з компактної таблиці turbine_current_state (рядок на турбіну)"""
+        from deltalake import DeltaTable
+        
+        try:
+            table = DeltaTable(
+                f"az://{CONTAINER_NAME}/{CURRENT_STATE_TABLE}",
+                storage_options={'connection_string': STORAGE_CONNECTION}
+            )
+            df = table.to_pandas()
+            print(f"\n Поточний стан: {len(df)} турбін")
+            return df
+        except Exception as e:
+            print(f" Помилка читання поточного стану: {e}")
+            return None
+    
+    def read_telemetry_range(self, start, end, turbine_id=None):
+        """Телеметрія за період з найдетальнішого рівня зберігання, що його покриває (сирі, 1 хв чи 15 хв)"""
+        from telemetry_retention import TieredReader, tier_stores
+        
+        try:
+            reader = TieredReader(tier_stores(f"az://{CONTAINER_NAME}", {'connection_string': STORAGE_CONNECTION},
+                                              raw_table=DELTA_TABLE_PATH))
+            tier, table = reader.read(start, end, turbine_id)
+            if tier is None:
+                print(f" Немає даних за період {start} - {end}")
+                return None
+            df = table.to_pandas()
+            print(f"\n Період {start} - {end}: рівень {tier}, {len(df)} рядків")
+            return df
+        except Exception as e:
+            print(f" Помилка читання періоду: {e}")
+            return None
+    
+    def read_archive(self, blob_name: str, turbine_id=None, start=None, end=None):
+        """Архів часових рядів (telemetry_archive): читаються лише індекс і потрібні блоки (діапазони blob)"""
+        from telemetry_archive import ArchiveReader
+        
+        try:
+            blob_client = self.blob_service.get_blob_client(container=CONTAINER_NAME, blob=blob_name)
+            size = blob_client.get_blob_properties().size
+            reader = ArchiveReader(
+                lambda offset, length: blob_client.download_blob(offset=offset, length=length).readall(),
+                size
+            )
+            df = reader.read(turbine_id, start, end).to_pandas()
+            print(f"\n Архів {blob_name}: {len(df)} записів")
+            return df
+        except Exception as e:
+            print(f" Помилка читання архіву {blob_name}: {e}")
+            return None
+    
+    def change_feed(self, consumer: str, start_version: int = 0, table_path: str = DELTA_TABLE_PATH):
+        """Інкрементальний читач нових файлів таблиці зі збереженим зміщенням споживача consumer"""
+        from telemetry_change_feed import ChangeFeedReader
+        
+        return ChangeFeedReader(self._source(table_path), consumer, start_version=start_version)
+    
     def read_delta_log(self):
-        """Прочитати метадані Delta Lake"""
+        """Метадані Delta Lake зі знімку журналу (оновлюється лише новими комітами)"""
         print("\n Читання Delta Log метаданих...")
         
         try:
-            container_client = self.blob_service.get_container_client(CONTAINER_NAME)
+            state = self.snapshot.refresh()
+            if state.version < 0:
+                print(" Журнал таблиці порожній")
+                return None
             
-            log_blobs = container_client.list_blobs(name_starts_with=f"{DELTA_TABLE_PATH}/_delta_log")
+            print(f" Версія таблиці: {state.version}")
+            if state.protocol:
+                print(f" Протокол: reader {state.protocol.get('minReaderVersion')}, writer {state.protocol.get('minWriterVersion')}")
+            if state.metadata:
+                fields = json.loads(state.metadata['schemaString'])['fields']
+                print(f" Колонки ({len(fields)}): {[field['name'] for field in fields]}")
+                print(f" Партиції: {state.metadata.get('partitionColumns', [])}")
             
-            for blob in log_blobs:
-                if blob.name.endswith('.json'):
-                    print(f"\n Лог файл: {blob.name}")
-                    
-                    blob_client = self.blob_service.get_blob_client(
-                        container=CONTAINER_NAME,
-                        blob=blob.name
-                    )
-                    
-                    content = blob_client.download_blob().readall().decode('utf-8')
-                    
-                    print(f" Вміст (перші 1000 символів):")
-                    print(content[:1000])
-                    
-                    if len(content) > 1000:
-                        print("...")
+            total_size = sum(add.get('size') or 0 for add in state.files.values())
+            print(f" Активних файлів: {len(state.files)} ({total_size / 1024:.1f} KB), видалених: {len(state.tombstones)}")
+            print(f" Знімок: {self.snapshot.stats()}")
+            return state
         
         except Exception as e:
             print(f" Помилка читання логів: {e}")
+            return None
 
 def main():
     
-    reader = DeltaLakeReader()
+    reader = DeltaLakeReader(cache_dir=QUERY_CACHE_DIR)
     
     # 1. Показати список файлів
     reader.list_delta_files()
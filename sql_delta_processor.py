@@ -1,12 +1,15 @@
-import json
 import time
 from datetime import datetime, timezone
 from typing import Dict, Any, List
 import pyodbc
 import pandas as pd
-import daft
-from daft.io import IOConfig, AzureConfig
 from azure.storage.blob import BlobServiceClient
+from telemetry_metrics import calculate_metrics_batch
+from telemetry_pipeline import TelemetryPipeline, PipelineStage
+from telemetry_spool import TelemetrySpool
+from telemetry_schemas import build_table
+from telemetry_storage import get_profile, write_delta_table
+import telemetry_json
 
 STORAGE_CONNECTION = "DefaultEndpointsProtocol=https;EndpointSuffix=core.windows.net;AccountName=windfarm6storage;AccountKey=X7YVa9h/iiKRdw0sYlgaUkb8RFi3U+FRnKR/86DkYxiT8WB4KVPOeBxvGdp0yHDYRMAVVa1FpyIF+AStPVbVPQ==;BlobEndpoint=https://windfarm6storage.blob.core.windows.net/"
 
@@ -16,22 +19,23 @@ STORAGE_ACCOUNT_NAME = "windfarm6storage"
 STORAGE_ACCOUNT_KEY = "X7YVa9h/iiKRdw0sYlgaUkb8RFi3U+FRnKR/86DkYxiT8WB4KVPOeBxvGdp0yHDYRMAVVa1FpyIF+AStPVbVPQ=="
 CONTAINER_NAME = "telemetry-data"
 NEW_DELTA_TABLE_PATH = "delta-lake-turbine-telemetry-full"
+SPOOL_DIR = f"telemetry_spool/{NEW_DELTA_TABLE_PATH}"
 
 class NewTableProcessor:
     """Процесор з Delta Lake таблицею"""
     
-    def __init__(self):
+    def __init__(self, storage_profile=None):
         print(f" Нова таблиця: {NEW_DELTA_TABLE_PATH}")
         
         self.blob_service = BlobServiceClient.from_connection_string(STORAGE_CONNECTION)
         self.ensure_container_exists()
         
-        self.io_config = IOConfig(
-            azure=AzureConfig(
-                storage_account=STORAGE_ACCOUNT_NAME,
-                access_key=STORAGE_ACCOUNT_KEY
-            )
-        )
+        # Доступ deltalake до сховища; Parquet пишеться за профілем зберігання таблиці
+        self.storage_options = {'account_name': STORAGE_ACCOUNT_NAME, 'account_key': STORAGE_ACCOUNT_KEY}
+        self.storage_profile = get_profile(storage_profile, NEW_DELTA_TABLE_PATH)
+        
+        # Локальний спул: записи не губляться під час збоїв сховища
+        self.spool = TelemetrySpool(SPOOL_DIR, self._replay_spooled)
         
         print(" New Table Processor ініціалізовано")
     
@@ -90,7 +94,7 @@ class NewTableProcessor:
                 humidity_percent, air_pressure_hpa, visibility_km, precipitation_mm,
                 maintenance_status, last_maintenance_date, next_maintenance_date,
                 efficiency_rating, operating_hours, maintenance_notes, technician_name,
-                efficiency_percent, operational_status, calculated_power_kw, load_factor,
+                load_factor,
                 partition_year, partition_month, partition_day,
                 enrichment_version, enrichment_source, processed_by
             FROM dbo.EnrichedTelemetryView 
@@ -108,8 +112,16 @@ class NewTableProcessor:
             
             sensor_metadata = self._get_sensor_metadata_for_turbine(turbine_id)
             
+            # Розрахункові метрики - одним векторизованим проходом по всьому пакету
+            metrics = calculate_metrics_batch({
+                'output_power': df['output_power'],
+                'voltage': df['voltage'],
+                'current': df['current_amperage'],
+                'power_factor': df['power_factor'],
+            }, df['nominal_power_kw'], variant='three_phase')
+            
             enriched_list = []
-            for _, row in df.iterrows():
+            for idx, (_, row) in enumerate(df.iterrows()):
                 record = {
                     "turbine_id": turbine_id,
                     "timestamp": row['timestamp'].isoformat() if pd.notna(row['timestamp']) else datetime.now(timezone.utc).isoformat(),
@@ -134,9 +146,9 @@ class NewTableProcessor:
                     "sensor_metadata": sensor_metadata,
                     
                     "calculated_metrics": {
-                        "efficiency_percent": float(row['efficiency_percent']) if pd.notna(row['efficiency_percent']) else 0.0,
-                        "operational_status": str(row['operational_status']) if pd.notna(row['operational_status']) else '',
-                        "calculated_power_kw": float(row['calculated_power_kw']) if pd.notna(row['calculated_power_kw']) else 0.0
+                        "efficiency_percent": float(metrics['efficiency_percent'][idx]) if pd.notna(metrics['efficiency_percent'][idx]) else 0.0,
+                        "operational_status": str(metrics['operational_status'][idx]),
+                        "calculated_power_kw": float(metrics['calculated_power_kw'][idx]) if pd.notna(metrics['calculated_power_kw'][idx]) else 0.0
                     },
                     
                     "enrichment_info": {
@@ -220,76 +232,100 @@ class NewTableProcessor:
         finally:
             conn.close()
     
-    def save_to_new_delta_table(self, enriched_data: Dict[str, Any]):
-        """Збереження в Delta Lake таблицю + JSON backup"""
+    def _write_delta_records(self, records: List[Dict[str, Any]]):
+        """Запис пакету плоских записів у Delta Lake одним комітом"""
+        delta_path = f"az://{CONTAINER_NAME}/{NEW_DELTA_TABLE_PATH}"
+        write_delta_table(delta_path, build_table(NEW_DELTA_TABLE_PATH, records), self.storage_options, self.storage_profile)
+    
+    def _upload_blob(self, blob_name: str, data: str):
+        blob_client = self.blob_service.get_blob_client(
+            container=CONTAINER_NAME,
+            blob=blob_name
+        )
+        blob_client.upload_blob(data, overwrite=True)
+    
+    def _replay_spooled(self, target: str, records: List[Dict[str, Any]]):
+        """Передача накопичених у спулі записів, коли сховище знову доступне"""
+        if target == 'delta':
+            self._write_delta_records(records)
+        elif target == 'blob':
+            for record in records:
+                self._upload_blob(record['blob_name'], record['data'])
+    
+    def _backup_blob_name(self, enriched_data: Dict[str, Any]) -> str:
+        current_time = datetime.now(timezone.utc)
+        turbine_id = enriched_data.get('turbine_id', 'unknown')
+        timestamp_str = current_time.strftime('%H%M%S_%f')[:-3]
+        return f"enriched-telemetry-backup/year={current_time.year}/month={current_time.month:02d}/day={current_time.day:02d}/turbine={turbine_id}/enriched_{timestamp_str}.json"
+    
+    def save_to_new_delta_table(self, enriched_data: Dict[str, Any]) -> Dict[str, bool]:
+        """
+        Збереження в Delta Lake таблицю + JSON backup.
+
+        *_success - запис уже у сховищі; *_spooled - запис лише у локальному спулі й буде переданий дренером.
+        """
     
         results = {
             'delta_success': False,
-            'json_success': False
+            'delta_spooled': False,
+            'json_success': False,
+            'json_spooled': False
         }
     
         # === 1. DELTA LAKE ЗБЕРЕЖЕННЯ ===
         print(" Збереження в Delta Lake таблицю...")
-        try:
-            # Підготовка даних
-            flat_data = self._prepare_new_table_data(enriched_data)
-        
-            df = daft.from_pydict({
-                key: [value] for key, value in flat_data.items()
-            })
+        # Підготовка даних
+        flat_data = self._prepare_new_table_data(enriched_data)
+        print(f" Запис ID: {flat_data.get('record_id', 'unknown')}")
         
-        # Збереження в Delta Lake
-            delta_path = f"az://{CONTAINER_NAME}/{NEW_DELTA_TABLE_PATH}"
-            print(f" Збереження в: {delta_path}")
-            print(f" Запис ID: {flat_data.get('record_id', 'unknown')}")
+        # Поки спул не спорожнів, нові записи йдуть за ним, щоб не чекати на недоступне сховище
+        storage_backlog = self.spool.has_pending()
         
-            df.write_deltalake(
-                delta_path,
-                io_config=self.io_config,
-                mode="append"
-            )
-        
-            print(f" Delta Lake: УСПІШНО збережено!")
-            results['delta_success'] = True
+        try:
+            if storage_backlog:
+                self.spool.append('delta', flat_data)
+                print(f" Delta Lake: запис у спулі (очікують {self.spool.total_bytes} байт)")
+                results['delta_spooled'] = True
+            else:
+                print(f" Збереження в: az://{CONTAINER_NAME}/{NEW_DELTA_TABLE_PATH}")
+                self._write_delta_records([flat_data])
+                print(f" Delta Lake: УСПІШНО збережено!")
+                results['delta_success'] = True
         
         except Exception as e:
             print(f" Delta Lake помилка: {e}")
-            results['delta_success'] = False
+            # Запис підтверджується після потрапляння у спул; дренер передасть його пізніше
+            self.spool.append('delta', flat_data)
+            print(" Delta Lake: запис збережено у локальний спул для повторної передачі")
+            results['delta_spooled'] = True
     
     # === 2. JSON BACKUP ЗБЕРЕЖЕННЯ (ЗАВЖДИ) ===
         print(" Збереження JSON backup...")
-        try:
-            current_time = datetime.now(timezone.utc)
-            turbine_id = enriched_data.get('turbine_id', 'unknown')
-        
-            timestamp_str = current_time.strftime('%H%M%S_%f')[:-3]
-            blob_name = f"enriched-telemetry-backup/year={current_time.year}/month={current_time.month:02d}/day={current_time.day:02d}/turbine={turbine_id}/enriched_{timestamp_str}.json"
+        blob_name = self._backup_blob_name(enriched_data)
+        json_data = telemetry_json.dumps(enriched_data)
         
-            blob_client = self.blob_service.get_blob_client(
-                container=CONTAINER_NAME,
-                blob=blob_name
-            )
-        
-            json_data = json.dumps(enriched_data, ensure_ascii=False, indent=2)
-            blob_client.upload_blob(json_data, overwrite=True)
-        
-            print(f" JSON backup: {blob_name}")
-            results['json_success'] = True
+        try:
+            if storage_backlog:
+                self.spool.append('blob', {'blob_name': blob_name, 'data': json_data})
+                print(f" JSON backup у спулі: {blob_name}")
+                results['json_spooled'] = True
+            else:
+                self._upload_blob(blob_name, json_data)
+                print(f" JSON backup: {blob_name}")
+                results['json_success'] = True
         
         except Exception as e:
             print(f" JSON backup помилка: {e}")
-            results['json_success'] = False
+            self.spool.append('blob', {'blob_name': blob_name, 'data': json_data})
+            print(" JSON backup збережено у локальний спул для повторної передачі")
+            results['json_spooled'] = True
     
         if results['delta_success'] and results['json_success']:
             print(" Два формати збережено успішно!")
-        elif results['delta_success']:
-            print(" Delta Lake OK, але JSON backup провалився")
-        elif results['json_success']:
-            print(" JSON backup OK, але Delta Lake провалився")
-        else:
-            print("Два формати провалилися!")
+        elif results['delta_spooled'] or results['json_spooled']:
+            print(f" Очікують у спулі: Delta Lake={results['delta_spooled']}, JSON backup={results['json_spooled']}")
     
-        return results['delta_success']
+        return results
     
     def _prepare_new_table_data(self, enriched_data: Dict[str, Any]) -> Dict[str, Any]:
         """Підготовка ПОВНИХ даних для нової таблиці"""
@@ -384,25 +420,22 @@ class NewTableProcessor:
         return flat_data
     
     def _save_json_backup(self, enriched_data: Dict[str, Any]):
+        blob_name = self._backup_blob_name(enriched_data)
+        json_data = telemetry_json.dumps(enriched_data)
+        
         try:
-            current_time = datetime.now(timezone.utc)
-            turbine_id = enriched_data.get('turbine_id', 'unknown')
-            
-            timestamp_str = current_time.strftime('%H%M%S_%f')[:-3]
-            blob_name = f"enriched-telemetry-backup/year={current_time.year}/month={current_time.month:02d}/day={current_time.day:02d}/turbine={turbine_id}/enriched_{timestamp_str}.json"
-            
-            blob_client = self.blob_service.get_blob_client(
-                container=CONTAINER_NAME,
-                blob=blob_name
-            )
-            
-            json_data = json.dumps(enriched_data, ensure_ascii=False, indent=2)
-            blob_client.upload_blob(json_data, overwrite=True)
+            if self.spool.has_pending():
+                self.spool.append('blob', {'blob_name': blob_name, 'data': json_data})
+                print(f" JSON backup у спулі: {blob_name}")
+                return
             
+            self._upload_blob(blob_name, json_data)
             print(f" JSON backup: {blob_name}")
             
         except Exception as e:
             print(f" JSON backup помилка: {e}")
+            self.spool.append('blob', {'blob_name': blob_name, 'data': json_data})
+            print(" JSON backup збережено у локальний спул для повторної передачі")
     
     def process_all_turbines_new_table(self, records_per_turbine: int = 1):
         """Обробка всіх турбін з НОВОЮ Delta Lake таблицею"""
@@ -420,6 +453,7 @@ class NewTableProcessor:
         successful_turbines = []
         failed_turbines = []
         delta_successful = 0
+        delta_spooled = 0
         delta_failed = 0
         
         for i, turbine_id in enumerate(turbine_ids, 1):
@@ -449,10 +483,12 @@ class NewTableProcessor:
                     print(f"    Збереження запису {j}/{len(enriched_data_list)}")
                     
                     # Збереження в НОВУ таблицю
-                    delta_success = self.save_to_new_delta_table(enriched_data)
-                    if delta_success:
+                    results = self.save_to_new_delta_table(enriched_data)
+                    if results['delta_success']:
                         delta_successful += 1
                         turbine_delta_success += 1
+                    elif results['delta_spooled']:
+                        delta_spooled += 1
                     else:
                         delta_failed += 1
                     
@@ -477,6 +513,7 @@ class NewTableProcessor:
         print(f" Провалилося: {len(failed_turbines)}")
         print(f" Всього записів збережено: {total_processed}")
         print(f" Delta Lake успішно: {delta_successful}")
+        print(f" Delta Lake у спулі (буде передано пізніше): {delta_spooled}")
         print(f" elta Lake провалилося: {delta_failed}")
         print(f"📄 JSON backup: всі {total_processed} записи")
         
@@ -490,10 +527,36 @@ class NewTableProcessor:
             for turbine in failed_turbines:
                 print(f"   • {turbine}")
 
+    def build_pipeline(self, records_per_turbine: int = 1, fetch_concurrency: int = 4,
+                       write_concurrency: int = 2, queue_size: int = 100,
+                       report_interval: float = None) -> TelemetryPipeline:
+        """Конвеєр: вибірка з SQL по турбінах -> запис у Delta Lake + JSON backup"""
+        return TelemetryPipeline([
+            PipelineStage('fetch', lambda turbine_id: self.get_enriched_data_for_turbine(turbine_id, records_per_turbine),
+                          concurrency=fetch_concurrency, queue_size=queue_size, fan_out=True),
+            PipelineStage('write', self.save_to_new_delta_table,
+                          concurrency=write_concurrency, queue_size=queue_size),
+        ], report_interval=report_interval)
+    
+    def process_all_turbines_pipeline(self, records_per_turbine: int = 1, **pipeline_options):
+        """Обробка всіх турбін через конвеєр з паралельними етапами"""
+        turbine_ids = self.get_all_turbine_ids()
+        if not turbine_ids:
+            print(" Не знайдено турбін для обробки")
+            return None
+        
+        pipeline = self.build_pipeline(records_per_turbine, **pipeline_options)
+        stats = pipeline.run_sync(turbine_ids)
+        
+        print(f"\n Конвеєр завершено за {stats['elapsed_seconds']} с")
+        pipeline.print_gauges()
+        return stats
+
 def main():
     
     processor = NewTableProcessor()
     processor.process_all_turbines_new_table(records_per_turbine=1)
+    processor.spool.close()
     
     print("\n" + "=" * 80)
     print(" ДЕМОНСТРАЦІЯ З НОВОЮ ТАБЛИЦЕЮ ЗАВЕРШЕНА!")
@@ -1,10 +1,11 @@
-import json
 import time
 from datetime import datetime, timezone
 from typing import Dict, Any, List
 import pyodbc
 import pandas as pd
 from azure.storage.blob import BlobServiceClient
+from telemetry_metrics import calculate_metrics_batch
+import telemetry_json
 
 STORAGE_CONNECTION = "DefaultEndpointsProtocol=https;EndpointSuffix=core.windows.net;AccountName=windfarm6storage;AccountKey=X7YVa9h/iiKRdw0sYlgaUkb8RFi3U+FRnKR/86DkYxiT8WB4KVPOeBxvGdp0yHDYRMAVVa1FpyIF+AStPVbVPQ==;BlobEndpoint=https://windfarm6storage.blob.core.windows.net/"
 
@@ -87,7 +88,7 @@ class CleanTurbinesProcessor:
                 humidity_percent, air_pressure_hpa, visibility_km, precipitation_mm,
                 maintenance_status, last_maintenance_date, next_maintenance_date,
                 efficiency_rating, operating_hours, maintenance_notes, technician_name,
-                efficiency_percent, operational_status, calculated_power_kw, load_factor,
+                load_factor,
                 partition_year, partition_month, partition_day,
                 enrichment_version, enrichment_source, processed_by
             FROM dbo.EnrichedTelemetryView 
@@ -105,8 +106,16 @@ class CleanTurbinesProcessor:
             
             sensor_metadata = self._get_sensor_metadata_for_turbine(turbine_id)
             
+            # Розрахункові метрики - одним векторизованим проходом по всьому пакету
+            metrics = calculate_metrics_batch({
+                'output_power': df['output_power'],
+                'voltage': df['voltage'],
+                'current': df['current_amperage'],
+                'power_factor': df['power_factor'],
+            }, df['nominal_power_kw'], variant='three_phase')
+            
             enriched_list = []
-            for _, row in df.iterrows():
+            for idx, (_, row) in enumerate(df.iterrows()):
                 record = {
                     "turbine_id": turbine_id,
                     "timestamp": row['timestamp'].isoformat() if pd.notna(row['timestamp']) else datetime.now(timezone.utc).isoformat(),
@@ -131,9 +140,9 @@ class CleanTurbinesProcessor:
                     "sensor_metadata": sensor_metadata,
                     
                     "calculated_metrics": {
-                        "efficiency_percent": float(row['efficiency_percent']) if pd.notna(row['efficiency_percent']) else 0.0,
-                        "operational_status": str(row['operational_status']) if pd.notna(row['operational_status']) else '',
-                        "calculated_power_kw": float(row['calculated_power_kw']) if pd.notna(row['calculated_power_kw']) else 0.0
+                        "efficiency_percent": float(metrics['efficiency_percent'][idx]) if pd.notna(metrics['efficiency_percent'][idx]) else 0.0,
+                        "operational_status": str(metrics['operational_status'][idx]),
+                        "calculated_power_kw": float(metrics['calculated_power_kw'][idx]) if pd.notna(metrics['calculated_power_kw'][idx]) else 0.0
                     },
                     
                     "enrichment_info": {
@@ -243,7 +252,7 @@ class CleanTurbinesProcessor:
                 blob=blob_name
             )
             
-            json_data = json.dumps(enriched_data, ensure_ascii=False, indent=2)
+            json_data = telemetry_json.dumps(enriched_data)
             blob_client.upload_blob(json_data, overwrite=True)
             
             print(f" Збережено {turbine_id}: {len(json_data)} байт")
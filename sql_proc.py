@@ -1,13 +1,14 @@
-import json
 import time
 from datetime import datetime, timezone, timedelta
 import pyodbc
 import pandas as pd
-import daft
-from daft.io import IOConfig, AzureConfig
 from azure.storage.blob import BlobServiceClient
-import random
 import warnings
+from telemetry_metrics import calculate_metrics
+from telemetry_generator import turbine_rng
+from telemetry_schemas import build_table
+from telemetry_storage import get_profile, write_delta_table
+import telemetry_json
 
 warnings.filterwarnings('ignore')
 
@@ -22,16 +23,16 @@ NEW_DELTA_TABLE_PATH = "delta-lake-turbine-telemetry-varied"
 
 class TelemetryGenerator:
     
-    def __init__(self):
+    def __init__(self, seed=None, storage_profile=None):
+        # seed задає відтворювані варіації; потік випадкових чисел окремий для кожної турбіни
+        self.seed = seed
+        self.rng = turbine_rng(seed, '')
         self.blob_service = BlobServiceClient.from_connection_string(STORAGE_CONNECTION)
         self.ensure_container_exists()
         
-        self.io_config = IOConfig(
-            azure=AzureConfig(
-                storage_account=STORAGE_ACCOUNT_NAME,
-                access_key=STORAGE_ACCOUNT_KEY
-            )
-        )
+        # Доступ deltalake до сховища; Parquet пишеться за профілем зберігання таблиці
+        self.storage_options = {'account_name': STORAGE_ACCOUNT_NAME, 'account_key': STORAGE_ACCOUNT_KEY}
+        self.storage_profile = get_profile(storage_profile, NEW_DELTA_TABLE_PATH)
     
     def ensure_container_exists(self):
         try:
@@ -68,8 +69,8 @@ class TelemetryGenerator:
         adjusted_base = base_time + timedelta(hours=turbine_offset_hours)
         
         for i in range(num_records):
-            minutes_offset = i * 10 + random.randint(-2, 2)
-            seconds_offset = random.randint(0, 59)
+            minutes_offset = i * 10 + int(self.rng.integers(-2, 3))
+            seconds_offset = int(self.rng.integers(0, 60))
             
             timestamp = adjusted_base + timedelta(minutes=minutes_offset, seconds=seconds_offset)
             timestamps.append(timestamp)
@@ -81,10 +82,11 @@ class TelemetryGenerator:
         if base_value == 0:
             return 0
         
-        variation = base_value * (variation_percent / 100) * (random.random() - 0.5) * 2
+        variation = base_value * (variation_percent / 100) * (self.rng.random() - 0.5) * 2
         return round(base_value + variation, 2)
     
     def get_enriched_data_for_turbine(self, turbine_id, limit, turbine_index):
+        self.rng = turbine_rng(self.seed, turbine_id)
         conn = self.get_sql_connection()
         if not conn:
             return []
@@ -100,7 +102,7 @@ class TelemetryGenerator:
                 humidity_percent, air_pressure_hpa, visibility_km, precipitation_mm,
                 maintenance_status, last_maintenance_date, next_maintenance_date,
                 efficiency_rating, operating_hours, maintenance_notes, technician_name,
-                efficiency_percent, operational_status, calculated_power_kw, load_factor,
+                load_factor,
                 partition_year, partition_month, partition_day,
                 enrichment_version, enrichment_source, processed_by
             FROM dbo.EnrichedTelemetryView 
@@ -128,6 +130,16 @@ class TelemetryGenerator:
                 current = self.add_realistic_variation(float(row['current_amperage']) if pd.notna(row['current_amperage']) else 0.0)
                 wind_speed = self.add_realistic_variation(float(row['wind_speed_ms']) if pd.notna(row['wind_speed_ms']) else 0.0)
                 temperature = self.add_realistic_variation(float(row['temperature_celsius']) if pd.notna(row['temperature_celsius']) else 0.0, 5)
+                power_factor = self.add_realistic_variation(float(row['power_factor']) if pd.notna(row['power_factor']) else 0.0, 3)
+                nominal_power_kw = int(row['nominal_power_kw']) if pd.notna(row['nominal_power_kw']) else 0
+                
+                # Метрики рахуються з уже варійованих значень, тому узгоджені з телеметрією запису
+                calculated_metrics = calculate_metrics({
+                    'output_power': output_power,
+                    'voltage': voltage,
+                    'current': current,
+                    'power_factor': power_factor,
+                }, nominal_power_kw, variant='three_phase')
                 
                 record = {
                     "turbine_id": turbine_id,
@@ -137,7 +149,7 @@ class TelemetryGenerator:
                     "max_power_limit": float(row['max_power_limit']) if pd.notna(row['max_power_limit']) else 0.0,
                     "voltage": voltage,
                     "current": current,
-                    "power_factor": self.add_realistic_variation(float(row['power_factor']) if pd.notna(row['power_factor']) else 0.0, 3),
+                    "power_factor": power_factor,
                     
                     "turbine_metadata": {
                         "turbine_name": str(row['location_name']) if pd.notna(row['location_name']) else '',
@@ -145,7 +157,7 @@ class TelemetryGenerator:
                         "location_lng": float(row['longitude']) if pd.notna(row['longitude']) else 0.0,
                         "manufacturer": str(row['manufacturer']) if pd.notna(row['manufacturer']) else '',
                         "model": str(row['model']) if pd.notna(row['model']) else '',
-                        "nominal_power_kw": int(row['nominal_power_kw']) if pd.notna(row['nominal_power_kw']) else 0,
+                        "nominal_power_kw": nominal_power_kw,
                         "installation_date": row['installation_date'].isoformat() if pd.notna(row['installation_date']) else '',
                         "status": str(row['turbine_status']) if pd.notna(row['turbine_status']) else 'unknown'
                     },
@@ -170,11 +182,7 @@ class TelemetryGenerator:
                         "technician_name": str(row['technician_name']) if pd.notna(row['technician_name']) else f"Tech_{turbine_id[-1]}"
                     },
                     
-                    "calculated_metrics": {
-                        "efficiency_percent": self.add_realistic_variation(float(row['efficiency_percent']) if pd.notna(row['efficiency_percent']) else 0.0, 5),
-                        "operational_status": str(row['operational_status']) if pd.notna(row['operational_status']) else '',
-                        "calculated_power_kw": self.add_realistic_variation(float(row['calculated_power_kw']) if pd.notna(row['calculated_power_kw']) else 0.0)
-                    },
+                    "calculated_metrics": calculated_metrics,
                     
                     "enrichment_info": {
                         "processing_timestamp": realistic_timestamp.isoformat(),
@@ -198,17 +206,8 @@ class TelemetryGenerator:
         try:
             flat_data = self.prepare_flat_data(enriched_data)
             
-            df = daft.from_pydict({
-                key: [value] for key, value in flat_data.items()
-            })
-            
             delta_path = f"az://{CONTAINER_NAME}/{NEW_DELTA_TABLE_PATH}"
-            
-            df.write_deltalake(
-                delta_path,
-                io_config=self.io_config,
-                mode="append"
-            )
+            write_delta_table(delta_path, build_table(NEW_DELTA_TABLE_PATH, [flat_data]), self.storage_options, self.storage_profile)
             
             return True
             
@@ -228,7 +227,7 @@ class TelemetryGenerator:
                 blob=blob_name
             )
             
-            json_data = json.dumps(enriched_data, ensure_ascii=False, indent=2)
+            json_data = telemetry_json.dumps(enriched_data)
             blob_client.upload_blob(json_data, overwrite=True)
             
             return True
@@ -350,7 +349,7 @@ class TelemetryGenerator:
         print(f"Complete: {total_processed} records, {delta_successful} delta, {json_successful} json")
 
 def main():
-    generator = TelemetryGenerator()
+    generator = TelemetryGenerator(seed=None)
     generator.process_all_turbines(records_per_turbine=12)
 
 if __name__ == "__main__":
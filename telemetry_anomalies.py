@@ -0,0 +1,231 @@
+"""
+Потокове виявлення аномалій: статистики Велфорда та EWMA по турбінах, O(1) на запис, з контрольними точками стану
+"""
+
+import math
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, Callable, List, Optional
+
+import numpy as np
+
+from telemetry_rollups import event_time
+
+# Метрики, що відстежуються; power_divergence - розрахована потужність мінус виміряна (кВт)
+METRICS = ('output_power', 'power_divergence', 'power_factor')
+
+# Поля стану (останній вимір масиву стану)
+COUNT, MEAN, M2, EWMA, EWVAR, LAST, LAST_TIME, RATE_EWMA, RATE_EWVAR, LAST_ALERT = range(10)
+STATE_FIELDS = 10
+
+DEFAULT_CHECKPOINT_PATH = "delta_lake_output/checkpoints/anomaly_state.npz"
+
+
+def metric_values(record: Dict[str, Any]) -> List[float]:
+    """Значення метрик запису (NaN - немає даних)"""
+    def value(name: str) -> float:
+        raw = record.get(name)
+        return float(raw) if raw is not None and raw != '' else math.nan
+
+    output_power = value('output_power')
+    return [output_power, value('calculated_power_kw') - output_power, value('power_factor')]
+
+
+class AnomalyDetector:
+    """
+    Онлайн-детектор викидів по турбінах.
+
+    Для кожної турбіни і метрики: середнє та дисперсія Велфорда (уся історія), EWMA значення
+    та EWMA швидкості зміни. Запис перевіряється за станом до його врахування:
+    - zscore: |x - середнє| / σ > z_threshold
+    - rate_of_change: швидкість зміни відхиляється від її EWMA більш ніж на rate_threshold σ
+    - drift: EWMA відійшло від довгострокового середнього більш ніж на drift_threshold σ
+    """
+
+    def __init__(self, emit: Callable[[List[Dict[str, Any]]], None], z_threshold: float = 5.0,
+                 rate_threshold: float = 6.0, drift_threshold: float = 1.5, alpha: float = 0.05,
+                 min_samples: int = 30, cooldown: float = 300.0,
+                 checkpoint_path: Optional[str] = DEFAULT_CHECKPOINT_PATH, checkpoint_interval: float = 60.0):
+        self.emit = emit
+        self.z_threshold = z_threshold
+        self.rate_threshold = rate_threshold
+        self.drift_threshold = drift_threshold
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.cooldown = cooldown
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+
+        self._index: Dict[str, int] = {}
+        self._state = self._empty_state(64)
+        self._lock = threading.Lock()
+        self._last_checkpoint = time.monotonic()
+
+        self.samples = 0
+        self.alerts_raised = 0
+
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            self.load_checkpoint(checkpoint_path)
+
+    @staticmethod
+    def _empty_state(capacity: int) -> np.ndarray:
+        state = np.zeros((capacity, len(METRICS), STATE_FIELDS))
+        state[:, :, LAST] = np.nan
+        state[:, :, LAST_TIME] = np.nan
+        state[:, :, LAST_ALERT] = -np.inf
+        return state
+
+    def _turbine_index(self, turbine_id: str) -> int:
+        index = self._index.get(turbine_id)
+        if index is None:
+            index = self._index[turbine_id] = len(self._index)
+            if index >= len(self._state):
+                grown = self._empty_state(len(self._state) * 2)
+                grown[:len(self._state)] = self._state
+                self._state = grown
+        return index
+
+    def process(self, records: List[Dict[str, Any]]):
+        """Оновлення статистик і перевірка записів; сповіщення передаються в emit пакетом"""
+        alerts = []
+        with self._lock:
+            for record in records:
+                turbine_id = record.get('turbine_id')
+                timestamp = event_time(record.get('timestamp'))
+                if not turbine_id or timestamp is None:
+                    continue
+                rows = self._state[self._turbine_index(turbine_id)]
+                for metric, (value, stats) in enumerate(zip(metric_values(record), rows)):
+                    if not math.isnan(value):
+                        alerts.extend(self._observe(turbine_id, METRICS[metric], stats, value, timestamp))
+                self.samples += 1
+            checkpoint_due = self.checkpoint_path and time.monotonic() - self._last_checkpoint >= self.checkpoint_interval
+
+        if alerts:
+            self.alerts_raised += len(alerts)
+            try:
+                self.emit(alerts)
+            except Exception as e:
+                print(f" Аномалії: помилка запису {len(alerts)} сповіщень: {e}")
+        if checkpoint_due:
+            self.save_checkpoint()
+
+    def _observe(self, turbine_id: str, metric: str, stats: np.ndarray, value: float, timestamp: float) -> List[Dict[str, Any]]:
+        """Один вимір: перевірки за попереднім станом, потім оновлення стану (O(1))"""
+        count, mean = stats[COUNT], stats[MEAN]
+        findings = []
+        if count >= self.min_samples:
+            sigma = math.sqrt(stats[M2] / (count - 1))
+            if sigma > 0:
+                score = abs(value - mean) / sigma
+                if score > self.z_threshold:
+                    findings.append(('zscore', mean, score, self.z_threshold))
+                drift = abs(stats[EWMA] - mean) / sigma
+                if drift > self.drift_threshold:
+                    findings.append(('drift', mean, drift, self.drift_threshold))
+
+        elapsed = timestamp - stats[LAST_TIME]
+        if elapsed > 0:
+            rate = (value - stats[LAST]) / elapsed
+            if count >= self.min_samples and stats[RATE_EWVAR] > 0:
+                score = abs(rate - stats[RATE_EWMA]) / math.sqrt(stats[RATE_EWVAR])
+                if score > self.rate_threshold:
+                    findings.append(('rate_of_change', stats[LAST] + stats[RATE_EWMA] * elapsed, score, self.rate_threshold))
+            stats[RATE_EWMA], stats[RATE_EWVAR] = self._ewm(stats[RATE_EWMA], stats[RATE_EWVAR], rate, count <= 1)
+
+        # Велфорд
+        count += 1
+        delta = value - mean
+        stats[COUNT] = count
+        stats[MEAN] = mean + delta / count
+        stats[M2] += delta * (value - stats[MEAN])
+        stats[EWMA], stats[EWVAR] = self._ewm(stats[EWMA], stats[EWVAR], value, count == 1)
+        if math.isnan(stats[LAST_TIME]) or timestamp >= stats[LAST_TIME]:
+            stats[LAST], stats[LAST_TIME] = value, timestamp
+
+        if not findings or timestamp - stats[LAST_ALERT] < self.cooldown:
+            return []
+        stats[LAST_ALERT] = timestamp
+        return [self._alert(turbine_id, metric, kind, value, expected, score, threshold, timestamp)
+                for kind, expected, score, threshold in findings]
+
+    def _ewm(self, average: float, variance: float, value: float, first: bool):
+        if first:
+            return value, 0.0
+        diff = value - average
+        increment = self.alpha * diff
+        return average + increment, (1 - self.alpha) * (variance + diff * increment)
+
+    @staticmethod
+    def _alert(turbine_id: str, metric: str, kind: str, value: float, expected: float, score: float,
+               threshold: float, timestamp: float) -> Dict[str, Any]:
+        moment = datetime.fromtimestamp(timestamp, timezone.utc)
+        return {
+            'alert_id': f"{turbine_id}_{metric}_{kind}_{int(timestamp)}",
+            'turbine_id': turbine_id,
+            'timestamp': moment,
+            'detected_at': datetime.now(timezone.utc),
+            'metric': metric,
+            'kind': kind,
+            'value': value,
+            'expected': float(expected),
+            'score': float(score),
+            'threshold': threshold,
+            'partition_year': moment.year,
+            'partition_month': moment.month,
+            'partition_day': moment.day,
+        }
+
+    def statistics(self, turbine_id: str) -> Dict[str, Dict[str, float]]:
+        """Поточні статистики турбіни (для діагностики)"""
+        index = self._index.get(turbine_id)
+        if index is None:
+            return {}
+        result = {}
+        for metric, stats in zip(METRICS, self._state[index]):
+            count = stats[COUNT]
+            result[metric] = {
+                'count': int(count),
+                'mean': float(stats[MEAN]),
+                'std': math.sqrt(stats[M2] / (count - 1)) if count > 1 else 0.0,
+                'ewma': float(stats[EWMA]),
+            }
+        return result
+
+    def save_checkpoint(self, path: str = None):
+        """Стан у .npz: запис у тимчасовий файл і атомарна заміна"""
+        path = path or self.checkpoint_path
+        with self._lock:
+            turbine_ids = np.array(sorted(self._index, key=self._index.get), dtype=str)
+            state = self._state[:len(turbine_ids)].copy()
+            self._last_checkpoint = time.monotonic()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.tmp.npz"
+        np.savez(temp_path, turbine_ids=turbine_ids, state=state, metrics=np.array(METRICS, dtype=str))
+        os.replace(temp_path, path)
+
+    def load_checkpoint(self, path: str = None):
+        """Відновлення стану після перезапуску (без холодного старту)"""
+        path = path or self.checkpoint_path
+        try:
+            with np.load(path) as checkpoint:
+                if tuple(checkpoint['metrics']) != METRICS:
+                    print(f" Аномалії: контрольна точка {path} має інші метрики, стан не відновлено")
+                    return
+                turbine_ids, state = checkpoint['turbine_ids'], checkpoint['state']
+        except Exception as e:
+            print(f" Аномалії: помилка читання контрольної точки {path}: {e}")
+            return
+        with self._lock:
+            self._index = {str(turbine_id): index for index, turbine_id in enumerate(turbine_ids)}
+            self._state = self._empty_state(max(64, len(turbine_ids) * 2))
+            self._state[:len(turbine_ids)] = state
+        print(f" Аномалії: відновлено стан {len(turbine_ids)} турбін з {path}")
+
+    def close(self):
+        if self.checkpoint_path:
+            self.save_checkpoint()
\ No newline at end of file
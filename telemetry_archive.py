@@ -0,0 +1,490 @@
+"""
+Архівний кодек часових рядів турбін: delta-of-delta для міток часу, XOR (Gorilla) та десяткові дельти для вимірів
+"""
+
+import argparse
+import os
+import struct
+import tempfile
+import time
+from typing import Dict, Any, Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+import telemetry_json
+from telemetry_schemas import CATEGORY, TIMESTAMP, column_array
+
+# Сигнали, що зберігаються в архіві (мітка часу та turbine_id - завжди)
+ARCHIVE_COLUMNS = ('output_power', 'rotor_rpm', 'voltage', 'current', 'power_factor')
+DEFAULT_BLOCK_ROWS = 4096
+# Найбільша кількість знаків після коми, за якої значення кодуються як цілі
+MAX_DECIMALS = 6
+
+MAGIC = b'TWGA'
+FORMAT_VERSION = 1
+FOOTER = struct.Struct('<QI4s')
+BLOCK_HEADER = struct.Struct('<IB')
+SEGMENT_LENGTH = struct.Struct('<I')
+# Заголовок колонки в блоці: кодування, знаки після коми, чи є null, перше значення, крок міток часу
+SEGMENT_HEADER = struct.Struct('<BBBqq')
+
+ENCODING_TIMESTAMP, ENCODING_DECIMAL, ENCODING_XOR = range(3)
+
+
+# --- Бітові потоки -------------------------------------------------------------------------------------
+
+def _bit_lengths(values: np.ndarray) -> np.ndarray:
+    """Кількість значущих бітів кожного uint64 (0 для нуля)"""
+    values = values.copy()
+    lengths = np.zeros(len(values), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        wide = values >= np.uint64(1 << shift)
+        lengths[wide] += shift
+        values[wide] >>= np.uint64(shift)
+    return lengths + (values > 0)
+
+
+def _pack_bits(values: np.ndarray, widths: np.ndarray) -> bytes:
+    """Кожне значення - його widths[i] молодших бітів, підряд від старшого біта; без циклу по значеннях"""
+    widths = widths.astype(np.int64)
+    total = int(widths.sum())
+    if total == 0:
+        return b''
+    offsets = np.cumsum(widths) - widths
+    owner = np.repeat(np.arange(len(values)), widths)
+    shift = (widths[owner] - 1 - (np.arange(total) - offsets[owner])).astype(np.uint64)
+    bits = ((values.astype(np.uint64)[owner] >> shift) & np.uint64(1)).astype(np.uint8)
+    return np.packbits(bits).tobytes()
+
+
+def _unpack_bits(data: bytes, widths: np.ndarray) -> np.ndarray:
+    widths = widths.astype(np.int64)
+    values = np.zeros(len(widths), dtype=np.uint64)
+    total = int(widths.sum())
+    if total == 0:
+        return values
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8), count=total).astype(np.uint64)
+    offsets = np.cumsum(widths) - widths
+    owner = np.repeat(np.arange(len(widths)), widths)
+    shift = (widths[owner] - 1 - (np.arange(total) - offsets[owner])).astype(np.uint64)
+    present = widths > 0
+    values[present] = np.add.reduceat(bits << shift, offsets[present])
+    return values
+
+
+def _stream_bytes(bits: int) -> int:
+    return (bits + 7) // 8
+
+
+def _selector_bits(classes: int) -> int:
+    return (classes - 1).bit_length()
+
+
+def _choose_widths(lengths: np.ndarray) -> np.ndarray:
+    """
+    До 4 класів ширини (як кошики Gorilla, але підібрані під блок): значення пишеться шириною
+    свого класу, номер класу - окремим потоком. Розбиття довжин на класи - динамічне програмування.
+    """
+    histogram = np.bincount(lengths, minlength=65)
+    present = np.nonzero(histogram)[0]
+    if len(present) == 0:
+        return np.zeros(1, dtype=np.int64)
+    counts = np.concatenate(([0], np.cumsum(histogram[present])))
+    total = len(lengths)
+
+    def group_cost(first: int, last: int) -> int:
+        return int(counts[last + 1] - counts[first]) * int(present[last])
+
+    size = len(present)
+    # best[g][j] - найменший розмір довжин present[0..j] у g класах; split - початок останнього класу
+    best = [[group_cost(0, last) for last in range(size)]]
+    splits = [[0] * size]
+    for _ in range(1, min(4, size)):
+        previous = best[-1]
+        row, split = [], []
+        for last in range(size):
+            options = [(previous[first - 1] + group_cost(first, last), first) for first in range(1, last + 1)]
+            cost, first = min(options) if options else (float('inf'), 0)
+            row.append(cost)
+            split.append(first)
+        best.append(row)
+        splits.append(split)
+
+    classes = min(range(len(best)), key=lambda g: best[g][-1] + total * _selector_bits(g + 1))
+    widths, last = [], size - 1
+    for g in range(classes, -1, -1):
+        widths.append(int(present[last]))
+        last = splits[g][last] - 1
+    return np.array(widths[::-1], dtype=np.int64)
+
+
+def _pack_uints(values: np.ndarray) -> bytes:
+    """Цілі без знаку: класи ширини, потік номерів класів, потік значень"""
+    widths = _choose_widths(_bit_lengths(values))
+    selectors = np.searchsorted(widths, _bit_lengths(values))
+    header = bytes([len(widths)]) + bytes(widths.astype(np.uint8))
+    selector_bits = _selector_bits(len(widths))
+    selector_stream = _pack_bits(selectors, np.full(len(values), selector_bits)) if selector_bits else b''
+    return header + selector_stream + _pack_bits(values, widths[selectors])
+
+
+def _unpack_uints(data: bytes, count: int) -> np.ndarray:
+    classes = data[0]
+    widths = np.frombuffer(data, dtype=np.uint8, count=classes, offset=1).astype(np.int64)
+    position = 1 + classes
+    selector_bits = _selector_bits(classes)
+    if selector_bits:
+        length = _stream_bytes(count * selector_bits)
+        selectors = _unpack_bits(data[position:position + length], np.full(count, selector_bits)).astype(np.int64)
+        position += length
+    else:
+        selectors = np.zeros(count, dtype=np.int64)
+    return _unpack_bits(data[position:], widths[selectors])
+
+
+def _zigzag(values: np.ndarray) -> np.ndarray:
+    return ((values << 1) ^ (values >> 63)).view(np.uint64)
+
+
+def _unzigzag(values: np.ndarray) -> np.ndarray:
+    return (values >> np.uint64(1)).view(np.int64) ^ -(values & np.uint64(1)).view(np.int64)
+
+
+# --- Кодування колонок ---------------------------------------------------------------------------------
+
+def _encode_timestamps(timestamps: np.ndarray) -> Tuple[bytes, int, int]:
+    """Мікросекунди -> delta-of-delta в одиницях найбільшого спільного кроку (секунди для цілих секунд)"""
+    deltas = np.diff(timestamps)
+    unit = int(np.gcd.reduce(deltas)) if deltas.any() else 1
+    steps = deltas // unit
+    return _pack_uints(_zigzag(np.diff(steps, prepend=0))), int(timestamps[0]), unit
+
+
+def _decode_timestamps(data: bytes, count: int, first: int, unit: int) -> np.ndarray:
+    steps = np.cumsum(_unzigzag(_unpack_uints(data, count - 1)))
+    return first + np.concatenate(([0], np.cumsum(steps))) * unit
+
+
+def _decimals(values: np.ndarray) -> Optional[int]:
+    """Найменша кількість знаків, з якою значення відновлюються без втрат (None - не десяткові)"""
+    if not np.isfinite(values).all():
+        return None
+    for decimals in range(MAX_DECIMALS + 1):
+        scale = 10.0 ** decimals
+        scaled = np.round(values * scale)
+        if np.abs(scaled).max(initial=0) < 2 ** 53 and np.array_equal(scaled / scale, values):
+            return decimals
+    return None
+
+
+def _encode_decimal(values: np.ndarray, decimals: int) -> Tuple[bytes, int]:
+    scaled = np.round(values * 10.0 ** decimals).astype(np.int64)
+    return _pack_uints(_zigzag(np.diff(scaled))), int(scaled[0])
+
+
+def _decode_decimal(data: bytes, count: int, decimals: int, first: int) -> np.ndarray:
+    scaled = first + np.concatenate(([0], np.cumsum(_unzigzag(_unpack_uints(data, count - 1)))))
+    return scaled / 10.0 ** decimals
+
+
+def _encode_xor(values: np.ndarray) -> Tuple[bytes, int]:
+    """
+    Gorilla: XOR з попереднім значенням; нуль - один біт, інакше 6 біт провідних нулів,
+    6 біт довжини та значущі біти. Прапорці, заголовки й значущі біти - окремими потоками.
+    """
+    bits = values.view(np.uint64)
+    xor = bits[1:] ^ bits[:-1]
+    changed = xor != 0
+    significant = xor[changed]
+    lengths = _bit_lengths(significant)
+    trailing = _bit_lengths(significant & (~significant + np.uint64(1))) - 1
+    meaningful = lengths - trailing
+    headers = ((64 - lengths) << 6) | (meaningful - 1)
+    data = (np.packbits(changed).tobytes()
+            + _pack_bits(headers, np.full(len(headers), 12))
+            + _pack_bits(significant >> trailing.astype(np.uint64), meaningful))
+    return data, int(bits[0].view(np.int64))
+
+
+def _decode_xor(data: bytes, count: int, first: int) -> np.ndarray:
+    flags_length = _stream_bytes(count - 1)
+    changed = np.unpackbits(np.frombuffer(data[:flags_length], dtype=np.uint8), count=count - 1).astype(bool)
+    significant_count = int(changed.sum())
+    headers_length = _stream_bytes(significant_count * 12)
+    headers = _unpack_bits(data[flags_length:flags_length + headers_length], np.full(significant_count, 12)).astype(np.int64)
+    leading, meaningful = headers >> 6, (headers & 63) + 1
+    payload = _unpack_bits(data[flags_length + headers_length:], meaningful)
+    xor = np.zeros(count, dtype=np.uint64)
+    xor[0] = np.int64(first).view(np.uint64)
+    xor[1:][changed] = payload << (64 - leading - meaningful).astype(np.uint64)
+    return np.bitwise_xor.accumulate(xor).view(np.float64)
+
+
+def _forward_fill(values: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """null замінюються попереднім значенням, щоб не ламати дельти (маска зберігається окремо)"""
+    filled = np.where(valid, values, 0.0)
+    index = np.maximum.accumulate(np.where(valid, np.arange(len(values)), 0))
+    return filled[index]
+
+
+def encode_column(values: np.ndarray, valid: np.ndarray = None) -> bytes:
+    """Колонка вимірів блоку: десяткові дельти, якщо значення мають скінченну кількість знаків, інакше XOR"""
+    has_nulls = valid is not None and not valid.all()
+    if has_nulls:
+        values = _forward_fill(values, valid)
+    decimals = _decimals(values)
+    if decimals is not None:
+        encoding, (data, first) = ENCODING_DECIMAL, _encode_decimal(values, decimals)
+    else:
+        encoding, (data, first), decimals = ENCODING_XOR, _encode_xor(values), 0
+    validity = np.packbits(valid).tobytes() if has_nulls else b''
+    return SEGMENT_HEADER.pack(encoding, decimals, has_nulls, first, 0) + validity + data
+
+
+def decode_column(segment: bytes, count: int) -> pa.Array:
+    encoding, decimals, has_nulls, first, unit = SEGMENT_HEADER.unpack_from(segment)
+    position = SEGMENT_HEADER.size
+    mask = None
+    if has_nulls:
+        length = _stream_bytes(count)
+        mask = ~np.unpackbits(np.frombuffer(segment[position:position + length], dtype=np.uint8), count=count).astype(bool)
+        position += length
+    data = segment[position:]
+    if encoding == ENCODING_TIMESTAMP:
+        return pa.array(_decode_timestamps(data, count, first, unit), pa.int64()).cast(TIMESTAMP)
+    if encoding == ENCODING_DECIMAL:
+        values = _decode_decimal(data, count, decimals, first)
+    elif encoding == ENCODING_XOR:
+        values = _decode_xor(data, count, first)
+    else:
+        raise ValueError(f"Невідоме кодування колонки: {encoding}")
+    return pa.array(values, pa.float64(), mask=mask)
+
+
+# --- Блоки та файл ----------------------------------------------------------------------------------------
+
+def encode_block(timestamps: np.ndarray, columns: Sequence[Tuple[np.ndarray, np.ndarray]]) -> bytes:
+    """Блок однієї турбіни: мітки часу (мкс, за зростанням) та колонки (значення, маска валідності)"""
+    data, first, unit = _encode_timestamps(timestamps)
+    segments = [SEGMENT_HEADER.pack(ENCODING_TIMESTAMP, 0, False, first, unit) + data]
+    segments += [encode_column(values, valid) for values, valid in columns]
+    return BLOCK_HEADER.pack(len(timestamps), len(segments)) + b''.join(
+        SEGMENT_LENGTH.pack(len(segment)) + segment for segment in segments)
+
+
+def decode_block(block: bytes, column_names: Sequence[str], columns: Sequence[str] = None) -> Dict[str, pa.Array]:
+    """Колонки блоку; непотрібні сегменти пропускаються без декодування"""
+    rows, count = BLOCK_HEADER.unpack_from(block)
+    position = BLOCK_HEADER.size
+    wanted = set(column_names if columns is None else columns)
+    result = {}
+    for name in ('timestamp',) + tuple(column_names):
+        (length,) = SEGMENT_LENGTH.unpack_from(block, position)
+        position += SEGMENT_LENGTH.size
+        if name == 'timestamp' or name in wanted:
+            result[name] = decode_column(block[position:position + length], rows)
+        position += length
+    return result
+
+
+def _column_values(table: pa.Table, name: str) -> Tuple[np.ndarray, np.ndarray]:
+    column = table.column(name).cast(pa.float64())
+    return column.to_numpy(zero_copy_only=False), pc.is_valid(column).to_numpy(zero_copy_only=False)
+
+
+def encode_archive(table: pa.Table, columns: Sequence[str] = ARCHIVE_COLUMNS, block_rows: int = DEFAULT_BLOCK_ROWS,
+                   decimals: Dict[str, int] = None) -> bytes:
+    """
+    Таблиця телеметрії -> архів: блоки по турбінах (до block_rows записів, за часом) та індекс блоків
+    у кінці файлу. decimals - необов'язкове округлення колонок (з втратами) до точності датчика.
+    """
+    columns = [name for name in columns if name in table.column_names]
+    table = table.filter(pc.is_valid(table.column('timestamp')))
+    turbine_ids = table.column('turbine_id')
+    if pa.types.is_dictionary(turbine_ids.type):
+        turbine_ids = turbine_ids.cast(turbine_ids.type.value_type)
+    table = table.set_column(table.column_names.index('turbine_id'), 'turbine_id', turbine_ids) \
+        .sort_by([('turbine_id', 'ascending'), ('timestamp', 'ascending')])
+
+    timestamps = table.column('timestamp').cast(TIMESTAMP).cast(pa.int64()).to_numpy()
+    values = []
+    for name in columns:
+        column, valid = _column_values(table, name)
+        if decimals and name in decimals:
+            column = np.round(column, decimals[name])
+        values.append((column, valid))
+
+    ids = table.column('turbine_id').to_numpy(zero_copy_only=False)
+    boundaries = np.concatenate(([0], np.nonzero(ids[1:] != ids[:-1])[0] + 1, [len(ids)])) if len(ids) else [0]
+
+    parts = [MAGIC + bytes([FORMAT_VERSION])]
+    offset = len(parts[0])
+    blocks = []
+    for turbine_start, turbine_end in zip(boundaries[:-1], boundaries[1:]):
+        for start in range(turbine_start, turbine_end, block_rows):
+            end = min(start + block_rows, turbine_end)
+            block = encode_block(timestamps[start:end], [(column[start:end], valid[start:end]) for column, valid in values])
+            blocks.append({'turbine_id': ids[start], 'rows': end - start, 'start': int(timestamps[start]),
+                           'end': int(timestamps[end - 1]), 'offset': offset, 'length': len(block)})
+            parts.append(block)
+            offset += len(block)
+
+    index = telemetry_json.dumps_bytes({'version': FORMAT_VERSION, 'columns': columns, 'blocks': blocks}, pretty=False)
+    parts.append(index)
+    parts.append(FOOTER.pack(offset, len(index), MAGIC))
+    return b''.join(parts)
+
+
+def export_archive(table: pa.Table, path: str, **options) -> Dict[str, Any]:
+    """Запис архіву у файл (через тимчасовий файл); повертає розміри для звіту"""
+    data = encode_archive(table, **options)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+    return {'path': path, 'rows': table.num_rows, 'size_bytes': len(data)}
+
+
+class ArchiveReader:
+    """
+    Читання архіву з довільним доступом: індекс блоків з кінця файлу, далі лише потрібні блоки.
+    read_range(offset, length) дозволяє читати файл, байти в пам'яті або діапазони blob.
+    """
+
+    def __init__(self, read_range: Callable[[int, int], bytes], size: int):
+        self.read_range = read_range
+        index_offset, index_length, magic = FOOTER.unpack(read_range(size - FOOTER.size, FOOTER.size))
+        if magic != MAGIC:
+            raise ValueError("Файл не є архівом телеметрії")
+        index = telemetry_json.loads(read_range(index_offset, index_length))
+        self.columns: List[str] = index['columns']
+        self.blocks: List[Dict[str, Any]] = index['blocks']
+
+    @classmethod
+    def open(cls, path: str) -> 'ArchiveReader':
+        def read_range(offset: int, length: int) -> bytes:
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                return f.read(length)
+        return cls(read_range, os.path.getsize(path))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'ArchiveReader':
+        view = memoryview(data)
+        return cls(lambda offset, length: bytes(view[offset:offset + length]), len(data))
+
+    def turbines(self) -> List[str]:
+        return sorted({block['turbine_id'] for block in self.blocks})
+
+    def select(self, turbine_id: str = None, start: int = None, end: int = None) -> List[int]:
+        """Номери блоків турбіни, що перетинають [start, end] (мікросекунди UTC)"""
+        return [number for number, block in enumerate(self.blocks)
+                if (turbine_id is None or block['turbine_id'] == turbine_id)
+                and (start is None or block['end'] >= start) and (end is None or block['start'] <= end)]
+
+    def read_block(self, number: int, columns: Sequence[str] = None) -> pa.Table:
+        block = self.blocks[number]
+        decoded = decode_block(self.read_range(block['offset'], block['length']), self.columns, columns)
+        turbine = pa.DictionaryArray.from_arrays(pa.array(np.zeros(block['rows'], dtype=np.int32)),
+                                                 pa.array([block['turbine_id']], pa.string()))
+        return pa.table({'turbine_id': turbine.cast(CATEGORY), **decoded})
+
+    def read(self, turbine_id: str = None, start=None, end=None, columns: Sequence[str] = None) -> pa.Table:
+        """Записи турбіни (або всіх) за період; start/end - datetime або мікросекунди"""
+        start_us, end_us = (None if value is None else value if isinstance(value, int)
+                            else int(pa.scalar(value, TIMESTAMP).value) for value in (start, end))
+        tables = [self.read_block(number, columns) for number in self.select(turbine_id, start_us, end_us)]
+        if not tables:
+            names = list(self.columns if columns is None else columns)
+            return pa.schema([('turbine_id', CATEGORY), ('timestamp', TIMESTAMP)]
+                             + [(name, pa.float64()) for name in names]).empty_table()
+        table = pa.concat_tables(tables, promote_options='permissive')
+        stamps = table.column('timestamp').cast(pa.int64())
+        low = np.iinfo(np.int64).min if start_us is None else start_us
+        high = np.iinfo(np.int64).max if end_us is None else end_us
+        return table.filter(pc.and_(pc.greater_equal(stamps, low), pc.less_equal(stamps, high)))
+
+
+def _simulator_table(fleet_size: int, duration: int, seed: int) -> pa.Table:
+    """Телеметрія FleetSimulator (округлення як у датчиків) як таблиця"""
+    from fleet_simulator import FleetSimulator
+
+    rows = [message for _, messages in FleetSimulator(fleet_size, seed=seed).generate(duration) for message in messages]
+    return pa.table({
+        'turbine_id': pa.array([row['turbine_id'] for row in rows], pa.string()),
+        'timestamp': column_array([row['timestamp'] for row in rows], TIMESTAMP),
+        **{name: pa.array([row[name] for row in rows], pa.float64()) for name in ARCHIVE_COLUMNS},
+    })
+
+
+def benchmark_archive(fleet_size: int = 100, duration: int = 86_400, seed: int = 42,
+                      block_rows: int = DEFAULT_BLOCK_ROWS) -> Dict[str, Any]:
+    """Розмір архіву проти float64, JSON повідомлень та Parquet профілю archive; швидкість кодування/читання"""
+    from telemetry_storage import get_profile
+
+    table = _simulator_table(fleet_size, duration, seed)
+    raw_bytes = table.num_rows * 8 * (1 + len(ARCHIVE_COLUMNS))
+
+    start = time.perf_counter()
+    data = encode_archive(table, block_rows=block_rows)
+    encode_seconds = time.perf_counter() - start
+
+    reader = ArchiveReader.from_bytes(data)
+    start = time.perf_counter()
+    decoded = reader.read()
+    decode_seconds = time.perf_counter() - start
+
+    turbine = reader.turbines()[0]
+    start = time.perf_counter()
+    reader.read(turbine, reader.blocks[0]['start'], reader.blocks[0]['start'] + 3600 * 1_000_000)
+    random_access_seconds = time.perf_counter() - start
+
+    expected = table.sort_by([('turbine_id', 'ascending'), ('timestamp', 'ascending')])
+    lossless = all(decoded.column(name).equals(expected.column(name)) for name in ('timestamp',) + ARCHIVE_COLUMNS)
+
+    with tempfile.TemporaryDirectory(prefix="archive_") as directory:
+        parquet_path = os.path.join(directory, "archive.parquet")
+        get_profile('archive').write_table(expected, parquet_path)
+        parquet_bytes = os.path.getsize(parquet_path)
+
+    sample = table.slice(0, min(table.num_rows, 10_000)).to_pylist()
+    json_bytes = len(telemetry_json.dumps_bytes(sample, pretty=False)) * table.num_rows / max(1, len(sample))
+
+    result = {
+        'rows': table.num_rows, 'blocks': len(reader.blocks), 'archive_bytes': len(data),
+        'float64_ratio': raw_bytes / len(data), 'json_ratio': json_bytes / len(data),
+        'parquet_ratio': parquet_bytes / len(data), 'lossless': lossless,
+        'encode_rows_per_second': table.num_rows / encode_seconds,
+        'decode_rows_per_second': table.num_rows / decode_seconds,
+        'random_access_seconds': random_access_seconds,
+    }
+    print(f" Архів: {result['rows']} записів, {result['blocks']} блоків, {len(data) / 1024:.1f} KB "
+          f"({len(data) * 8 / result['rows']:.1f} біт на запис з {1 + len(ARCHIVE_COLUMNS)} колонок)")
+    print(f"   стиск: {result['float64_ratio']:.1f}x проти float64, {result['json_ratio']:.1f}x проти JSON, "
+          f"{result['parquet_ratio']:.2f}x проти Parquet (archive)")
+    print(f"   кодування {result['encode_rows_per_second']:,.0f} зап/с, читання {result['decode_rows_per_second']:,.0f} зап/с, "
+          f"година однієї турбіни {random_access_seconds * 1000:.1f} мс, без втрат: {lossless}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Архівний кодек часових рядів турбін")
+    parser.add_argument('--export', metavar='TABLE', help="Локальна Delta таблиця для експорту в архів")
+    parser.add_argument('--output', default="telemetry.twga")
+    parser.add_argument('--turbines', type=int, default=100)
+    parser.add_argument('--duration', type=int, default=86_400, help="Віртуальних секунд симуляції для бенчмарку")
+    parser.add_argument('--block-rows', type=int, default=DEFAULT_BLOCK_ROWS)
+    args = parser.parse_args()
+
+    if args.export:
+        from telemetry_delta_sink import read_local_table
+        result = export_archive(read_local_table(args.export), args.output, block_rows=args.block_rows)
+        print(f" Архів: {result['rows']} записів -> {result['path']} ({result['size_bytes'] / 1024:.1f} KB)")
+    else:
+        benchmark_archive(args.turbines, args.duration, block_rows=args.block_rows)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
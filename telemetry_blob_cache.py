@@ -0,0 +1,186 @@
+"""
+Локальний дисковий кеш незмінних Parquet файлів Delta таблиць та їх футерів (метаданих) за іменем blob і etag
+"""
+
+import hashlib
+import os
+import struct
+import threading
+import uuid
+from collections import OrderedDict
+from io import BytesIO
+from typing import Dict, Any, Callable, Optional
+
+import pyarrow.parquet as pq
+
+DEFAULT_CACHE_DIR = "blob_cache"
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024 * 1024
+# Скільки розібраних футерів тримати в пам'яті
+DEFAULT_MEMORY_FOOTERS = 4096
+# Хвіст файлу, що читається одним запитом: вміщує футер більшості файлів
+FOOTER_READ_BYTES = 64 * 1024
+
+PARQUET_MAGIC = b'PAR1'
+FOOTER_TAIL = struct.Struct('<I4s')
+
+
+def content_key(blob_name: str, etag: str) -> str:
+    """Адреса вмісту: той самий blob з іншим etag - інший запис кешу"""
+    return hashlib.sha256(f"{blob_name}\n{etag or ''}".encode('utf-8')).hexdigest()
+
+
+def parse_footer(footer: bytes) -> pq.FileMetaData:
+    """Байти футера (FileMetaData) -> метадані без решти файлу"""
+    return pq.read_metadata(BytesIO(PARQUET_MAGIC + footer + FOOTER_TAIL.pack(len(footer), PARQUET_MAGIC)))
+
+
+def footer_from_tail(tail: bytes) -> Optional[bytes]:
+    """Футер з хвоста файлу; None, якщо хвіст коротший за футер"""
+    length, magic = FOOTER_TAIL.unpack(tail[-FOOTER_TAIL.size:])
+    if magic != PARQUET_MAGIC:
+        raise ValueError("Не Parquet файл (немає PAR1 у кінці)")
+    if length + FOOTER_TAIL.size > len(tail):
+        return None
+    return tail[-FOOTER_TAIL.size - length:-FOOTER_TAIL.size]
+
+
+class ParquetFileCache:
+    """
+    Файли у directory/files, футери окремо у directory/footers (ключ - sha256 імені та etag).
+    Спільний ліміт max_bytes, витіснення найдавніше використаних (LRU за часом доступу).
+    Розібрані футери додатково тримаються в пам'яті.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES,
+                 memory_footers: int = DEFAULT_MEMORY_FOOTERS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_footers = memory_footers
+        for kind in ('files', 'footers'):
+            os.makedirs(os.path.join(directory, kind), exist_ok=True)
+
+        self._lock = threading.Lock()
+        # Відносний шлях -> розмір, у порядку використання
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self._footers: "OrderedDict[str, pq.FileMetaData]" = OrderedDict()
+        self._load_index()
+
+        self.file_hits = 0
+        self.file_misses = 0
+        self.footer_hits = 0
+        self.footer_misses = 0
+        self.bytes_downloaded = 0
+
+    def _load_index(self):
+        """Наявні файли кешу після перезапуску, від найдавніше використаних"""
+        found = []
+        for kind in ('files', 'footers'):
+            for name in os.listdir(os.path.join(self.directory, kind)):
+                if name.startswith('.tmp-'):
+                    continue
+                stat = os.stat(os.path.join(self.directory, kind, name))
+                found.append((stat.st_mtime, f"{kind}/{name}", stat.st_size))
+        for _, relative, size in sorted(found):
+            self._entries[relative] = size
+            self._bytes += size
+
+    def _touch(self, relative: str) -> bool:
+        with self._lock:
+            if relative not in self._entries:
+                return False
+            self._entries.move_to_end(relative)
+        try:
+            os.utime(os.path.join(self.directory, relative))
+        except FileNotFoundError:
+            with self._lock:
+                self._bytes -= self._entries.pop(relative, 0)
+            return False
+        return True
+
+    def _store(self, relative: str, data: bytes):
+        path = os.path.join(self.directory, relative)
+        temp_path = os.path.join(os.path.dirname(path), f".tmp-{uuid.uuid4().hex}")
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        with self._lock:
+            self._bytes += len(data) - self._entries.pop(relative, 0)
+            self._entries[relative] = len(data)
+            evicted = []
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                victim, size = self._entries.popitem(last=False)
+                self._bytes -= size
+                evicted.append(victim)
+        for victim in evicted:
+            try:
+                os.remove(os.path.join(self.directory, victim))
+            except FileNotFoundError:
+                pass
+
+    def file_path(self, blob_name: str, etag: str, download: Callable[[], bytes]) -> str:
+        """Локальний шлях файлу; при промаху вміст завантажується один раз через download()"""
+        relative = f"files/{content_key(blob_name, etag)}.parquet"
+        if self._touch(relative):
+            self.file_hits += 1
+        else:
+            self.file_misses += 1
+            data = download()
+            self.bytes_downloaded += len(data)
+            self._store(relative, data)
+        return os.path.join(self.directory, relative)
+
+    def metadata(self, blob_name: str, etag: str, size: int,
+                 read_range: Callable[[int, int], bytes]) -> pq.FileMetaData:
+        """Метадані файлу: пам'ять, файл футера, закешований файл або читання хвоста (1-2 запити)"""
+        key = content_key(blob_name, etag)
+        with self._lock:
+            metadata = self._footers.get(key)
+            if metadata is not None:
+                self._footers.move_to_end(key)
+                self.footer_hits += 1
+                return metadata
+
+        footer_relative = f"footers/{key}.footer"
+        file_relative = f"files/{key}.parquet"
+        if self._touch(footer_relative):
+            self.footer_hits += 1
+            with open(os.path.join(self.directory, footer_relative), 'rb') as f:
+                footer = f.read()
+        elif self._touch(file_relative):
+            self.footer_hits += 1
+            metadata = pq.read_metadata(os.path.join(self.directory, file_relative))
+            self._remember_footer(key, metadata)
+            return metadata
+        else:
+            self.footer_misses += 1
+            footer = self._fetch_footer(size, read_range)
+            self._store(footer_relative, footer)
+
+        metadata = parse_footer(footer)
+        self._remember_footer(key, metadata)
+        return metadata
+
+    def _fetch_footer(self, size: int, read_range: Callable[[int, int], bytes]) -> bytes:
+        length = min(size, FOOTER_READ_BYTES)
+        tail = read_range(size - length, length)
+        self.bytes_downloaded += len(tail)
+        footer = footer_from_tail(tail)
+        if footer is None:
+            (footer_length, _) = FOOTER_TAIL.unpack(tail[-FOOTER_TAIL.size:])
+            footer = read_range(size - FOOTER_TAIL.size - footer_length, footer_length)
+            self.bytes_downloaded += len(footer)
+        return footer
+
+    def _remember_footer(self, key: str, metadata: pq.FileMetaData):
+        with self._lock:
+            self._footers[key] = metadata
+            while len(self._footers) > self.memory_footers:
+                self._footers.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, total = len(self._entries), self._bytes
+        return {'entries': entries, 'bytes': total, 'file_hits': self.file_hits, 'file_misses': self.file_misses,
+                'footer_hits': self.footer_hits, 'footer_misses': self.footer_misses,
+                'bytes_downloaded': self.bytes_downloaded}
\ No newline at end of file
@@ -0,0 +1,173 @@
+"""
+Інкрементальне читання Delta таблиць: нові файли (дії add) від заданої версії як потік Arrow пакетів,
+зі збереженим зміщенням кожного споживача
+"""
+
+import argparse
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Any, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import pyarrow as pa
+
+import telemetry_json
+from telemetry_delta_snapshot import DEFAULT_BATCH_ROWS, LocalDeltaSource, file_batches, partition_types
+
+DEFAULT_OFFSETS_DIR = "change_feed_offsets"
+
+
+class FileChange(NamedTuple):
+    """Доданий файл: версія коміту, номер серед add цього коміту, дія add"""
+    version: int
+    index: int
+    add: Dict[str, Any]
+
+    @property
+    def path(self) -> str:
+        return self.add['path']
+
+    @property
+    def rows(self) -> Optional[int]:
+        stats = self.add.get('stats')
+        if not stats:
+            return None
+        return (telemetry_json.loads(stats) if isinstance(stats, str) else stats).get('numRecords')
+
+
+class ChangeFeedReader:
+    """
+    Нові файли таблиці для споживача consumer.
+
+    Зміщення - (версія, номер файлу) наступного необробленого файлу, зберігається у
+    offsets_dir/<таблиця>/<споживач>.json після обробки кожного файлу (commit). Файли, додані
+    без зміни даних (dataChange=false, напр. компакція), пропускаються.
+    """
+
+    def __init__(self, source, consumer: str, offsets_dir: str = DEFAULT_OFFSETS_DIR, start_version: int = 0):
+        self.source = source
+        self.consumer = consumer
+        self.offset_path = os.path.join(offsets_dir, source.name, f"{consumer}.json")
+        self.start_version = start_version
+        self._partition_types: Dict[str, pa.DataType] = {}
+
+        self.files_read = 0
+        self.rows_read = 0
+
+    def offset(self) -> Tuple[int, int]:
+        """(версія, номер файлу), з яких продовжується читання"""
+        try:
+            with open(self.offset_path, 'rb') as f:
+                offset = telemetry_json.loads(f.read())
+            return offset['version'], offset['index']
+        except FileNotFoundError:
+            return self.start_version, 0
+
+    def _save_offset(self, version: int, index: int):
+        os.makedirs(os.path.dirname(self.offset_path), exist_ok=True)
+        temp_path = f"{self.offset_path}.tmp-{uuid.uuid4().hex}"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(telemetry_json.dumps({
+                'consumer': self.consumer, 'table': self.source.name, 'version': version, 'index': index,
+                'updated_at': datetime.now(timezone.utc).isoformat(),
+            }, pretty=False))
+        os.replace(temp_path, self.offset_path)
+
+    def reset(self, version: int = 0):
+        """Перемотування споживача на початок версії"""
+        self._save_offset(version, 0)
+
+    def _remember_metadata(self, actions: List[Dict[str, Any]]) -> bool:
+        found = False
+        for action in actions:
+            if action.get('metaData'):
+                self._partition_types = partition_types(action['metaData'])
+                found = True
+        return found
+
+    def _load_metadata(self, version: int, checkpoint: int):
+        """
+        Типи партицій для читання з версії version: найновіший metaData серед комітів між checkpoint
+        і version, інакше - з checkpoint (ранні коміти могли бути прибрані очищенням журналу)
+        """
+        for current in range(version - 1, max(checkpoint, -1), -1):
+            if self._remember_metadata(self.source.read_actions(current)):
+                return
+        if checkpoint >= 0:
+            self._remember_metadata(self.source.read_checkpoint(checkpoint))
+
+    def pending(self, until_version: int = None) -> List[FileChange]:
+        """Файли після зміщення до until_version включно (за замовчуванням - до останньої версії)"""
+        version, index = self.offset()
+        latest, checkpoint = self.source.list_log()
+        if until_version is not None:
+            latest = until_version
+        changes = []
+        if not self._partition_types and version > 0:
+            self._load_metadata(version, checkpoint)
+        for current in range(version, latest + 1):
+            actions = self.source.read_actions(current)
+            self._remember_metadata(actions)
+            adds = [action['add'] for action in actions if 'add' in action]
+            changes.extend(FileChange(current, position, add) for position, add in enumerate(adds)
+                           if (current > version or position >= index) and add.get('dataChange', True))
+        return changes
+
+    def commit(self, change: FileChange):
+        """Файл оброблено: наступне читання почнеться після нього"""
+        self._save_offset(change.version, change.index + 1)
+
+    def commit_version(self, version: int):
+        """Усі файли до версії version включно оброблено"""
+        self._save_offset(version + 1, 0)
+
+    def read_batches(self, change: FileChange, columns: Sequence[str] = None,
+                     batch_rows: int = DEFAULT_BATCH_ROWS) -> Iterator[pa.RecordBatch]:
+        """Arrow пакети одного файлу; колонки партицій додаються зі значень дії add"""
+        path = self.source.file_path(change.add)
+        for batch in file_batches(path, change.add, columns, self._partition_types, batch_rows):
+            self.rows_read += batch.num_rows
+            yield batch
+        self.files_read += 1
+
+    def stream(self, columns: Sequence[str] = None, until_version: int = None,
+               batch_rows: int = DEFAULT_BATCH_ROWS) -> Iterator[Tuple[FileChange, pa.RecordBatch]]:
+        """
+        (файл, пакет) для всіх нових файлів. Зміщення фіксується, коли споживач попросив наступний
+        пакет після останнього пакета файлу, тобто після обробки всього файлу; збій посеред файлу
+        означає його повторне читання (at-least-once на рівні файлу, exactly-once для завершених).
+        """
+        changes = self.pending(until_version)
+        for change in changes:
+            for batch in self.read_batches(change, columns, batch_rows):
+                yield change, batch
+            self.commit(change)
+        if changes:
+            self.commit_version(changes[-1].version if until_version is None else until_version)
+        elif until_version is not None:
+            self.commit_version(until_version)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нові файли локальної Delta таблиці для споживача")
+    parser.add_argument('table', help="Шлях локальної Delta таблиці")
+    parser.add_argument('--consumer', default="cli")
+    parser.add_argument('--from-version', type=int, default=0, help="Початкова версія для нового споживача")
+    parser.add_argument('--dry-run', action='store_true', help="Лише показати нові файли, не зсуваючи зміщення")
+    args = parser.parse_args()
+
+    feed = ChangeFeedReader(LocalDeltaSource(args.table), args.consumer, start_version=args.from_version)
+    version, index = feed.offset()
+    print(f" Зміни {args.table} для '{args.consumer}' з версії {version} (файл {index})")
+    if args.dry_run:
+        for change in feed.pending():
+            print(f"   версія {change.version}: {change.path} ({change.rows} записів)")
+        return
+    rows = 0
+    for change, batch in feed.stream():
+        rows += batch.num_rows
+    print(f" Прочитано {feed.files_read} файлів, {rows} записів; зміщення {feed.offset()}")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,174 @@
+"""
+Кодування тіла повідомлень телеметрії: JSON, msgpack або Arrow IPC, вибір за contentType
+"""
+
+import base64
+import struct
+from typing import Dict, Any, Iterator, List, Sequence, Tuple, Union
+
+import pyarrow as pa
+
+import telemetry_json
+from telemetry_schemas import infer_table
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+ARROW = "application/vnd.apache.arrow.stream"
+
+# Синоніми contentType, що зустрічаються у клієнтів
+CONTENT_TYPE_ALIASES = {
+    'application/json': JSON,
+    'text/json': JSON,
+    'application/msgpack': MSGPACK,
+    'application/x-msgpack': MSGPACK,
+    'application/vnd.apache.arrow.stream': ARROW,
+    'application/x-arrow-ipc': ARROW,
+}
+
+ENCODING_NAMES = {'json': JSON, 'msgpack': MSGPACK, 'arrow': ARROW}
+
+# Кадр для бінарних потоків (файл, сокет): код формату та довжина тіла
+FRAME_HEADER = struct.Struct('<BI')
+FRAME_CODES = {JSON: 1, MSGPACK: 2, ARROW: 3}
+FRAME_TYPES = {code: content_type for content_type, code in FRAME_CODES.items()}
+
+
+def normalize_content_type(content_type: str = None) -> str:
+    """Канонічний contentType; параметри (charset) відкидаються, невідомі типи - JSON"""
+    if not content_type:
+        return JSON
+    base = content_type.split(';')[0].strip().lower()
+    return CONTENT_TYPE_ALIASES.get(base, JSON)
+
+
+def is_available(content_type: str) -> bool:
+    return normalize_content_type(content_type) != MSGPACK or msgpack is not None
+
+
+def negotiate(preferred: Union[str, Sequence[str]]) -> str:
+    """Перший доступний формат зі списку бажаних (назви 'json'/'msgpack'/'arrow' або contentType); JSON - запасний"""
+    for option in ([preferred] if isinstance(preferred, str) else preferred):
+        content_type = ENCODING_NAMES.get(option, None) or normalize_content_type(option)
+        if is_available(content_type):
+            return content_type
+        print(f" Формат {option} недоступний (немає пакету msgpack), використовуємо JSON")
+    return JSON
+
+
+def encode_message(message: Dict[str, Any], content_type: str = JSON) -> bytes:
+    """Одне повідомлення -> тіло"""
+    content_type = normalize_content_type(content_type)
+    if content_type == MSGPACK:
+        return msgpack.packb(message, use_bin_type=True)
+    if content_type == ARROW:
+        return _encode_arrow([message])
+    return telemetry_json.dumps_bytes(message, pretty=False)
+
+
+def encode_batch(messages: List[Dict[str, Any]], content_type: str = JSON, max_bytes: int = None) -> List[bytes]:
+    """
+    Пакет повідомлень -> тіла (JSON масив, msgpack масив або Arrow IPC record batch).
+    З max_bytes пакет ділиться на частини, кожна не більша за ліміт.
+    """
+    if not messages:
+        return []
+    content_type = normalize_content_type(content_type)
+    if content_type == ARROW:
+        return _split_by_size(messages, max_bytes, _encode_arrow)
+
+    encode_item = (lambda m: msgpack.packb(m, use_bin_type=True)) if content_type == MSGPACK else \
+        (lambda m: telemetry_json.dumps_bytes(m, pretty=False))
+    join = _join_msgpack if content_type == MSGPACK else _join_json
+
+    chunks, current, size = [], [], 5
+    for message in messages:
+        encoded = encode_item(message)
+        if max_bytes and current and size + len(encoded) + 1 > max_bytes:
+            chunks.append(join(current))
+            current, size = [], 5
+        current.append(encoded)
+        size += len(encoded) + 1
+    if current:
+        chunks.append(join(current))
+    return chunks
+
+
+def _join_json(items: List[bytes]) -> bytes:
+    return b'[' + b','.join(items) + b']'
+
+
+def _join_msgpack(items: List[bytes]) -> bytes:
+    # Заголовок масиву msgpack (array 32) + вже закодовані елементи
+    return b'\xdd' + struct.pack('>I', len(items)) + b''.join(items)
+
+
+def _encode_arrow(messages: List[Dict[str, Any]]) -> bytes:
+    # Схема з усіх повідомлень: from_pylist бере ключі лише першого і відкидає решту
+    table = infer_table(messages)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _split_by_size(messages: List[Dict[str, Any]], max_bytes: int, encode) -> List[bytes]:
+    """Поділ навпіл, доки кожна частина не вкладеться в ліміт"""
+    payload = encode(messages)
+    if not max_bytes or len(payload) <= max_bytes or len(messages) == 1:
+        return [payload]
+    middle = len(messages) // 2
+    return _split_by_size(messages[:middle], max_bytes, encode) + _split_by_size(messages[middle:], max_bytes, encode)
+
+
+def decode_body(body: Union[bytes, str, Dict[str, Any], List[Any]], content_type: str = None) -> List[Dict[str, Any]]:
+    """
+    Тіло повідомлення -> список записів телеметрії.
+
+    Підтримує одиночні повідомлення та пакети; рядкове тіло бінарного формату вважається base64
+    (так Event Hub/Stream Analytics серіалізують бінарні тіла в JSON).
+    """
+    content_type = normalize_content_type(content_type)
+
+    if isinstance(body, (dict, list)):
+        data = body
+    elif content_type == JSON:
+        data = telemetry_json.loads(body)
+        # Подвійне кодування: тіло - JSON рядок з JSON об'єктом
+        if isinstance(data, str):
+            data = telemetry_json.loads(data)
+    else:
+        raw = base64.b64decode(body) if isinstance(body, str) else bytes(body)
+        if content_type == ARROW:
+            return pa.ipc.open_stream(pa.py_buffer(raw)).read_all().to_pylist()
+        if msgpack is None:
+            raise ValueError("Повідомлення у форматі msgpack, але пакет msgpack не встановлено")
+        data = msgpack.unpackb(raw, raw=False)
+
+    return data if isinstance(data, list) else [data]
+
+
+def decode_event(event: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Подія Event Hub (як у turbine-telemetry-messages.json) -> записи телеметрії"""
+    content_type = event.get('contentType') or event.get('content_type') or \
+        (event.get('properties') or {}).get('content-type')
+    return decode_body(event.get('body'), content_type)
+
+
+def encode_frame(payload: bytes, content_type: str) -> bytes:
+    """Кадр для бінарного потоку: заголовок (код формату, довжина) + тіло"""
+    return FRAME_HEADER.pack(FRAME_CODES[normalize_content_type(content_type)], len(payload)) + payload
+
+
+def read_frames(data: bytes) -> Iterator[Tuple[str, bytes]]:
+    """Розбір послідовності кадрів -> (contentType, тіло)"""
+    offset = 0
+    while offset + FRAME_HEADER.size <= len(data):
+        code, length = FRAME_HEADER.unpack_from(data, offset)
+        start = offset + FRAME_HEADER.size
+        yield FRAME_TYPES[code], data[start:start + length]
+        offset = start + length
\ No newline at end of file
@@ -0,0 +1,117 @@
+"""
+Поточний стан кожної турбіни: карта останніх значень у пам'яті та пакетний MERGE у таблицю turbine_current_state
+"""
+
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Any, Callable, List, Optional
+
+from telemetry_rollups import event_time
+from telemetry_schemas import CURRENT_STATE_TABLE, get_schema
+
+STATE_COLUMNS = tuple(name for name in get_schema(CURRENT_STATE_TABLE).names if name != 'updated_at')
+# Колонки, зміна яких означає новий стан; мітка часу входить, тож новіший відлік завжди оновлює рядок
+TRACKED_COLUMNS = tuple(name for name in STATE_COLUMNS if name != 'turbine_id')
+# Точність порівняння вимірів: коливання в межах округлення не вважаються зміною
+COMPARE_DIGITS = 2
+
+
+def _state_key(row: Dict[str, Any]) -> tuple:
+    return tuple(round(row[name], COMPARE_DIGITS) if isinstance(row[name], float) else row[name]
+                 for name in TRACKED_COLUMNS)
+
+
+class CurrentStateTracker:
+    """
+    Останній стан кожної турбіни.
+
+    Пошук іде по карті в пам'яті (розмір - кількість турбін). Турбіни з новішим відліком, ніж записаний
+    у таблицю, зливаються одним MERGE раз на flush_interval (по одному - останньому - рядку на турбіну);
+    повтор уже записаного відліку пропускається.
+    """
+
+    def __init__(self, write_merge: Callable[[List[Dict[str, Any]]], None], flush_interval: float = 5.0):
+        self.write_merge = write_merge
+        self.flush_interval = flush_interval
+
+        self._latest: Dict[str, Dict[str, Any]] = {}
+        self._latest_time: Dict[str, float] = {}
+        # Що востаннє записано в таблицю (карта останніх значень) і що чекає на MERGE
+        self._written: Dict[str, tuple] = {}
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+        self.unchanged_skipped = 0
+        self.stale_skipped = 0
+        self.rows_merged = 0
+        self.merges = 0
+
+        self._stop = threading.Event()
+        self._worker = threading.Thread(target=self._flush_loop, name="current-state-merge", daemon=True)
+        self._worker.start()
+
+    def update(self, records: List[Dict[str, Any]]):
+        """Плоскі записи після збагачення; старіші за відомий стан турбіни ігноруються"""
+        with self._lock:
+            for record in records:
+                turbine_id = record.get('turbine_id')
+                timestamp = event_time(record.get('timestamp'))
+                if not turbine_id or timestamp is None:
+                    continue
+                if timestamp < self._latest_time.get(turbine_id, float('-inf')):
+                    self.stale_skipped += 1
+                    continue
+
+                row = {name: record.get(name) for name in STATE_COLUMNS}
+                self._latest[turbine_id] = row
+                self._latest_time[turbine_id] = timestamp
+
+                if self._written.get(turbine_id) == _state_key(row):
+                    # Той самий відлік, що вже в таблиці (повтор повідомлення) - оновлення не потрібне
+                    self._pending.pop(turbine_id, None)
+                    self.unchanged_skipped += 1
+                else:
+                    self._pending[turbine_id] = row
+
+    def get(self, turbine_id: str) -> Optional[Dict[str, Any]]:
+        return self._latest.get(turbine_id)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Поточний стан усього парку"""
+        with self._lock:
+            return [dict(row) for row in self._latest.values()]
+
+    def flush(self):
+        """Один MERGE для всіх змінених турбін"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        updated_at = datetime.now(timezone.utc)
+        rows = [{**row, 'updated_at': updated_at} for row in pending.values()]
+        try:
+            self.write_merge(rows)
+        except Exception as e:
+            print(f" Поточний стан: помилка MERGE ({len(rows)} турбін): {e}")
+            with self._lock:
+                # Повернення в чергу, якщо новіший стан ще не надійшов
+                for turbine_id, row in pending.items():
+                    self._pending.setdefault(turbine_id, row)
+            return
+
+        with self._lock:
+            for turbine_id, row in pending.items():
+                self._written[turbine_id] = _state_key(row)
+        self.rows_merged += len(rows)
+        self.merges += 1
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        """Зупинка фонового потоку та останній MERGE"""
+        self._stop.set()
+        self._worker.join()
+        self.flush()
\ No newline at end of file
@@ -0,0 +1,581 @@
+"""
+Локальний колонковий приймач: Parquet файли по партиціях та журнал транзакцій Delta Lake (_delta_log)
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Dict, Any, List, Optional, Sequence, Tuple, Union
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+import telemetry_json
+from telemetry_schemas import TELEMETRY_TABLE, get_schema, records_to_table
+from telemetry_storage import CHECKPOINT_INTERVAL, StorageProfile, get_profile
+
+DELTA_LOG_DIR = "_delta_log"
+LAST_CHECKPOINT = "_last_checkpoint"
+# Записи, які не вдалося привести до схеми або закомітити до закриття (Delta ігнорує теки з '_')
+REJECTED_DIR = "_rejected"
+
+DEFAULT_PARTITION_BY = ('partition_year', 'partition_month', 'partition_day')
+# Тека для null значення партиції (як у Hive/Spark); у partitionValues значення лишається null
+HIVE_DEFAULT_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+
+def _delta_type(arrow_type: pa.DataType) -> str:
+    """Тип Arrow -> примітивний тип схеми Delta"""
+    if pa.types.is_dictionary(arrow_type):
+        return _delta_type(arrow_type.value_type)
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return "string"
+    if pa.types.is_timestamp(arrow_type):
+        return "timestamp" if arrow_type.tz else "timestamp_ntz"
+    mapping = {
+        pa.float64(): "double", pa.float32(): "float",
+        pa.int64(): "long", pa.int32(): "integer", pa.int16(): "short", pa.int8(): "byte",
+        pa.bool_(): "boolean", pa.date32(): "date", pa.binary(): "binary",
+    }
+    if arrow_type in mapping:
+        return mapping[arrow_type]
+    raise TypeError(f"Тип {arrow_type} не підтримується схемою Delta")
+
+
+def delta_schema_string(schema: pa.Schema) -> str:
+    """schemaString для дії metaData"""
+    return json.dumps({
+        'type': 'struct',
+        'fields': [
+            {'name': field.name, 'type': _delta_type(field.type), 'nullable': field.nullable, 'metadata': {}}
+            for field in schema
+        ],
+    })
+
+
+_STRING_MAP = pa.map_(pa.string(), pa.string())
+
+# Схема checkpoint за специфікацією Delta: рядок на дію, заповнена одна з колонок
+CHECKPOINT_SCHEMA = pa.schema([
+    ('protocol', pa.struct([('minReaderVersion', pa.int32()), ('minWriterVersion', pa.int32())])),
+    ('metaData', pa.struct([
+        ('id', pa.string()), ('name', pa.string()), ('description', pa.string()),
+        ('format', pa.struct([('provider', pa.string()), ('options', _STRING_MAP)])),
+        ('schemaString', pa.string()), ('partitionColumns', pa.list_(pa.string())),
+        ('configuration', _STRING_MAP), ('createdTime', pa.int64()),
+    ])),
+    ('add', pa.struct([
+        ('path', pa.string()), ('partitionValues', _STRING_MAP), ('size', pa.int64()),
+        ('modificationTime', pa.int64()), ('dataChange', pa.bool_()), ('stats', pa.string()),
+    ])),
+    ('remove', pa.struct([('path', pa.string()), ('deletionTimestamp', pa.int64()), ('dataChange', pa.bool_())])),
+    ('txn', pa.struct([('appId', pa.string()), ('version', pa.int64()), ('lastUpdated', pa.int64())])),
+])
+
+
+def checkpoint_actions(table: pa.Table) -> List[Dict[str, Any]]:
+    """Дії з checkpoint таблиці (власного чи записаного deltalake): map -> dict, без порожніх полів"""
+    columns = [name for name in ('protocol', 'metaData', 'add', 'remove', 'txn') if name in table.column_names]
+    actions = []
+    for row in table.select(columns).to_pylist():
+        for name, value in row.items():
+            if value is None:
+                continue
+            action = {key: item for key, item in value.items() if item is not None}
+            if name == 'add':
+                action['partitionValues'] = dict(action.get('partitionValues') or [])
+            elif name == 'metaData':
+                action['configuration'] = dict(action.get('configuration') or [])
+                action['partitionColumns'] = action.get('partitionColumns') or []
+                if 'format' in action:
+                    action['format'] = dict(action['format'], options=dict(action['format'].get('options') or []))
+            actions.append({name: action})
+    return actions
+
+
+class TableState:
+    """Стан таблиці на версію: protocol, metaData, активні файли, надгробки (remove) та транзакції записувачів (txn)"""
+
+    def __init__(self, version: int = -1):
+        self.version = version
+        self.protocol: Dict[str, Any] = None
+        self.metadata: Dict[str, Any] = None
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.tombstones: Dict[str, Dict[str, Any]] = {}
+        # appId -> остання дія txn: ідемпотентні записи, переживає checkpoint (на відміну від commitInfo)
+        self.transactions: Dict[str, Dict[str, Any]] = {}
+
+    def apply(self, actions: List[Dict[str, Any]], version: int):
+        """Дії коміту version поверх поточного стану"""
+        for action in actions:
+            if 'add' in action:
+                self.files[action['add']['path']] = action['add']
+                self.tombstones.pop(action['add']['path'], None)
+            elif 'remove' in action:
+                self.files.pop(action['remove']['path'], None)
+                self.tombstones[action['remove']['path']] = action['remove']
+            elif 'metaData' in action:
+                self.metadata = action['metaData']
+            elif 'protocol' in action:
+                self.protocol = action['protocol']
+            elif 'txn' in action:
+                self.transactions[action['txn']['appId']] = action['txn']
+        self.version = version
+
+    def copy(self) -> 'TableState':
+        state = TableState(self.version)
+        state.protocol, state.metadata = self.protocol, self.metadata
+        state.files, state.tombstones = dict(self.files), dict(self.tombstones)
+        state.transactions = dict(self.transactions)
+        return state
+
+    def actions(self) -> List[Dict[str, Any]]:
+        """Повний стан як дії checkpoint"""
+        actions = [{'protocol': self.protocol}] if self.protocol else []
+        if self.metadata:
+            actions.append({'metaData': self.metadata})
+        actions += [{'add': add} for add in self.files.values()]
+        actions += [{'remove': remove} for remove in self.tombstones.values()]
+        actions += [{'txn': txn} for txn in self.transactions.values()]
+        return actions
+
+    def checkpoint_table(self) -> pa.Table:
+        rows = []
+        for action in self.actions():
+            ((name, value),) = action.items()
+            if name == 'add' and isinstance(value.get('stats'), dict):
+                value = dict(value, stats=telemetry_json.dumps(value['stats'], pretty=False))
+            rows.append({name: value})
+        return pa.Table.from_pylist(rows, schema=CHECKPOINT_SCHEMA)
+
+
+class DeltaConflictError(RuntimeError):
+    """Версію, на яку розраховував коміт, вже зайняв інший записувач"""
+
+
+class DeltaLog:
+    """
+    Журнал транзакцій: кожна версія - файл _delta_log/NNNNNNNNNNNNNNNNNNNN.json з рядками дій.
+    Кожні checkpoint_interval комітів стан пишеться у NNNNNNNNNNNNNNNNNNNN.checkpoint.parquet.
+    """
+
+    def __init__(self, table_path: str, checkpoint_interval: int = CHECKPOINT_INTERVAL):
+        self.table_path = table_path
+        self.log_path = os.path.join(table_path, DELTA_LOG_DIR)
+        self.checkpoint_interval = checkpoint_interval
+        os.makedirs(self.log_path, exist_ok=True)
+
+    def version_path(self, version: int) -> str:
+        return os.path.join(self.log_path, f"{version:020d}.json")
+
+    def checkpoint_path(self, version: int) -> str:
+        return os.path.join(self.log_path, f"{version:020d}.checkpoint.parquet")
+
+    def latest_version(self) -> int:
+        """Остання версія таблиці (-1, якщо таблиці ще немає)"""
+        versions = [int(name[:20]) for name in os.listdir(self.log_path) if name.endswith('.json') and name[:20].isdigit()]
+        return max(versions, default=-1)
+
+    def _write_temp(self, actions: List[Dict[str, Any]]) -> str:
+        """Файл версії готується поруч під тимчасовим іменем"""
+        temp_path = os.path.join(self.log_path, f".tmp-{uuid.uuid4().hex}.json")
+        with open(temp_path, 'wb') as f:
+            f.write(b'\n'.join(telemetry_json.dumps_bytes(action, pretty=False) for action in actions) + b'\n')
+            f.flush()
+            os.fsync(f.fileno())
+        return temp_path
+
+    def read_actions(self, version: int) -> List[Dict[str, Any]]:
+        with open(self.version_path(version), 'rb') as f:
+            return [telemetry_json.loads(line) for line in f if line.strip()]
+
+    def last_checkpoint(self, version: int = None) -> int:
+        """Версія останнього checkpoint (не новішого за version); -1, якщо їх немає"""
+        if version is None:
+            try:
+                with open(os.path.join(self.log_path, LAST_CHECKPOINT), 'rb') as f:
+                    checkpoint = telemetry_json.loads(f.read())['version']
+                if os.path.exists(self.checkpoint_path(checkpoint)):
+                    return checkpoint
+            except (FileNotFoundError, ValueError, KeyError):
+                pass
+        versions = [int(name[:20]) for name in os.listdir(self.log_path)
+                    if name.endswith('.checkpoint.parquet') and name[:20].isdigit()]
+        return max((found for found in versions if version is None or found <= version), default=-1)
+
+    def read_checkpoint(self, version: int) -> List[Dict[str, Any]]:
+        return checkpoint_actions(pq.read_table(self.checkpoint_path(version)))
+
+    def state(self, version: int = None) -> TableState:
+        """Стан на версію: останній checkpoint і лише коміти після нього"""
+        version = self.latest_version() if version is None else version
+        checkpoint = self.last_checkpoint(version)
+        state = TableState()
+        if checkpoint >= 0:
+            state.apply(self.read_checkpoint(checkpoint), checkpoint)
+        for current in range(checkpoint + 1, version + 1):
+            state.apply(self.read_actions(current), current)
+        return state
+
+    def snapshot(self, version: int = None) -> Tuple[int, Dict[str, Dict[str, Any]]]:
+        """Активні файли на версію"""
+        state = self.state(version)
+        return state.version, state.files
+
+    def write_checkpoint(self, version: int = None) -> int:
+        """Parquet checkpoint стану на версію та _last_checkpoint (повторний запис тієї ж версії безпечний)"""
+        state = self.state(version)
+        table = state.checkpoint_table()
+        temp_path = os.path.join(self.log_path, f".tmp-{uuid.uuid4().hex}.parquet")
+        pq.write_table(table, temp_path, compression='zstd')
+        os.replace(temp_path, self.checkpoint_path(state.version))
+        if state.version >= self.last_checkpoint():
+            temp_path = os.path.join(self.log_path, f".tmp-{uuid.uuid4().hex}.json")
+            with open(temp_path, 'wb') as f:
+                f.write(telemetry_json.dumps_bytes({'version': state.version, 'size': table.num_rows}, pretty=False))
+            os.replace(temp_path, os.path.join(self.log_path, LAST_CHECKPOINT))
+        return state.version
+
+    def commit(self, actions: List[Dict[str, Any]], operation: str = "WRITE", max_attempts: int = 20,
+               read_version: int = None, operation_parameters: Dict[str, Any] = None) -> int:
+        """
+        Атомарний коміт наступної версії: os.link не перезаписує існуючу версію,
+        тому при конфлікті з іншим записувачем (append) береться наступна.
+        З read_version коміт можливий лише як read_version + 1, інакше DeltaConflictError.
+        """
+        commit_info = {'commitInfo': {'timestamp': int(time.time() * 1000), 'operation': operation,
+                                      'operationParameters': operation_parameters or {'mode': 'Append'},
+                                      'engineInfo': 'telemetry-local-sink', 'readVersion': read_version}}
+        temp_path = self._write_temp([commit_info] + actions)
+        try:
+            for _ in range(max_attempts):
+                version = self.latest_version() + 1 if read_version is None else read_version + 1
+                try:
+                    os.link(temp_path, self.version_path(version))
+                except FileExistsError:
+                    if read_version is not None:
+                        raise DeltaConflictError(f"Версія {version} таблиці {self.table_path} вже існує")
+                    continue
+                if self.checkpoint_interval and version % self.checkpoint_interval == 0:
+                    try:
+                        self.write_checkpoint(version)
+                    except Exception as e:
+                        print(f" Помилка створення checkpoint {self.table_path}@{version}: {e}")
+                return version
+            raise RuntimeError(f"Не вдалося закомітити після {max_attempts} спроб: {self.table_path}")
+        finally:
+            os.remove(temp_path)
+
+    def ensure_table(self, schema: pa.Schema, partition_columns: Sequence[str], name: str = None):
+        """Версія 0: protocol та metaData, якщо таблиця ще не створена"""
+        if self.latest_version() >= 0:
+            return
+        temp_path = self._write_temp([
+            {'protocol': {'minReaderVersion': 1, 'minWriterVersion': 2}},
+            {'metaData': {
+                'id': str(uuid.uuid4()),
+                'name': name,
+                'format': {'provider': 'parquet', 'options': {}},
+                'schemaString': delta_schema_string(schema),
+                'partitionColumns': list(partition_columns),
+                'configuration': {},
+                'createdTime': int(time.time() * 1000),
+            }},
+        ])
+        try:
+            os.link(temp_path, self.version_path(0))
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(temp_path)
+
+
+def partition_dir(columns: Sequence[str], values: Sequence[Any]) -> str:
+    """Відносна тека партиції: column=value/..., null - HIVE_DEFAULT_PARTITION"""
+    return '/'.join(f"{column}={HIVE_DEFAULT_PARTITION if value is None else value}"
+                    for column, value in zip(columns, values))
+
+
+def _column_stats(table: pa.Table) -> Dict[str, Any]:
+    """Статистика файлу для data skipping (numRecords, min/max, nullCount)"""
+    min_values, max_values, null_count = {}, {}, {}
+    for name in table.column_names:
+        column = table.column(name)
+        null_count[name] = column.null_count
+        if pa.types.is_boolean(column.type) or pa.types.is_binary(column.type):
+            continue
+        if pa.types.is_dictionary(column.type):
+            column = column.cast(column.type.value_type)
+        bounds = pc.min_max(column)
+        if bounds['min'].is_valid:
+            low, high = bounds['min'].as_py(), bounds['max'].as_py()
+            min_values[name] = low.isoformat() if hasattr(low, 'isoformat') else low
+            max_values[name] = high.isoformat() if hasattr(high, 'isoformat') else high
+    return {'numRecords': table.num_rows, 'minValues': min_values, 'maxValues': max_values, 'nullCount': null_count}
+
+
+def write_data_file(table_path: str, relative_dir: str, table: pa.Table, profile: StorageProfile,
+                    partition_values: Dict[str, Any] = None) -> Dict[str, Any]:
+    """Parquet файл у теці таблиці -> дія add для журналу"""
+    relative_path = f"{relative_dir}/" if relative_dir else ""
+    relative_path += f"part-{uuid.uuid4().hex}-c000.{profile.compression}.parquet"
+    full_path = os.path.join(table_path, relative_path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    profile.write_table(table, full_path)
+    return {'add': {
+        'path': relative_path,
+        'partitionValues': {column: None if value is None else str(value) for column, value in (partition_values or {}).items()},
+        'size': os.path.getsize(full_path),
+        'modificationTime': int(time.time() * 1000),
+        'dataChange': True,
+        'stats': telemetry_json.dumps(_column_stats(table), pretty=False),
+    }}
+
+
+def _read_data_file(table_path: str, add: Dict[str, Any], schema: pa.Schema = None) -> pa.Table:
+    """Файл даних; колонки партицій, яких немає у файлі, додаються зі значень дії add"""
+    table = pq.read_table(os.path.join(table_path, add['path']))
+    for column, value in (add.get('partitionValues') or {}).items():
+        if column not in table.column_names:
+            table = table.append_column(column, pa.array([value] * table.num_rows, pa.string()))
+    return table.select(schema.names).cast(schema) if schema is not None else table
+
+
+def read_local_table(table_path: str, schema: pa.Schema = None, version: int = None) -> pa.Table:
+    """Вміст локальної Delta таблиці (лише активні файли знімку)"""
+    _, files = DeltaLog(table_path).snapshot(version)
+    tables = [_read_data_file(table_path, files[path], schema) for path in sorted(files)]
+    if schema is not None:
+        return pa.concat_tables(tables) if tables else schema.empty_table()
+    return pa.concat_tables(tables) if tables else pa.table({})
+
+
+def merge_local_table(table_path: str, source: pa.Table, key: Union[str, Sequence[str]], order_by: str = None,
+                      profile: Union[str, StorageProfile, None] = None, max_attempts: int = 10,
+                      partition_by: Sequence[str] = ()) -> int:
+    """
+    Upsert у локальну таблицю: рядок джерела замінює рядок з тим самим ключем (колонка або кілька),
+    якщо його order_by не старший. Переписуються лише партиції, що є в джерелі (непартиціонована
+    таблиця - повністю), по файлу на партицію: remove старих + add нових в одному коміті; при
+    конфлікті з іншим записувачем злиття повторюється від нового знімку.
+    """
+    keys = (key,) if isinstance(key, str) else tuple(key)
+    partition_by = tuple(partition_by)
+    log = DeltaLog(table_path)
+    log.ensure_table(source.schema, partition_by, name=os.path.basename(table_path.rstrip('/')))
+    profile = get_profile(profile, table_path)
+    data_schema = pa.schema([field for field in source.schema if field.name not in partition_by])
+
+    def partition_of(values: Dict[str, Any]) -> Tuple:
+        return tuple(None if values.get(column) is None else str(values[column]) for column in partition_by)
+
+    source_rows = source.to_pylist()
+    touched = {partition_of(row) for row in source_rows}
+
+    for _ in range(max_attempts):
+        version, files = log.snapshot()
+        paths = [path for path, add in files.items() if partition_of(add.get('partitionValues') or {}) in touched]
+        partitions: Dict[Tuple, Dict[Tuple, Dict[str, Any]]] = {partition: {} for partition in touched}
+        for path in sorted(paths):
+            for row in _read_data_file(table_path, files[path], source.schema).to_pylist():
+                partitions[partition_of(row)][tuple(row[column] for column in keys)] = row
+        for row in source_rows:
+            rows = partitions[partition_of(row)]
+            row_key = tuple(row[column] for column in keys)
+            current = rows.get(row_key)
+            if current is None or order_by is None or current[order_by] is None or \
+                    (row[order_by] is not None and row[order_by] >= current[order_by]):
+                rows[row_key] = row
+
+        adds = []
+        try:
+            for partition, rows in partitions.items():
+                relative_dir = partition_dir(partition_by, partition)
+                merged = records_to_table([rows[row_key] for row_key in sorted(rows)], data_schema)
+                adds.append(write_data_file(table_path, relative_dir, merged, profile, dict(zip(partition_by, partition))))
+            now = int(time.time() * 1000)
+            removes = [{'remove': {'path': path, 'deletionTimestamp': now, 'dataChange': True}} for path in paths]
+            predicate = ' AND '.join(f"target.{column} = source.{column}" for column in keys)
+            return log.commit(removes + adds, operation="MERGE", read_version=version,
+                              operation_parameters={'predicate': predicate})
+        except DeltaConflictError:
+            for add in adds:
+                os.remove(os.path.join(table_path, add['add']['path']))
+    raise DeltaConflictError(f"Не вдалося злити зміни після {max_attempts} спроб: {table_path}")
+
+
+class LocalDeltaSink:
+    """
+    Буферизований запис у локальну Delta таблицю.
+
+    Записи накопичуються по партиціях; партиція скидається у Parquet файл, коли досягнуто
+    max_rows, оцінки max_bytes або max_age секунд. Усі файли одного скидання - один коміт.
+    Якщо запис файлів чи коміт не вдався, записи повертаються в буфери до наступного скидання;
+    записи, що не приводяться до схеми, відкладаються у _rejected/*.jsonl, а не губляться.
+    """
+
+    def __init__(self, table_path: str, schema: pa.Schema = None,
+                 partition_by: Sequence[str] = DEFAULT_PARTITION_BY, max_rows: int = 50_000,
+                 max_bytes: int = 32 * 1024 * 1024, max_age: float = 30.0,
+                 profile: Union[str, StorageProfile, None] = None):
+        self.table_path = table_path
+        self.schema = schema or get_schema(TELEMETRY_TABLE)
+        self.partition_by = tuple(partition_by)
+        self.data_schema = pa.schema([field for field in self.schema if field.name not in self.partition_by])
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        # Профіль Parquet: явний, або з TELEMETRY_STORAGE_PROFILE, або закріплений за таблицею
+        self.profile = get_profile(profile, table_path)
+
+        self.log = DeltaLog(table_path)
+        self.log.ensure_table(self.schema, self.partition_by, name=os.path.basename(table_path.rstrip('/')))
+
+        self._lock = threading.Lock()
+        self._buffers: Dict[Tuple, List[Dict[str, Any]]] = {}
+        self._opened_at: Dict[Tuple, float] = {}
+        # Оцінка розміру рядка в Parquet, уточнюється після кожного файлу
+        self._bytes_per_row = 200.0
+
+        self.files_written = 0
+        self.rows_written = 0
+        self.commits = 0
+        self.rows_rejected = 0
+        self.failed_commits = 0
+
+        self._stop = threading.Event()
+        self._timer = threading.Thread(target=self._age_loop, name="delta-sink-roller", daemon=True)
+        self._timer.start()
+
+    def write(self, records: List[Dict[str, Any]]):
+        """Додавання записів до буферів партицій; повні партиції скидаються одразу"""
+        ready = []
+        with self._lock:
+            for record in records:
+                key = tuple(record.get(column) for column in self.partition_by)
+                buffer = self._buffers.get(key)
+                if buffer is None:
+                    buffer = self._buffers[key] = []
+                    self._opened_at[key] = time.monotonic()
+                buffer.append(record)
+                if len(buffer) >= self.max_rows or len(buffer) * self._bytes_per_row >= self.max_bytes:
+                    ready.append(self._take(key))
+        if ready:
+            self._commit_files(ready)
+
+    def _take(self, key: Tuple) -> Tuple[Tuple, List[Dict[str, Any]]]:
+        self._opened_at.pop(key, None)
+        return key, self._buffers.pop(key)
+
+    def flush(self):
+        """Скидання всіх буферів одним комітом"""
+        with self._lock:
+            ready = [self._take(key) for key in list(self._buffers)]
+        if ready:
+            self._commit_files(ready)
+
+    def flush_expired(self):
+        """Скидання партицій, старших за max_age"""
+        now = time.monotonic()
+        with self._lock:
+            ready = [self._take(key) for key, opened in list(self._opened_at.items()) if now - opened >= self.max_age]
+        if ready:
+            self._commit_files(ready)
+
+    def _partition_path(self, key: Tuple) -> str:
+        return partition_dir(self.partition_by, key)
+
+    def _to_table(self, records: List[Dict[str, Any]]) -> Tuple[Optional[pa.Table], List[Dict[str, Any]]]:
+        """(таблиця придатних записів, записи, що не приводяться до схеми); поштучно - лише після помилки пакета"""
+        try:
+            return records_to_table(records, self.data_schema), []
+        except Exception:
+            pass
+        good, bad = [], []
+        for record in records:
+            try:
+                records_to_table([record], self.data_schema)
+                good.append(record)
+            except Exception as e:
+                bad.append({'error': str(e), 'record': record})
+        return (records_to_table(good, self.data_schema) if good else None), bad
+
+    def _reject(self, entries: List[Dict[str, Any]], reason: str):
+        """Відкладення записів у _rejected/<час>-<uuid>.jsonl для розбору та повторного завантаження"""
+        directory = os.path.join(self.table_path, REJECTED_DIR)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}.jsonl")
+        with open(path, 'wb') as f:
+            for entry in entries:
+                f.write(telemetry_json.dumps_bytes({'reason': reason, **entry}, pretty=False) + b'\n')
+        self.rows_rejected += len(entries)
+        print(f" Delta: {len(entries)} записів відкладено ({reason}) -> {path}")
+
+    def _restore(self, partitions: List[Tuple[Tuple, List[Dict[str, Any]]]]):
+        """Повернення записів у буфери (перед новішими) після невдалого скидання"""
+        with self._lock:
+            for key, records in partitions:
+                self._buffers[key] = records + self._buffers.get(key, [])
+                self._opened_at[key] = time.monotonic()
+
+    def _commit_files(self, partitions: List[Tuple[Tuple, List[Dict[str, Any]]]]):
+        # Приведення до схеми: непридатні записи відкладаються, решта комітиться
+        prepared = []
+        for key, records in partitions:
+            table, rejected = self._to_table(records)
+            if rejected:
+                self._reject(rejected, 'schema')
+                rejected_ids = {id(entry['record']) for entry in rejected}
+                records = [record for record in records if id(record) not in rejected_ids]
+            if table is not None:
+                prepared.append((key, records, table))
+        if not prepared:
+            return
+
+        actions = []
+        try:
+            for key, _, table in prepared:
+                action = write_data_file(self.table_path, self._partition_path(key), table, self.profile,
+                                         dict(zip(self.partition_by, key)))
+                self._bytes_per_row = max(1.0, action['add']['size'] / table.num_rows)
+                actions.append(action)
+            version = self.log.commit(actions)
+        except Exception as e:
+            # Незакомічені файли читачам не видимі - прибираються; записи чекають наступного скидання
+            for action in actions:
+                try:
+                    os.remove(os.path.join(self.table_path, action['add']['path']))
+                except OSError:
+                    pass
+            self.failed_commits += 1
+            self._restore([(key, records) for key, records, _ in prepared])
+            print(f" Delta: помилка скидання {self.table_path}, "
+                  f"{sum(len(records) for _, records, _ in prepared)} записів повернуто в буфер: {e}")
+            return
+
+        rows = sum(table.num_rows for _, _, table in prepared)
+        self.files_written += len(actions)
+        self.rows_written += rows
+        self.commits += 1
+        print(f" Delta: версія {version}, {len(actions)} файлів, {rows} записів -> {self.table_path}")
+
+    def _age_loop(self):
+        interval = max(0.1, self.max_age / 2)
+        while not self._stop.wait(interval):
+            try:
+                self.flush_expired()
+            except Exception as e:
+                print(f" Delta: помилка скидання буферів: {e}")
+
+    def close(self):
+        """Зупинка таймера та скидання залишку; те, що так і не закомітилось, відкладається в _rejected"""
+        self._stop.set()
+        self._timer.join()
+        self.flush()
+        with self._lock:
+            left = [self._take(key) for key in list(self._buffers)]
+        if left:
+            self._reject([{'record': record} for _, records in left for record in records], 'unflushed')
\ No newline at end of file
@@ -0,0 +1,189 @@
+"""
+Джерела журналу Delta таблиць (локальна тека, Azure Blob) та знімок стану, що оновлюється
+лише новими комітами після останньої відомої версії
+"""
+
+import os
+import threading
+from typing import Dict, Any, Iterator, List, Sequence, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import telemetry_json
+from telemetry_delta_sink import DELTA_LOG_DIR, DeltaLog, TableState, checkpoint_actions
+
+DEFAULT_BATCH_ROWS = 65_536
+
+# Примітивні типи схеми Delta -> Arrow (для колонок партицій, яких немає у файлах)
+_PARTITION_TYPES = {
+    'string': pa.string(), 'long': pa.int64(), 'integer': pa.int32(), 'short': pa.int16(), 'byte': pa.int8(),
+    'double': pa.float64(), 'float': pa.float32(), 'boolean': pa.bool_(), 'date': pa.date32(),
+}
+
+
+def partition_types(metadata: Dict[str, Any]) -> Dict[str, pa.DataType]:
+    """Arrow типи колонок партицій з дії metaData"""
+    if not metadata:
+        return {}
+    types = {field['name']: field['type'] for field in telemetry_json.loads(metadata['schemaString'])['fields']}
+    return {column: _PARTITION_TYPES.get(types.get(column), pa.string())
+            for column in metadata.get('partitionColumns', [])}
+
+
+def file_batches(path: str, add: Dict[str, Any], columns: Sequence[str] = None,
+                 types: Dict[str, pa.DataType] = None, batch_rows: int = DEFAULT_BATCH_ROWS,
+                 row_groups: Sequence[int] = None) -> Iterator[pa.RecordBatch]:
+    """Arrow пакети файлу даних; колонки партицій додаються зі значень дії add"""
+    partition_values = add.get('partitionValues') or {}
+    parquet = pq.ParquetFile(path)
+    names = parquet.schema_arrow.names
+    file_columns = None if columns is None else [name for name in columns if name in names]
+    for batch in parquet.iter_batches(batch_size=batch_rows, columns=file_columns, row_groups=row_groups):
+        for column, value in partition_values.items():
+            if column in names or (columns is not None and column not in columns):
+                continue
+            arrow_type = (types or {}).get(column, pa.string())
+            batch = batch.append_column(column, pa.array([value] * batch.num_rows, pa.string()).cast(arrow_type))
+        yield batch
+
+
+class LocalDeltaSource:
+    """Журнал і файли локальної Delta таблиці"""
+
+    def __init__(self, table_path: str):
+        self.table_path = table_path
+        self.name = os.path.basename(table_path.rstrip('/'))
+        self.log = DeltaLog(table_path)
+
+    def list_log(self) -> Tuple[int, int]:
+        """(остання версія, версія останнього checkpoint)"""
+        return self.log.latest_version(), self.log.last_checkpoint()
+
+    def latest_version(self) -> int:
+        return self.log.latest_version()
+
+    def read_actions(self, version: int) -> List[Dict[str, Any]]:
+        return self.log.read_actions(version)
+
+    def read_checkpoint(self, version: int) -> List[Dict[str, Any]]:
+        return self.log.read_checkpoint(version)
+
+    def file_path(self, add: Dict[str, Any]) -> str:
+        return os.path.join(self.table_path, add['path'])
+
+    def file_metadata(self, add: Dict[str, Any]) -> pq.FileMetaData:
+        return pq.read_metadata(self.file_path(add))
+
+
+class BlobDeltaSource:
+    """Журнал і файли Delta таблиці в Azure Blob; файли читаються через локальний кеш ParquetFileCache"""
+
+    def __init__(self, blob_service, container: str, table_path: str, file_cache):
+        self.container_client = blob_service.get_container_client(container)
+        self.blob_service = blob_service
+        self.container = container
+        self.table_path = table_path.rstrip('/')
+        self.name = self.table_path.rsplit('/', 1)[-1]
+        self.file_cache = file_cache
+        # Версія -> blob імена частин checkpoint (з останнього переліку)
+        self._checkpoints: Dict[int, List[str]] = {}
+
+    def list_log(self) -> Tuple[int, int]:
+        """(остання версія, версія останнього повного checkpoint) одним переліком _delta_log"""
+        version = -1
+        parts: Dict[int, List[str]] = {}
+        expected: Dict[int, int] = {}
+        for name in self.container_client.list_blob_names(name_starts_with=f"{self.table_path}/{DELTA_LOG_DIR}/"):
+            file_name = name.rsplit('/', 1)[-1]
+            if not file_name[:20].isdigit():
+                continue
+            if file_name.endswith('.json'):
+                version = max(version, int(file_name[:20]))
+            elif '.checkpoint.' in file_name and file_name.endswith('.parquet'):
+                # Одним файлом: N.checkpoint.parquet; частинами: N.checkpoint.0000000001.0000000003.parquet
+                fields = file_name.split('.')
+                parts.setdefault(int(file_name[:20]), []).append(name)
+                expected[int(file_name[:20])] = int(fields[3]) if len(fields) == 5 else 1
+        self._checkpoints = {found: sorted(names) for found, names in parts.items() if len(names) == expected[found]}
+        return version, max(self._checkpoints, default=-1)
+
+    def latest_version(self) -> int:
+        return self.list_log()[0]
+
+    def read_actions(self, version: int) -> List[Dict[str, Any]]:
+        blob = self.blob_service.get_blob_client(container=self.container,
+                                                 blob=f"{self.table_path}/{DELTA_LOG_DIR}/{version:020d}.json")
+        return [telemetry_json.loads(line) for line in blob.download_blob().readall().splitlines() if line.strip()]
+
+    def read_checkpoint(self, version: int) -> List[Dict[str, Any]]:
+        if version not in self._checkpoints:
+            self.list_log()
+        actions = []
+        for blob_name in self._checkpoints[version]:
+            blob = self.blob_service.get_blob_client(container=self.container, blob=blob_name)
+            # Checkpoint версії не змінюється, тож кешується за самим іменем
+            path = self.file_cache.file_path(blob_name, '', lambda: blob.download_blob().readall())
+            actions += checkpoint_actions(pq.read_table(path))
+        return actions
+
+    @staticmethod
+    def _etag(add: Dict[str, Any]) -> str:
+        """Файли даних Delta незмінні, тож розмір і час зміни з дії add замінюють etag (без запиту властивостей)"""
+        return f"{add.get('size')}-{add.get('modificationTime')}"
+
+    def file_path(self, add: Dict[str, Any]) -> str:
+        blob_name = f"{self.table_path}/{add['path']}"
+        blob = self.blob_service.get_blob_client(container=self.container, blob=blob_name)
+        return self.file_cache.file_path(blob_name, self._etag(add), lambda: blob.download_blob().readall())
+
+    def file_metadata(self, add: Dict[str, Any]) -> pq.FileMetaData:
+        """Футер файлу: з кешу або хвостом blob (1-2 запити діапазону), без завантаження даних"""
+        blob_name = f"{self.table_path}/{add['path']}"
+        blob = self.blob_service.get_blob_client(container=self.container, blob=blob_name)
+        return self.file_cache.metadata(
+            blob_name, self._etag(add), add['size'],
+            lambda offset, length: blob.download_blob(offset=offset, length=length).readall()
+        )
+
+
+class CachedSnapshot:
+    """
+    Знімок таблиці в пам'яті. refresh() переліком журналу дізнається останню версію і читає лише
+    коміти після відомої; якщо відстав більше, ніж до нового checkpoint, - спершу checkpoint.
+    Кожне оновлення дає новий TableState, тож уже виданий стан не змінюється під читачем.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self._state = TableState()
+        self._lock = threading.Lock()
+
+        self.checkpoints_read = 0
+        self.commits_read = 0
+
+    @property
+    def state(self) -> TableState:
+        return self._state
+
+    def refresh(self) -> TableState:
+        with self._lock:
+            latest, checkpoint = self.source.list_log()
+            if latest <= self._state.version:
+                return self._state
+            if checkpoint > self._state.version:
+                state = TableState()
+                state.apply(self.source.read_checkpoint(checkpoint), checkpoint)
+                self.checkpoints_read += 1
+            else:
+                state = self._state.copy()
+            for version in range(state.version + 1, latest + 1):
+                state.apply(self.source.read_actions(version), version)
+                self.commits_read += 1
+            self._state = state
+            return state
+
+    def stats(self) -> Dict[str, Any]:
+        state = self._state
+        return {'version': state.version, 'files': len(state.files), 'checkpoints_read': self.checkpoints_read,
+                'commits_read': self.commits_read}
\ No newline at end of file
@@ -2,16 +2,66 @@
 Демонстрація збагачення телеметричних даних
 """
 
-import json
 import os
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+from telemetry_metrics import calculate_metrics
+from telemetry_quality import TelemetryValidator, QuarantineWriter, DEFAULT_QUARANTINE_THRESHOLD
+from telemetry_pipeline import TelemetryPipeline, PipelineStage
+from telemetry_codec import decode_event
+from telemetry_delta_sink import LocalDeltaSink, merge_local_table
+from telemetry_schemas import TELEMETRY_TABLE, CURRENT_STATE_TABLE, ALERTS_TABLE, build_table, get_schema
+from telemetry_current_state import CurrentStateTracker
+from telemetry_anomalies import AnomalyDetector
+from telemetry_rollups import RollupAggregator, LocalRollupWriter
+import telemetry_json
+
+# Локальна копія таблиці delta-lake-turbine-telemetry
+LOCAL_DELTA_TABLE_PATH = f"delta_lake_output/{TELEMETRY_TABLE}"
+
 
 class TelemetryEnricher:
-    """Збагачувач телеметричних даних (локальна версія Azure Function)"""
+    """
+    Збагачувач телеметричних даних (локальна версія Azure Function).
     
-    def __init__(self):
+    enrich_only=True - лише збагачення (enrich_batch_flat) для воркерів ShardedEnrichmentPool: без Delta
+    приймачів, агрегатів, поточного стану та детектора аномалій, що пишуть спільні таблиці й контрольну точку
+    """
+    
+    def __init__(self, enrich_only: bool = False):
         self.load_metadata_from_files()
+        self.enrich_only = enrich_only
+        
+        # Демо-повідомлення мають фіксовані історичні мітки часу, тому застарілість не перевіряється
+        self.validator = TelemetryValidator(max_staleness_seconds=None)
+        self.quarantine = QuarantineWriter(self._write_quarantine_batch, flush_interval=1.0)
+        if enrich_only:
+            self.delta_sink = self.rollup_writer = self.rollups = self.current_state = None
+            self.alerts_sink = self.anomalies = None
+            return
+        # Колонковий запис: буфер по партиціях, Parquet файли та журнал _delta_log
+        self.delta_sink = LocalDeltaSink(LOCAL_DELTA_TABLE_PATH, get_schema(TELEMETRY_TABLE))
+        # Агрегати 1 хв / 10 хв / 1 год ведуться на льоту і пишуться, коли вікно закривається
+        self.rollup_writer = LocalRollupWriter()
+        self.rollups = RollupAggregator(self.rollup_writer)
+        # Останній стан турбін: пошук у пам'яті, змінені рядки зливаються в turbine_current_state пакетом
+        self.current_state = CurrentStateTracker(self._merge_current_state)
+        # Онлайн-детектор аномалій після збагачення; стан зберігається у контрольній точці
+        self.alerts_sink = LocalDeltaSink(f"delta_lake_output/{ALERTS_TABLE}", get_schema(ALERTS_TABLE))
+        self.anomalies = AnomalyDetector(self.alerts_sink.write)
+    
+    def close(self):
+        """Скидання буферів карантину та Delta таблиць, збереження відкритих вікон агрегатів і стану детектора"""
+        self.quarantine.close()
+        if self.enrich_only:
+            return
+        self.rollups.close()
+        self.rollup_writer.close()
+        self.current_state.close()
+        self.anomalies.close()
+        self.alerts_sink.close()
+        self.delta_sink.close()
     
     def load_metadata_from_files(self):
         """Завантаження метаданих з файлового кешу (з реальної Azure SQL DB)"""
@@ -29,17 +79,17 @@ class TelemetryEnricher:
             
             # Турбіни з реальної SQL бази
             with open(f"{cache_dir}/turbines_lookup.json", 'r', encoding='utf-8') as f:
-                turbines_data = json.load(f)
+                turbines_data = telemetry_json.load(f)
                 self.turbines_metadata = turbines_data.get('data', {})
             
             # Сенсори з реальної SQL бази
             with open(f"{cache_dir}/sensors_lookup.json", 'r', encoding='utf-8') as f:
-                sensors_data = json.load(f)
+                sensors_data = telemetry_json.load(f)
                 self.sensors_metadata = sensors_data.get('data', {})
             
             # Турбіни-сенсори з реальної SQL бази
             with open(f"{cache_dir}/turbine_sensors_lookup.json", 'r', encoding='utf-8') as f:
-                turbine_sensors_data = json.load(f)
+                turbine_sensors_data = telemetry_json.load(f)
                 self.turbine_sensors = turbine_sensors_data.get('data', {})
             
             print("метадані завантажені з Azure SQL Database (через файловий кеш)")
@@ -65,7 +115,7 @@ class TelemetryEnricher:
             self.sensors_metadata = {}
             self.turbine_sensors = {}
     
-    def process_telemetry_message(self, telemetry_data: Dict[str, Any]) -> Dict[str, Any]:
+    def process_telemetry_message(self, telemetry_data: Dict[str, Any], quality: Tuple[float, int] = None) -> Optional[Dict[str, Any]]:
         """
         Основна функція обробки телеметрії 
         """
@@ -76,8 +126,14 @@ class TelemetryEnricher:
         print(f"   Потужність: {telemetry_data.get('output_power', 0)} кВт")
         print(f"   RPM: {telemetry_data.get('rotor_rpm', 0)}")
         
+        quality_score, quality_flags = quality or self._calculate_data_quality(telemetry_data)
+        if quality_score < DEFAULT_QUARANTINE_THRESHOLD:
+            print(f" Запис {turbine_id} відправлено у карантин (якість {quality_score})")
+            self.quarantine.submit(telemetry_data, quality_flags, quality_score)
+            return None
+        
         # Збагачення даних метаданими
-        enriched_data = self.enrich_telemetry_data(telemetry_data)
+        enriched_data = self.enrich_telemetry_data(telemetry_data, (quality_score, quality_flags))
         
         # Збереження у "Delta Lake" (імітація)
         self.save_to_delta_lake(enriched_data)
@@ -86,10 +142,64 @@ class TelemetryEnricher:
         
         return enriched_data
     
-    def enrich_telemetry_data(self, telemetry_data: Dict[str, Any]) -> Dict[str, Any]:
+    def process_telemetry_batch(self, messages: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """Обробка пакету телеметрії з однією векторизованою перевіркою якості"""
+        quality = self.validator.validate(messages)
+        
+        return [
+            self.process_telemetry_message(telemetry, (float(score), int(flags)))
+            for telemetry, score, flags in zip(messages, quality['quality_score'], quality['violation_mask'])
+        ]
+    
+    def process_events(self, events: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """Обробка подій Event Hub: декодування тіла за contentType (JSON, msgpack, Arrow IPC)"""
+        messages = []
+        for event in events:
+            try:
+                messages.extend(decode_event(event))
+            except Exception as e:
+                print(f" Помилка декодування події {event.get('sequenceNumber', '?')} ({event.get('contentType')}): {e}")
+        
+        return self.process_telemetry_batch(messages)
+    
+    def _quality_stage(self, telemetry_data: Dict[str, Any]):
+        """Етап конвеєра: перевірка якості, відбраковані записи - у карантин"""
+        quality_score, quality_flags = self._calculate_data_quality(telemetry_data)
+        if quality_score < DEFAULT_QUARANTINE_THRESHOLD:
+            self.quarantine.submit(telemetry_data, quality_flags, quality_score)
+            return None
+        return telemetry_data, (quality_score, quality_flags)
+    
+    def _write_stage(self, enriched_data: Dict[str, Any]) -> Dict[str, Any]:
+        self.save_to_delta_lake(enriched_data)
+        return enriched_data
+    
+    def build_pipeline(self, write_concurrency: int = 2, queue_size: int = 100,
+                       report_interval: float = None) -> TelemetryPipeline:
+        """Конвеєр: перевірка якості -> збагачення з кешу -> запис файлів"""
+        return TelemetryPipeline([
+            PipelineStage('quality', self._quality_stage, queue_size=queue_size, run_in_thread=False),
+            # Збагачення з локального кешу в пам'яті не блокує, тому виконується в event loop
+            PipelineStage('enrich', lambda item: self.enrich_telemetry_data(*item),
+                          queue_size=queue_size, run_in_thread=False),
+            PipelineStage('write', self._write_stage,
+                          concurrency=write_concurrency, queue_size=queue_size),
+        ], report_interval=report_interval)
+    
+    def process_telemetry_pipeline(self, messages: List[Dict[str, Any]], **pipeline_options) -> Dict[str, Any]:
+        """Обробка пакету через конвеєр: перевірка якості, збагачення і запис перекриваються в часі"""
+        pipeline = self.build_pipeline(**pipeline_options)
+        stats = pipeline.run_sync(messages)
+        
+        print(f"\n Конвеєр завершено за {stats['elapsed_seconds']} с")
+        pipeline.print_gauges()
+        return stats
+    
+    def enrich_telemetry_data(self, telemetry_data: Dict[str, Any], quality: Tuple[float, int] = None) -> Dict[str, Any]:
         """Збагачення телеметричних даних метаданими"""
         
         turbine_id = telemetry_data.get('turbine_id')
+        quality_score, quality_flags = quality or self._calculate_data_quality(telemetry_data)
         
         # Отримання метаданих турбіни з файлового кешу
         turbine_metadata = self.turbines_metadata.get(turbine_id, {})
@@ -123,7 +233,8 @@ class TelemetryEnricher:
             # Інформація про збагачення
             'enrichment_info': {
                 'processing_timestamp': datetime.utcnow().isoformat(),
-                'data_quality_score': self._calculate_data_quality(telemetry_data),
+                'data_quality_score': quality_score,
+                'quality_flags': quality_flags,
                 'enrichment_version': '1.0',
                 'source': 'Azure SQL Database via File Cache',
                 'processed_by': 'Local Telemetry Enricher (замість Azure Functions)'
@@ -180,82 +291,104 @@ class TelemetryEnricher:
     
     def _calculate_derived_metrics(self, telemetry_data: Dict[str, Any], turbine_metadata: Dict[str, Any]) -> Dict[str, Any]:
         """Розрахунок додаткових метрик"""
-        derived_metrics = {}
-        
         try:
-            # Ефективність турбіни
-            if 'output_power' in telemetry_data and 'nominal_power_kw' in turbine_metadata:
-                output_power = float(telemetry_data['output_power'])
-                nominal_power = float(turbine_metadata['nominal_power_kw'])
-                derived_metrics['efficiency_percent'] = round((output_power / nominal_power) * 100, 2) if nominal_power > 0 else 0
-            
-            # Статус роботи
-            if 'output_power' in telemetry_data:
-                output_power = float(telemetry_data['output_power'])
-                if output_power > 100:
-                    derived_metrics['operational_status'] = 'generating'
-                elif output_power > 0:
-                    derived_metrics['operational_status'] = 'low_generation'
-                else:
-                    derived_metrics['operational_status'] = 'stopped'
-            
-            # Електрична потужність (P = V * I * cos(φ))
-            if all(field in telemetry_data for field in ['voltage', 'current', 'power_factor']):
-                voltage = float(telemetry_data['voltage'])
-                current = float(telemetry_data['current'])
-                power_factor = float(telemetry_data['power_factor'])
-                calculated_power = (voltage * current * power_factor) / 1000  # кВт
-                derived_metrics['calculated_power_kw'] = round(calculated_power, 2)
-        
+            # Електрична потужність (P = V * I * cos(φ)) - однофазний варіант формули
+            return calculate_metrics(telemetry_data, turbine_metadata.get('nominal_power_kw'), variant='single_phase')
         except (ValueError, TypeError) as e:
             print(f" Помилка розрахунку метрик: {e}")
-        
-        return derived_metrics
+            return {}
     
-    def _calculate_data_quality(self, telemetry_data: Dict[str, Any]) -> float:
-        """Розрахунок якості даних (0.0 - 1.0)"""
-        quality_score = 1.0
+    def _calculate_data_quality(self, telemetry_data: Dict[str, Any]) -> Tuple[float, int]:
+        """Розрахунок якості даних (0.0 - 1.0) та маски порушень за SENSOR_RANGES"""
+        quality = self.validator.validate([telemetry_data])
+        return float(quality['quality_score'][0]), int(quality['violation_mask'][0])
+    
+    def _write_quarantine_batch(self, records: List[Dict[str, Any]]):
+        """Дописування відбракованих записів у локальну карантинну таблицю (JSON Lines)"""
+        quarantine_dir = "delta_lake_output/quarantine"
+        os.makedirs(quarantine_dir, exist_ok=True)
         
-        # Перевірка наявності обов'язкових полів
-        required_fields = ['turbine_id', 'timestamp', 'output_power']
-        for field in required_fields:
-            if field not in telemetry_data or telemetry_data[field] is None:
-                quality_score -= 0.2
+        # Воркери пулу пишуть кожен у свій файл, щоб рядки різних процесів не перемішувались
+        suffix = f"-{os.getpid()}" if self.enrich_only else ""
+        filepath = os.path.join(quarantine_dir, f"quarantine_{datetime.utcnow().strftime('%Y%m%d')}{suffix}.jsonl")
+        with open(filepath, 'a', encoding='utf-8') as f:
+            for record in records:
+                f.write(telemetry_json.dumps(record, pretty=False) + '\n')
         
-        return max(0.0, min(1.0, quality_score))
+        print(f" Карантин: {len(records)} записів -> {filepath}")
+    
+    def _merge_current_state(self, rows: List[Dict[str, Any]]):
+        """MERGE змінених станів у локальну таблицю turbine_current_state"""
+        merge_local_table(f"delta_lake_output/{CURRENT_STATE_TABLE}", build_table(CURRENT_STATE_TABLE, rows),
+                          key='turbine_id', order_by='timestamp')
     
     def save_to_delta_lake(self, enriched_data: Dict[str, Any]):
-        """Імітація збереження у Delta Lake"""
-        
-        # Створення структури Delta Lake
+        """Збереження у локальну Delta таблицю (запис буферизується і пишеться у Parquet пакетами)"""
+        flat_data = self.prepare_flat_data(enriched_data)
+        self.delta_sink.write([flat_data])
+        self.rollups.update([flat_data])
+        self.current_state.update([flat_data])
+        self.anomalies.process([flat_data])
+    
+    def prepare_flat_data(self, enriched_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Плоский запис (колонки як у Delta таблиці delta-lake-turbine-telemetry)"""
         current_time = datetime.utcnow()
         turbine_id = enriched_data.get('turbine_id', 'unknown')
+        turbine_meta = enriched_data.get('turbine_metadata', {})
+        calc_metrics = enriched_data.get('calculated_metrics', {})
+        enrichment_info = enriched_data.get('enrichment_info', {})
         
-        # Delta Lake партиціонування
-        partition_path = f"year={current_time.year}/month={current_time.month:02d}/day={current_time.day:02d}/turbine_id={turbine_id}"
-        
-        # Створення директорії (імітація Azure Storage)
-        delta_dir = f"delta_lake_output/{partition_path}"
-        os.makedirs(delta_dir, exist_ok=True)
-        
-        # Збереження JSON файлу (імітація Delta Lake)
-        filename = f"enriched_data_{current_time.strftime('%H%M%S_%f')}.json"
-        filepath = os.path.join(delta_dir, filename)
-        
-        # Додаємо Delta Lake метадані
-        enriched_data['_delta_metadata'] = {
+        return {
+            'record_id': f"{turbine_id}_{current_time.strftime('%Y%m%d_%H%M%S_%f')[:-3]}",
+            'turbine_id': turbine_id,
+            'timestamp': enriched_data.get('timestamp', ''),
+            'processing_timestamp': enrichment_info.get('processing_timestamp', current_time.isoformat()),
+            
+            'output_power': float(enriched_data.get('output_power') or 0),
+            'rotor_rpm': float(enriched_data.get('rotor_rpm') or 0),
+            'max_power_limit': float(enriched_data.get('max_power_limit') or 0),
+            'voltage': float(enriched_data.get('voltage') or 0),
+            'current': float(enriched_data.get('current') or 0),
+            'power_factor': float(enriched_data.get('power_factor') or 0),
+            
             'partition_year': current_time.year,
             'partition_month': current_time.month,
             'partition_day': current_time.day,
-            'partition_turbine': turbine_id,
-            'file_format': 'json',
-            'schema_version': '1.0'
+            
+            'turbine_name': str(turbine_meta.get('turbine_name') or ''),
+            'location_lat': float(turbine_meta.get('location_lat') or 0),
+            'location_lng': float(turbine_meta.get('location_lng') or 0),
+            'manufacturer': str(turbine_meta.get('manufacturer') or ''),
+            'model': str(turbine_meta.get('model') or ''),
+            'nominal_power_kw': int(turbine_meta.get('nominal_power_kw') or 0),
+            'installation_date': str(turbine_meta.get('installation_date') or ''),
+            'turbine_status': str(turbine_meta.get('status') or ''),
+            
+            'efficiency_percent': float(calc_metrics.get('efficiency_percent', 0)),
+            'operational_status': str(calc_metrics.get('operational_status', '')),
+            'calculated_power_kw': float(calc_metrics.get('calculated_power_kw', 0)),
+            
+            'data_quality_score': float(enrichment_info.get('data_quality_score', 1.0)),
+            'quality_flags': int(enrichment_info.get('quality_flags', 0)),
+            'enrichment_version': str(enrichment_info.get('enrichment_version', '')),
         }
+    
+    def enrich_batch_flat(self, messages: List[Dict[str, Any]], passthrough: Sequence[str] = ()) -> List[Dict[str, Any]]:
+        """Збагачення пакету без запису: перевірка якості, метадані, плоскі записи (+ поля passthrough з повідомлення)"""
+        quality = self.validator.validate(messages)
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(enriched_data, f, ensure_ascii=False, indent=2)
+        flat_records = []
+        for telemetry, score, flags in zip(messages, quality['quality_score'], quality['violation_mask']):
+            if score < DEFAULT_QUARANTINE_THRESHOLD:
+                self.quarantine.submit(telemetry, int(flags), float(score))
+                continue
+            enriched_data = self.enrich_telemetry_data(telemetry, (float(score), int(flags)))
+            flat_record = self.prepare_flat_data(enriched_data)
+            for field in passthrough:
+                flat_record[field] = telemetry.get(field)
+            flat_records.append(flat_record)
         
-        print(f" Збережено у Delta Lake: {filepath}")
+        return flat_records
 
 def simulate_telemetry_processing():
     """Симуляція обробки телеметрії з РЕАЛЬНИМИ даними з Azure SQL DB"""
@@ -297,12 +430,15 @@ def simulate_telemetry_processing():
         }
         test_telemetry.append(telemetry)
     
-    # Обробка кожного повідомлення телеметрії
-    for i, telemetry in enumerate(test_telemetry, 1):
+    # Обробка пакету телеметрії (імітує Azure Function)
+    enriched_results = enricher.process_telemetry_batch(test_telemetry)
+    
+    for i, enriched_result in enumerate(enriched_results, 1):
         print(f"\n Тестове повідомлення {i} (РЕАЛЬНА турбіна з SQL):")
         
-        # Обробка телеметрії (імітує Azure Function)
-        enriched_result = enricher.process_telemetry_message(telemetry)
+        if enriched_result is None:
+            print("   Запис не пройшов перевірку якості і перенесений у карантин")
+            continue
         
         # Показуємо результат збагачення даними
         turbine_meta = enriched_result['turbine_metadata']
@@ -325,8 +461,10 @@ def simulate_telemetry_processing():
             for param, sensor_info in list(sensor_meta.items())[:2]:
                 print(f"     - {param}: {sensor_info.get('sensor_name', 'N/A')} ({sensor_info.get('unit_of_measurement', 'N/A')})")
     
+    enricher.close()
+    
     print(f"\n Демонстрація завершена!")
-    print(" Перевірте папку 'delta_lake_output' для збережених файлів")
+    print(f" Перевірте Delta таблицю '{LOCAL_DELTA_TABLE_PATH}' для збережених файлів")
     print(" Використані РЕАЛЬНІ метадані з Azure SQL Database WindFarmDB")
     
     # Показуємо статистику використаних даних
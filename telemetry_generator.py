@@ -0,0 +1,173 @@
+"""
+Детермінована генерація телеметрії: незалежний потік NumPy для кожної турбіни та фікстури Parquet для бенчмарків
+"""
+
+import hashlib
+import os
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from lab_config import SENSOR_RANGES, TELEMETRY_MIN_INTERVAL, TELEMETRY_MAX_INTERVAL
+
+DEFAULT_SEED = 42
+DEFAULT_START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+FIXTURE_DIR = "benchmark_fixtures"
+# Версія алгоритму: змінюється, якщо змінюється послідовність вибірок
+GENERATOR_VERSION = "2"
+
+PARAMETERS = tuple(SENSOR_RANGES)
+
+# Початкові діапазони як у lab_config.generate_realistic_telemetry
+INITIAL_RANGES = {
+    'output_power': (800, 1600),
+    'rotor_rpm': (8, 25),
+    'max_power_limit': (1400, 1700),
+    'voltage': (400, 650),
+    'current': (1000, 2500),
+    'power_factor': (0.85, 0.92),
+}
+MAX_VARIATION = 0.1
+
+
+def turbine_seed_sequence(seed: Optional[int], turbine_id: str) -> np.random.SeedSequence:
+    """
+    SeedSequence турбіни: залежить лише від seed та turbine_id,
+    тому потік турбіни однаковий за будь-якого розміру парку і порядку обробки
+    """
+    # Повний 128-бітний дайджест: 4 байти давали помітну ймовірність однакових потоків у великому парку
+    key = int.from_bytes(hashlib.md5(str(turbine_id).encode('utf-8')).digest(), 'big')
+    return np.random.SeedSequence(seed, spawn_key=(key,))
+
+
+def turbine_rng(seed: Optional[int], turbine_id: str) -> np.random.Generator:
+    """Генератор NumPy для турбіни (seed=None - недетермінований)"""
+    return np.random.default_rng(turbine_seed_sequence(seed, turbine_id))
+
+
+class SeededTelemetryGenerator:
+    """Відтворюваний набір телеметрії для парку: однаковий для того ж seed і списку турбін"""
+
+    def __init__(self, seed: int = DEFAULT_SEED, fleet_size: int = None, turbine_ids: List[str] = None,
+                 block_size: int = 1024):
+        if turbine_ids is None:
+            from lab_config import DEVICE_COUNT
+            turbine_ids = [f"TURBINE_{str(i + 1).zfill(3)}" for i in range(fleet_size or DEVICE_COUNT)]
+        self.seed = seed
+        self.turbine_ids = list(turbine_ids)
+        self.block_size = block_size
+
+        self.min_values = np.array([SENSOR_RANGES[p]['min'] for p in PARAMETERS], dtype=np.float64)
+        self.max_values = np.array([SENSOR_RANGES[p]['max'] for p in PARAMETERS], dtype=np.float64)
+        self.initial_low = np.array([INITIAL_RANGES[p][0] for p in PARAMETERS], dtype=np.float64)
+        self.initial_high = np.array([INITIAL_RANGES[p][1] for p in PARAMETERS], dtype=np.float64)
+
+    def _generate_block(self, turbine_ids: List[str], records_per_turbine: int, start: datetime) -> Dict[str, np.ndarray]:
+        """Блок турбін: вибірки з власних потоків, випадкове блукання - векторно по турбінах"""
+        count = len(turbine_ids)
+        uniforms = np.empty((count, records_per_turbine, len(PARAMETERS)))
+        intervals = np.empty((count, records_per_turbine), dtype=np.int64)
+        for i, turbine_id in enumerate(turbine_ids):
+            rng = turbine_rng(self.seed, turbine_id)
+            uniforms[i] = rng.random((records_per_turbine, len(PARAMETERS)))
+            intervals[i] = rng.integers(TELEMETRY_MIN_INTERVAL, TELEMETRY_MAX_INTERVAL + 1, records_per_turbine)
+
+        power, voltage, power_factor, current = (PARAMETERS.index(p) for p in ('output_power', 'voltage', 'power_factor', 'current'))
+        values = np.empty_like(uniforms)
+        state = self.initial_low + (self.initial_high - self.initial_low) * uniforms[:, 0]
+        for step in range(records_per_turbine):
+            if step:
+                # Варіація не більше 10% від попередніх значень, в межах SENSOR_RANGES
+                low = np.maximum(self.min_values, state * (1 - MAX_VARIATION))
+                high = np.minimum(self.max_values, state * (1 + MAX_VARIATION))
+                state = low + (high - low) * uniforms[:, step]
+            # Струм з потужності та напруги, як у generate_realistic_telemetry
+            active = (state[:, power] > 0) & (state[:, voltage] > 0)
+            state[active, current] = (state[active, power] * 1000) / (state[active, voltage] * state[active, power_factor] * 1.732)
+            values[:, step] = state
+
+        start_us = int(start.timestamp() * 1_000_000)
+        timestamps = start_us + np.cumsum(intervals, axis=1) * 1_000_000
+        columns = {
+            'turbine_id': np.repeat(np.array(turbine_ids, dtype=object), records_per_turbine),
+            'timestamp': timestamps.reshape(-1),
+        }
+        for i, parameter in enumerate(PARAMETERS):
+            columns[parameter] = values[:, :, i].reshape(-1)
+        return columns
+
+    def generate(self, records_per_turbine: int, start: datetime = DEFAULT_START, order_by_time: bool = False) -> pa.Table:
+        """Набір даних як Arrow таблиця (turbine_id, timestamp UTC, електричні параметри)"""
+        tables = []
+        for offset in range(0, len(self.turbine_ids), self.block_size):
+            columns = self._generate_block(self.turbine_ids[offset:offset + self.block_size], records_per_turbine, start)
+            arrays = {
+                'turbine_id': pa.array(columns['turbine_id'], pa.string()),
+                'timestamp': pa.array(columns['timestamp'], pa.timestamp('us', tz='UTC')),
+                **{parameter: pa.array(columns[parameter], pa.float64()) for parameter in PARAMETERS},
+            }
+            tables.append(pa.table(arrays))
+        table = pa.concat_tables(tables)
+        if order_by_time:
+            table = table.sort_by([('timestamp', 'ascending'), ('turbine_id', 'ascending')])
+        return table.replace_schema_metadata(self._metadata(records_per_turbine, start))
+
+    @property
+    def turbine_ids_digest(self) -> str:
+        """Короткий хеш списку турбін (різні парки однакового розміру - різні фікстури)"""
+        return hashlib.md5('\n'.join(map(str, self.turbine_ids)).encode('utf-8')).hexdigest()[:12]
+
+    def _metadata(self, records_per_turbine: int, start: datetime) -> Dict[str, str]:
+        return {
+            'seed': str(self.seed),
+            'fleet_size': str(len(self.turbine_ids)),
+            'turbine_ids_digest': self.turbine_ids_digest,
+            'records_per_turbine': str(records_per_turbine),
+            'start': start.isoformat(),
+            'generator_version': GENERATOR_VERSION,
+        }
+
+    def fixture_path(self, records_per_turbine: int, directory: str = FIXTURE_DIR) -> str:
+        return os.path.join(directory, f"telemetry_s{self.seed}_f{len(self.turbine_ids)}_{self.turbine_ids_digest}_n{records_per_turbine}_v{GENERATOR_VERSION}.parquet")
+
+    def load_or_create_fixture(self, records_per_turbine: int, start: datetime = DEFAULT_START,
+                               directory: str = FIXTURE_DIR) -> pa.Table:
+        """Фікстура Parquet: генерується один раз, далі читається з диску"""
+        path = self.fixture_path(records_per_turbine, directory)
+        if os.path.exists(path):
+            table = pq.read_table(path)
+            metadata = {key.decode(): value.decode() for key, value in (table.schema.metadata or {}).items()}
+            if metadata.get('start') == start.isoformat():
+                return table
+            print(f" Фікстура {path} створена з іншим start, генеруємо заново")
+
+        table = self.generate(records_per_turbine, start)
+        os.makedirs(directory, exist_ok=True)
+        pq.write_table(table, path, compression='zstd')
+        print(f" Фікстура збережена: {path} ({table.num_rows} записів, {os.path.getsize(path) / 1024:.1f} KB)")
+        return table
+
+
+def table_to_messages(table: pa.Table) -> List[Dict[str, Any]]:
+    """Arrow таблиця -> повідомлення у форматі симулятора (ISO timestamp з 'Z')"""
+    records = table.to_pylist()
+    for record in records:
+        record['timestamp'] = record['timestamp'].strftime('%Y-%m-%dT%H:%M:%SZ')
+    return records
+
+
+def benchmark_messages(num_records: int, seed: int = DEFAULT_SEED, fleet_size: int = None) -> List[Dict[str, Any]]:
+    """Відтворювані вхідні повідомлення для бенчмарків, відсортовані за часом"""
+    generator = SeededTelemetryGenerator(seed, fleet_size)
+    records_per_turbine = -(-num_records // len(generator.turbine_ids))
+    table = generator.load_or_create_fixture(records_per_turbine)
+    table = table.sort_by([('timestamp', 'ascending'), ('turbine_id', 'ascending')]).slice(0, num_records)
+    return table_to_messages(table)
+
+
+if __name__ == "__main__":
+    generator = SeededTelemetryGenerator(DEFAULT_SEED, fleet_size=1000)
+    generator.load_or_create_fixture(records_per_turbine=1440)
\ No newline at end of file
@@ -0,0 +1,119 @@
+"""
+Серіалізація JSON для конвеєра: orjson, якщо встановлено, інакше стандартний json
+"""
+
+import json
+import os
+import time
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from typing import Any, Dict, IO, Optional, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+# Компактний режим за замовчуванням; TELEMETRY_JSON_PRETTY=1 вмикає відступи (для ручного перегляду)
+PRETTY = os.getenv('TELEMETRY_JSON_PRETTY', '').lower() in ('1', 'true', 'yes')
+
+
+def _default(obj: Any) -> Any:
+    """Типи, яких немає в JSON: дати, Decimal з SQL, numpy, множини"""
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    if hasattr(obj, 'item'):
+        return obj.item()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, bytes):
+        return obj.decode('utf-8', errors='replace')
+    return str(obj)
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(obj: Any, pretty: Optional[bool] = None) -> bytes:
+        """Серіалізація у UTF-8 байти"""
+        options = _ORJSON_OPTIONS | (orjson.OPT_INDENT_2 if (PRETTY if pretty is None else pretty) else 0)
+        return orjson.dumps(obj, default=_default, option=options)
+
+    def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+        return orjson.loads(data)
+
+else:
+    def dumps_bytes(obj: Any, pretty: Optional[bool] = None) -> bytes:
+        """Серіалізація у UTF-8 байти"""
+        return dumps(obj, pretty).encode('utf-8')
+
+    def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+        return json.loads(bytes(data) if isinstance(data, memoryview) else data)
+
+
+def dumps(obj: Any, pretty: Optional[bool] = None) -> str:
+    """Серіалізація у рядок (pretty=None - режим із TELEMETRY_JSON_PRETTY)"""
+    if orjson is not None:
+        return dumps_bytes(obj, pretty).decode('utf-8')
+    if PRETTY if pretty is None else pretty:
+        return json.dumps(obj, ensure_ascii=False, indent=2, default=_default)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=_default)
+
+
+def dump(obj: Any, file: IO, pretty: Optional[bool] = None):
+    """Запис у відкритий файл (текстовий або бінарний)"""
+    if 'b' in getattr(file, 'mode', ''):
+        file.write(dumps_bytes(obj, pretty))
+    else:
+        file.write(dumps(obj, pretty))
+
+
+def load(file: IO) -> Any:
+    return loads(file.read())
+
+
+def benchmark_serializer(num_records: int = 20_000) -> Dict[str, float]:
+    """Порівняння: stdlib з відступами (як було), stdlib компактний, поточний бекенд компактний"""
+    now = datetime.now(timezone.utc)
+    records = [
+        {
+            'turbine_id': f"TURBINE_{i % 500:03d}",
+            'timestamp': now.isoformat(),
+            'output_power': 1500.0 + i % 100, 'rotor_rpm': 15.2, 'max_power_limit': 9500.0,
+            'voltage': 690.0, 'current': 2500.0, 'power_factor': 0.92,
+            'turbine_metadata': {'turbine_name': 'Вітряк Карпати', 'manufacturer': 'Vestas', 'model': 'V90',
+                                 'nominal_power_kw': 2000, 'location_lat': 48.9, 'location_lng': 24.7},
+            'calculated_metrics': {'efficiency_percent': 75.0, 'operational_status': 'generating'},
+            'enrichment_info': {'processing_timestamp': now.isoformat(), 'data_quality_score': 1.0},
+        }
+        for i in range(num_records)
+    ]
+
+    def measure(encode, decode) -> float:
+        start = time.perf_counter()
+        for record in records:
+            decode(encode(record))
+        return time.perf_counter() - start
+
+    results = {
+        'stdlib_pretty_seconds': measure(lambda r: json.dumps(r, ensure_ascii=False, indent=2), json.loads),
+        'stdlib_compact_seconds': measure(lambda r: json.dumps(r, ensure_ascii=False, separators=(',', ':')), json.loads),
+        'backend_compact_seconds': measure(lambda r: dumps_bytes(r, pretty=False), loads),
+    }
+    results['speedup'] = results['stdlib_pretty_seconds'] / results['backend_compact_seconds']
+
+    print(f" Серіалізація {num_records} записів (dumps + loads), бекенд: {BACKEND}")
+    print(f"   json з відступами: {results['stdlib_pretty_seconds']:.3f} с")
+    print(f"   json компактний:   {results['stdlib_compact_seconds']:.3f} с")
+    print(f"   {BACKEND} компактний: {results['backend_compact_seconds']:.3f} с ({results['speedup']:.1f}x)")
+    return results
+
+
+if __name__ == "__main__":
+    benchmark_serializer()
\ No newline at end of file
@@ -0,0 +1,147 @@
+"""
+Спільне ядро розрахункових метрик телеметрії (скалярне та векторизоване)
+"""
+
+import math
+import time
+from typing import Dict, Any, Mapping, Optional
+
+import numpy as np
+
+# Варіанти формули електричної потужності: P = V * I * cos(φ) * k
+POWER_FORMULAS = {
+    'three_phase': 1.732,  # √3 для 3-фазної системи
+    'single_phase': 1.0,
+}
+DEFAULT_FORMULA = 'three_phase'
+
+# Пороги статусу роботи (кВт)
+GENERATING_THRESHOLD_KW = 100
+
+# Коди статусів для векторизованого розрахунку (індекс = код)
+OPERATIONAL_STATUSES = ('stopped', 'low_generation', 'generating')
+# Статус за відсутньої потужності (NaN) - однаковий для скалярного та пакетного шляху
+UNKNOWN_STATUS = 'unknown'
+UNKNOWN_STATUS_CODE = -1
+
+
+def _formula_factor(variant: str) -> float:
+    """Коефіцієнт формули потужності за назвою варіанту"""
+    try:
+        return POWER_FORMULAS[variant]
+    except KeyError:
+        raise ValueError(f"Невідомий варіант формули: {variant}") from None
+
+
+def operational_status(output_power: float) -> str:
+    """Статус роботи турбіни за потужністю"""
+    if math.isnan(output_power):
+        return UNKNOWN_STATUS
+    if output_power > GENERATING_THRESHOLD_KW:
+        return 'generating'
+    elif output_power > 0:
+        return 'low_generation'
+    return 'stopped'
+
+
+def calculate_metrics(telemetry_data: Mapping[str, Any],
+                      nominal_power_kw: Optional[float] = None,
+                      variant: str = DEFAULT_FORMULA) -> Dict[str, Any]:
+    """Розрахунок метрик для одного запису телеметрії"""
+    factor = _formula_factor(variant)
+    metrics = {}
+
+    if 'output_power' in telemetry_data:
+        output_power = float(telemetry_data['output_power'])
+
+        if nominal_power_kw is not None:
+            nominal_power = float(nominal_power_kw)
+            metrics['efficiency_percent'] = round((output_power / nominal_power) * 100, 2) if nominal_power > 0 else 0
+
+        metrics['operational_status'] = operational_status(output_power)
+
+    if all(field in telemetry_data for field in ['voltage', 'current', 'power_factor']):
+        voltage = float(telemetry_data['voltage'])
+        current = float(telemetry_data['current'])
+        power_factor = float(telemetry_data['power_factor'])
+        calculated_power = (voltage * current * power_factor * factor) / 1000
+        metrics['calculated_power_kw'] = round(calculated_power, 2)
+
+    return metrics
+
+
+def calculate_metrics_batch(columns: Mapping[str, Any],
+                            nominal_power_kw: Any = None,
+                            variant: str = DEFAULT_FORMULA) -> Dict[str, np.ndarray]:
+    """
+    Векторизований розрахунок метрик для пакету записів.
+
+    columns - колонки output_power, voltage, current, power_factor (масиви однакової довжини).
+    Пропущені значення (NaN) дають NaN у результаті; статус для них - UNKNOWN_STATUS з кодом UNKNOWN_STATUS_CODE.
+    """
+    factor = _formula_factor(variant)
+    output_power = np.asarray(columns['output_power'], dtype=np.float64)
+    metrics = {}
+
+    if nominal_power_kw is not None:
+        nominal = np.broadcast_to(np.asarray(nominal_power_kw, dtype=np.float64), output_power.shape)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            efficiency = np.round(output_power / nominal * 100, 2)
+        metrics['efficiency_percent'] = np.where(nominal > 0, efficiency, np.where(np.isnan(nominal), np.nan, 0.0))
+
+    codes = np.zeros(output_power.shape, dtype=np.int8)
+    codes[output_power > 0] = 1
+    codes[output_power > GENERATING_THRESHOLD_KW] = 2
+    codes[np.isnan(output_power)] = UNKNOWN_STATUS_CODE
+    # Код -1 індексує останню мітку - UNKNOWN_STATUS
+    labels = np.array(OPERATIONAL_STATUSES + (UNKNOWN_STATUS,), dtype=object)
+    metrics['status_code'] = codes
+    metrics['operational_status'] = labels[codes]
+
+    if all(field in columns for field in ['voltage', 'current', 'power_factor']):
+        voltage = np.asarray(columns['voltage'], dtype=np.float64)
+        current = np.asarray(columns['current'], dtype=np.float64)
+        power_factor = np.asarray(columns['power_factor'], dtype=np.float64)
+        metrics['calculated_power_kw'] = np.round(voltage * current * power_factor * (factor / 1000), 2)
+
+    return metrics
+
+
+def benchmark_metrics(num_records: int = 100_000, variant: str = DEFAULT_FORMULA) -> Dict[str, float]:
+    """Мікро-бенчмарк: скалярний розрахунок проти векторизованого"""
+    rng = np.random.default_rng(0)
+    columns = {
+        'output_power': rng.uniform(0, 2000, num_records),
+        'voltage': rng.uniform(380, 690, num_records),
+        'current': rng.uniform(0, 3000, num_records),
+        'power_factor': rng.uniform(0.8, 0.95, num_records),
+    }
+    nominal = np.full(num_records, 2000.0)
+    records = [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+    start = time.perf_counter()
+    for record in records:
+        calculate_metrics(record, 2000.0, variant)
+    scalar_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    calculate_metrics_batch(columns, nominal, variant)
+    batch_seconds = time.perf_counter() - start
+
+    results = {
+        'records': num_records,
+        'scalar_seconds': scalar_seconds,
+        'batch_seconds': batch_seconds,
+        'speedup': scalar_seconds / batch_seconds if batch_seconds > 0 else float('inf'),
+    }
+
+    print(f" Записів: {num_records}, варіант формули: {variant}")
+    print(f"   Скалярно: {scalar_seconds * 1000:.1f} мс ({num_records / scalar_seconds:,.0f} зап/с)")
+    print(f"   Векторизовано: {batch_seconds * 1000:.1f} мс ({num_records / batch_seconds:,.0f} зап/с)")
+    print(f"   Прискорення: {results['speedup']:.1f}x")
+    return results
+
+
+if __name__ == "__main__":
+    for formula in POWER_FORMULAS:
+        benchmark_metrics(variant=formula)
\ No newline at end of file
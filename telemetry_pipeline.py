@@ -0,0 +1,170 @@
+"""
+Конвеєр обробки телеметрії на asyncio з обмеженими чергами між етапами
+"""
+
+import asyncio
+import inspect
+import time
+from typing import Dict, Any, List, Callable, Iterable, AsyncIterable, Union, Optional
+
+# Маркер завершення потоку даних між етапами
+_END = object()
+
+
+class PipelineStage:
+    """Етап конвеєра: функція обробки, паралельність та розмір вхідної черги"""
+
+    def __init__(self, name: str, func: Callable[[Any], Any], concurrency: int = 1,
+                 queue_size: int = 100, fan_out: bool = False, run_in_thread: bool = True):
+        self.name = name
+        self.func = func
+        self.concurrency = max(1, concurrency)
+        self.queue_size = queue_size
+        # fan_out: результат - список, кожен елемент іде далі окремо
+        self.fan_out = fan_out
+        # Блокуючі функції (SQL, Blob, Delta) виконуються в пулі потоків
+        self.run_in_thread = run_in_thread and not inspect.iscoroutinefunction(func)
+
+        self.queue: Optional[asyncio.Queue] = None
+        self.in_flight = 0
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+
+    async def call(self, item: Any) -> Any:
+        if inspect.iscoroutinefunction(self.func):
+            return await self.func(item)
+        if self.run_in_thread:
+            return await asyncio.to_thread(self.func, item)
+        return self.func(item)
+
+    def gauges(self) -> Dict[str, Any]:
+        """Показники етапу: глибина черги, зайнятість, лічильники"""
+        return {
+            'queue_depth': self.queue.qsize() if self.queue else 0,
+            'queue_capacity': self.queue_size,
+            'in_flight': self.in_flight,
+            'concurrency': self.concurrency,
+            'processed': self.processed,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'busy_seconds': round(self.busy_seconds, 3),
+        }
+
+
+class TelemetryPipeline:
+    """
+    Конвеєр етапів з обмеженими asyncio.Queue.
+
+    Коли останній етап (запис) не встигає, його черга заповнюється і блокує попередні
+    етапи аж до джерела - так працює зворотний тиск.
+    """
+
+    def __init__(self, stages: List[PipelineStage], report_interval: Optional[float] = None):
+        if not stages:
+            raise ValueError("Конвеєр потребує хоча б одного етапу")
+        self.stages = stages
+        self.report_interval = report_interval
+        self.source_items = 0
+        self.source_wait_seconds = 0.0
+
+    def gauges(self) -> Dict[str, Dict[str, Any]]:
+        """Показники всіх етапів"""
+        return {stage.name: stage.gauges() for stage in self.stages}
+
+    def print_gauges(self):
+        for name, gauges in self.gauges().items():
+            print(f"   [{name}] черга {gauges['queue_depth']}/{gauges['queue_capacity']}, "
+                  f"в роботі {gauges['in_flight']}/{gauges['concurrency']}, "
+                  f"оброблено {gauges['processed']}, помилок {gauges['errors']}")
+
+    async def _feed(self, source: Union[Iterable[Any], AsyncIterable[Any]]):
+        first_queue = self.stages[0].queue
+        if hasattr(source, '__aiter__'):
+            async for item in source:
+                await self._put_source(first_queue, item)
+        else:
+            for item in source:
+                await self._put_source(first_queue, item)
+        await first_queue.put(_END)
+
+    async def _put_source(self, first_queue: asyncio.Queue, item: Any):
+        start = time.perf_counter()
+        await first_queue.put(item)
+        self.source_wait_seconds += time.perf_counter() - start
+        self.source_items += 1
+
+    async def _worker(self, stage: PipelineStage, outbox: Optional[asyncio.Queue]):
+        while True:
+            item = await stage.queue.get()
+            if item is _END:
+                # Повертаємо маркер, щоб його побачили інші воркери етапу
+                await stage.queue.put(_END)
+                return
+
+            stage.in_flight += 1
+            start = time.perf_counter()
+            try:
+                result = await stage.call(item)
+            except Exception as e:
+                stage.errors += 1
+                print(f" [{stage.name}] Помилка обробки: {e}")
+                continue
+            finally:
+                stage.in_flight -= 1
+                stage.busy_seconds += time.perf_counter() - start
+
+            stage.processed += 1
+            if result is None:
+                stage.dropped += 1
+                continue
+            if outbox is not None:
+                for output in (result if stage.fan_out else (result,)):
+                    await outbox.put(output)
+
+    async def _run_stage(self, stage: PipelineStage, outbox: Optional[asyncio.Queue]):
+        await asyncio.gather(*(self._worker(stage, outbox) for _ in range(stage.concurrency)))
+        # Прибираємо повернутий останнім воркером маркер, щоб глибина черги була 0
+        stage.queue.get_nowait()
+        if outbox is not None:
+            await outbox.put(_END)
+
+    async def _report(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            print(" Стан конвеєра:")
+            self.print_gauges()
+
+    async def run(self, source: Union[Iterable[Any], AsyncIterable[Any]]) -> Dict[str, Any]:
+        """Прогін джерела через усі етапи; повертає підсумкові показники"""
+        self.source_items = 0
+        self.source_wait_seconds = 0.0
+        for stage in self.stages:
+            stage.queue = asyncio.Queue(maxsize=stage.queue_size)
+            stage.processed = stage.dropped = stage.errors = 0
+            stage.busy_seconds = 0.0
+
+        start = time.perf_counter()
+        reporter = asyncio.create_task(self._report()) if self.report_interval else None
+        try:
+            tasks = [self._feed(source)]
+            for i, stage in enumerate(self.stages):
+                outbox = self.stages[i + 1].queue if i + 1 < len(self.stages) else None
+                tasks.append(self._run_stage(stage, outbox))
+            await asyncio.gather(*tasks)
+        finally:
+            if reporter:
+                reporter.cancel()
+
+        elapsed = time.perf_counter() - start
+        return {
+            'source_items': self.source_items,
+            'elapsed_seconds': round(elapsed, 3),
+            'source_backpressure_seconds': round(self.source_wait_seconds, 3),
+            'stages': self.gauges(),
+        }
+
+    def run_sync(self, source: Iterable[Any]) -> Dict[str, Any]:
+        """Синхронний запуск конвеєра (для скриптів без власного event loop)"""
+        return asyncio.run(self.run(source))
\ No newline at end of file
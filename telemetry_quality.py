@@ -0,0 +1,319 @@
+"""
+Векторизована перевірка якості телеметрії за SENSOR_RANGES з lab_config
+"""
+
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Callable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+import telemetry_json
+from lab_config import SENSOR_RANGES
+
+# Поля, що перевіряються; порядок визначає біти у масці порушень
+VALIDATED_FIELDS = tuple(SENSOR_RANGES)
+FIELD_CHECKS = ('missing', 'range', 'rate')
+
+# Біти рівня запису (після біт полів)
+RECORD_FLAGS = ('missing_turbine_id', 'missing_timestamp', 'stale', 'clock_skew')
+
+REQUIRED_FIELDS = ('turbine_id', 'timestamp', 'output_power')
+
+# Максимальна відносна зміна між сусідніми відліками однієї турбіни (симулятор дає до 10%)
+RATE_OF_CHANGE_LIMITS = {field: 0.25 for field in VALIDATED_FIELDS}
+
+# Частка максимуму діапазону, нижче якої зміна рахується від абсолютного порогу, а не від попереднього значення
+# (інакше будь-який старт турбіни з 0 kW давав би нескінченну відносну зміну)
+RATE_OF_CHANGE_FLOOR_FRACTION = 0.5
+
+# Штрафи до оцінки якості (1.0 - сума штрафів) за тип порушення
+QUALITY_PENALTIES = {
+    'missing_required': 0.2,
+    'missing': 0.1,
+    'range': 0.15,
+    'rate': 0.05,
+    'stale': 0.2,
+    'clock_skew': 0.2,
+}
+
+DEFAULT_MAX_STALENESS_SECONDS = 15 * 60
+DEFAULT_MAX_CLOCK_SKEW_SECONDS = 60
+DEFAULT_QUARANTINE_THRESHOLD = 0.5
+
+# Скільки submit чекає місця в черзі, перш ніж скинути запис у локальний JSONL
+DEFAULT_SUBMIT_TIMEOUT_SECONDS = 5.0
+DEFAULT_SPILL_DIR = "telemetry_spool/quarantine"
+
+
+def field_bit(field: str, check: str) -> int:
+    """Біт порушення для поля та типу перевірки"""
+    return 1 << (VALIDATED_FIELDS.index(field) * len(FIELD_CHECKS) + FIELD_CHECKS.index(check))
+
+
+def record_bit(flag: str) -> int:
+    """Біт порушення рівня запису"""
+    return 1 << (len(VALIDATED_FIELDS) * len(FIELD_CHECKS) + RECORD_FLAGS.index(flag))
+
+
+def _build_penalty_table() -> np.ndarray:
+    """Таблиця штрафів по номеру біта"""
+    penalties = []
+    for field in VALIDATED_FIELDS:
+        for check in FIELD_CHECKS:
+            if check == 'missing':
+                key = 'missing_required' if field in REQUIRED_FIELDS else 'missing'
+            else:
+                key = check
+            penalties.append(QUALITY_PENALTIES[key])
+    for flag in RECORD_FLAGS:
+        penalties.append(QUALITY_PENALTIES['missing_required'] if flag.startswith('missing_') else QUALITY_PENALTIES[flag])
+    return np.array(penalties, dtype=np.float64)
+
+
+PENALTY_TABLE = _build_penalty_table()
+
+
+def describe_violations(mask: int) -> List[str]:
+    """Розшифровка маски порушень у список назв"""
+    names = []
+    for field in VALIDATED_FIELDS:
+        for check in FIELD_CHECKS:
+            if mask & field_bit(field, check):
+                names.append(f"{field}:{check}")
+    for flag in RECORD_FLAGS:
+        if mask & record_bit(flag):
+            names.append(flag)
+    return names
+
+
+class TelemetryValidator:
+    """Пакетний валідатор: діапазони, швидкість зміни та застарілість"""
+
+    def __init__(self, sensor_ranges: Dict[str, Dict[str, Any]] = None,
+                 rate_limits: Dict[str, float] = None,
+                 max_staleness_seconds: Optional[float] = DEFAULT_MAX_STALENESS_SECONDS,
+                 max_clock_skew_seconds: float = DEFAULT_MAX_CLOCK_SKEW_SECONDS):
+        ranges = sensor_ranges or SENSOR_RANGES
+        self.min_values = np.array([ranges[f]['min'] for f in VALIDATED_FIELDS], dtype=np.float64)
+        self.max_values = np.array([ranges[f]['max'] for f in VALIDATED_FIELDS], dtype=np.float64)
+        limits = rate_limits or RATE_OF_CHANGE_LIMITS
+        self.rate_limits = np.array([limits.get(f, np.inf) for f in VALIDATED_FIELDS], dtype=np.float64)
+        self.rate_floors = np.maximum(np.abs(self.max_values) * RATE_OF_CHANGE_FLOOR_FRACTION, 1e-9)
+        self.max_staleness_seconds = max_staleness_seconds
+        self.max_clock_skew_seconds = max_clock_skew_seconds
+
+        # Останні значення по турбінах для перевірки швидкості зміни між пакетами
+        self.last_values: Dict[str, np.ndarray] = {}
+
+    def validate(self, records: Sequence[Dict[str, Any]], now: datetime = None) -> Dict[str, np.ndarray]:
+        """Перевірка пакету записів-словників"""
+        columns = {key: [record.get(key) for record in records] for key in ('turbine_id', 'timestamp') + VALIDATED_FIELDS}
+        return self.validate_columns(columns, now)
+
+    def validate_columns(self, columns: Dict[str, Any], now: datetime = None) -> Dict[str, np.ndarray]:
+        """
+        Перевірка пакету в колонковому вигляді.
+
+        Повертає violation_mask (int32), quality_score (float64) та valid (bool) для кожного запису.
+        """
+        turbine_ids = pd.Series(columns.get('turbine_id'), dtype=object)
+        size = len(turbine_ids)
+
+        values = np.empty((size, len(VALIDATED_FIELDS)), dtype=np.float64)
+        for i, field in enumerate(VALIDATED_FIELDS):
+            column = columns.get(field)
+            values[:, i] = np.nan if column is None else pd.to_numeric(pd.Series(column), errors='coerce').to_numpy(dtype=np.float64)
+
+        missing = np.isnan(values)
+        out_of_range = ~missing & ((values < self.min_values) | (values > self.max_values))
+        rate = self._rate_violations(turbine_ids, columns.get('timestamp'), values)
+
+        # Біти полів: для кожного поля три сусідні біти (missing, range, rate)
+        field_bits = np.stack([missing, out_of_range, rate], axis=2).reshape(size, -1)
+        weights = (1 << np.arange(field_bits.shape[1], dtype=np.int64))
+        mask = (field_bits.astype(np.int64) * weights).sum(axis=1)
+
+        mask |= np.where(turbine_ids.isna().to_numpy() | (turbine_ids == '').to_numpy(), record_bit('missing_turbine_id'), 0)
+
+        timestamps = pd.to_datetime(pd.Series(columns.get('timestamp'), dtype=object), utc=True, errors='coerce', format='ISO8601')
+        mask |= np.where(timestamps.isna().to_numpy(), record_bit('missing_timestamp'), 0)
+
+        now = pd.Timestamp(now or datetime.now(timezone.utc))
+        age_seconds = (now - timestamps).dt.total_seconds().to_numpy()
+        if self.max_staleness_seconds is not None:
+            mask |= np.where(age_seconds > self.max_staleness_seconds, record_bit('stale'), 0)
+        mask |= np.where(age_seconds < -self.max_clock_skew_seconds, record_bit('clock_skew'), 0)
+
+        mask = mask.astype(np.int32)
+        return {
+            'violation_mask': mask,
+            'quality_score': self.score(mask),
+            'valid': mask == 0,
+        }
+
+    def _rate_violations(self, turbine_ids: pd.Series, timestamps: Any, values: np.ndarray) -> np.ndarray:
+        """Перевищення швидкості зміни між сусідніми відліками кожної турбіни"""
+        size = len(values)
+        violations = np.zeros(values.shape, dtype=bool)
+        if size == 0:
+            return violations
+
+        keys = turbine_ids.fillna('').astype(str).to_numpy()
+        order_ts = pd.to_datetime(pd.Series(timestamps, dtype=object), utc=True, errors='coerce', format='ISO8601')
+        order = np.lexsort((order_ts.to_numpy(dtype='datetime64[ns]').astype(np.int64), keys))
+
+        sorted_keys = keys[order]
+        sorted_values = values[order]
+        previous = np.empty_like(sorted_values)
+        previous[1:] = sorted_values[:-1]
+
+        # Перший запис кожної турбіни порівнюється зі станом з попереднього пакету
+        group_start = np.ones(size, dtype=bool)
+        group_start[1:] = sorted_keys[1:] != sorted_keys[:-1]
+        for position in np.flatnonzero(group_start):
+            previous[position] = self.last_values.get(sorted_keys[position], np.nan)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            relative_change = np.abs(sorted_values - previous) / np.maximum(np.abs(previous), self.rate_floors)
+        violations[order] = relative_change > self.rate_limits
+
+        group_end = np.ones(size, dtype=bool)
+        group_end[:-1] = sorted_keys[1:] != sorted_keys[:-1]
+        for position in np.flatnonzero(group_end):
+            if sorted_keys[position]:
+                known = np.where(np.isnan(sorted_values[position]), self.last_values.get(sorted_keys[position], np.nan), sorted_values[position])
+                self.last_values[sorted_keys[position]] = known
+
+        return violations
+
+    @staticmethod
+    def score(mask: np.ndarray) -> np.ndarray:
+        """Оцінка якості (0.0 - 1.0) з маски порушень"""
+        mask = np.asarray(mask, dtype=np.int64)
+        bits = (mask[:, None] >> np.arange(len(PENALTY_TABLE))) & 1
+        return np.clip(1.0 - bits @ PENALTY_TABLE, 0.0, 1.0).round(2)
+
+
+def quarantine_rows(entries: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Карантинні записи (з QuarantineWriter.submit) -> рядки таблиці QUARANTINE_TABLE.
+
+    Нечислові показники та нерозбірні мітки часу стають null; весь сирий запис лишається у raw_record.
+    """
+    timestamps = pd.to_datetime(pd.Series([entry.get('timestamp') for entry in entries], dtype=object),
+                                utc=True, errors='coerce', format='ISO8601')
+    values = {field: pd.to_numeric(pd.Series([entry.get(field) for entry in entries], dtype=object), errors='coerce')
+              for field in VALIDATED_FIELDS}
+    rows = []
+    for i, entry in enumerate(entries):
+        quarantined_at = datetime.fromisoformat(entry['quarantined_at'])
+        raw = {key: value for key, value in entry.items()
+               if key not in ('violation_mask', 'violations', 'quality_score', 'quarantined_at')}
+        turbine_id = entry.get('turbine_id')
+        row = {
+            'turbine_id': None if turbine_id is None else str(turbine_id),
+            'timestamp': None if pd.isna(timestamps.iloc[i]) else timestamps.iloc[i].to_pydatetime(),
+            'violation_mask': entry['violation_mask'],
+            'violations': entry['violations'],
+            'quality_score': entry['quality_score'],
+            'quarantined_at': quarantined_at,
+            'raw_record': telemetry_json.dumps(raw, pretty=False),
+            'partition_year': quarantined_at.year,
+            'partition_month': quarantined_at.month,
+            'partition_day': quarantined_at.day,
+        }
+        for field in VALIDATED_FIELDS:
+            value = values[field].iloc[i]
+            row[field] = None if pd.isna(value) else float(value)
+        rows.append(row)
+    return rows
+
+
+class QuarantineWriter:
+    """
+    Фонова пакетна запис відбракованих записів у карантинну таблицю.
+
+    Записи не губляться: при переповненій черзі submit чекає submit_timeout, а тоді
+    (як і при помилці write_batch) пакет дописується у локальний JSONL spill_path.
+    """
+
+    def __init__(self, write_batch: Callable[[List[Dict[str, Any]]], None],
+                 batch_size: int = 500, flush_interval: float = 5.0, max_pending: int = 10_000,
+                 submit_timeout: float = DEFAULT_SUBMIT_TIMEOUT_SECONDS, spill_path: str = None):
+        self.write_batch = write_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.submit_timeout = submit_timeout
+        self.spill_path = spill_path or os.path.join(DEFAULT_SPILL_DIR, f"quarantine_spill_{os.getpid()}.jsonl")
+        self.pending: queue.Queue = queue.Queue(maxsize=max_pending)
+        self.dropped = 0
+        self.spilled = 0
+        self.written = 0
+        self._spill_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._worker = threading.Thread(target=self._run, name="quarantine-writer", daemon=True)
+        self._worker.start()
+
+    def submit(self, record: Dict[str, Any], violation_mask: int, quality_score: float):
+        """Постановка запису в карантин (при переповненій черзі - очікування, далі spill у JSONL)"""
+        entry = {
+            **record,
+            'violation_mask': int(violation_mask),
+            'violations': ','.join(describe_violations(int(violation_mask))),
+            'quality_score': float(quality_score),
+            'quarantined_at': datetime.now(timezone.utc).isoformat(),
+        }
+        try:
+            self.pending.put(entry, timeout=self.submit_timeout)
+        except queue.Full:
+            self._spill([entry])
+
+    def _spill(self, batch: List[Dict[str, Any]]):
+        """Дописування записів у локальний JSONL для пізнішого дозавантаження"""
+        try:
+            with self._spill_lock:
+                directory = os.path.dirname(self.spill_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.spill_path, 'a', encoding='utf-8') as f:
+                    for entry in batch:
+                        f.write(telemetry_json.dumps(entry, pretty=False) + '\n')
+                self.spilled += len(batch)
+        except Exception as e:
+            self.dropped += len(batch)
+            print(f" Помилка spill карантину у {self.spill_path} ({len(batch)} записів втрачено): {e}")
+
+    def _drain(self, block_seconds: float) -> List[Dict[str, Any]]:
+        batch = []
+        deadline = time.monotonic() + block_seconds
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.pending.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set() or not self.pending.empty():
+            batch = self._drain(self.flush_interval)
+            if not batch:
+                continue
+            try:
+                self.write_batch(batch)
+                self.written += len(batch)
+            except Exception as e:
+                print(f" Помилка запису карантину ({len(batch)} записів, збережено у {self.spill_path}): {e}")
+                self._spill(batch)
+
+    def close(self, timeout: float = 30.0):
+        """Дописати залишок черги та зупинити фоновий потік"""
+        self._stop.set()
+        self._worker.join(timeout)
@@ -0,0 +1,145 @@
+"""
+Кеш результатів запитів до Delta таблиць: ключ - таблиця, версія Delta та параметри запиту, LRU за байтами
+"""
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Optional
+
+import pyarrow as pa
+
+DEFAULT_MEMORY_BYTES = 256 * 1024 * 1024
+DEFAULT_DISK_BYTES = 2 * 1024 * 1024 * 1024
+
+
+def cache_key(table: str, version: int, query: str, params: Dict[str, Any] = None) -> str:
+    """Ключ результату; нова версія таблиці дає новий ключ, тож інвалідація не потрібна"""
+    description = json.dumps({'table': table, 'version': version, 'query': query, 'params': params or {}},
+                             sort_keys=True, default=str)
+    return hashlib.sha256(description.encode('utf-8')).hexdigest()
+
+
+class QueryResultCache:
+    """
+    Результати як Arrow таблиці: у пам'яті до max_bytes (LRU), за наявності directory - ще й
+    на диску у форматі Arrow IPC до max_disk_bytes (LRU за часом доступу до файлу).
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MEMORY_BYTES, directory: str = None,
+                 max_disk_bytes: int = DEFAULT_DISK_BYTES):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._entries: "OrderedDict[str, pa.Table]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.arrow")
+
+    def get(self, key: str) -> Optional[pa.Table]:
+        with self._lock:
+            table = self._entries.get(key)
+            if table is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return table
+
+        table = self._read_disk(key) if self.directory else None
+        with self._lock:
+            if table is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, table)
+        return table
+
+    def put(self, key: str, table: pa.Table):
+        with self._lock:
+            self._remember(key, table)
+        if self.directory:
+            self._write_disk(key, table)
+
+    def get_or_compute(self, table_name: str, version: int, query: str, params: Dict[str, Any],
+                       compute: Callable[[], Optional[pa.Table]]) -> Optional[pa.Table]:
+        """Результат з кешу або compute(); None (немає даних) не кешується"""
+        key = cache_key(table_name, version, query, params)
+        table = self.get(key)
+        if table is None:
+            table = compute()
+            if table is not None:
+                self.put(key, table)
+        return table
+
+    def _remember(self, key: str, table: pa.Table):
+        """Додавання в пам'ять під блокуванням; результат, більший за весь кеш, лишається лише на диску"""
+        size = table.nbytes
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key).nbytes
+        if size > self.max_bytes:
+            return
+        self._entries[key] = table
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self.evictions += 1
+
+    def _read_disk(self, key: str) -> Optional[pa.Table]:
+        path = self._path(key)
+        try:
+            with pa.OSFile(path, 'rb') as source:
+                table = pa.ipc.open_file(source).read_all()
+            os.utime(path)
+            return table
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f" Кеш запитів: пошкоджений файл {path}: {e}")
+            return None
+
+    def _write_disk(self, key: str, table: pa.Table):
+        temp_path = os.path.join(self.directory, f".tmp-{uuid.uuid4().hex}.arrow")
+        try:
+            with pa.OSFile(temp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(temp_path, self._path(key))
+        except Exception as e:
+            print(f" Кеш запитів: помилка запису на диск: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        self._evict_disk()
+
+    def _evict_disk(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.arrow') and not name.startswith('.tmp-'):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes, 'hits': self.hits,
+                    'disk_hits': self.disk_hits, 'misses': self.misses, 'evictions': self.evictions}
\ No newline at end of file
@@ -0,0 +1,476 @@
+"""
+Локальний сервіс запитів до Delta таблиці телеметрії: фільтри за турбінами, часом і колонками,
+відповідь - потік Arrow IPC пакетів через HTTP (TCP порт або Unix сокет)
+"""
+
+import argparse
+import http.client
+import os
+import socket
+import socketserver
+import threading
+from datetime import date, datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+from urllib.parse import parse_qs, urlencode, urlparse
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+import telemetry_json
+from telemetry_delta_snapshot import CachedSnapshot, LocalDeltaSource, file_batches, partition_types
+from telemetry_schemas import TIMESTAMP
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MAX_CONCURRENT = 4
+# Скільки запит чекає вільного слоту, перш ніж отримати 503
+DEFAULT_QUEUE_TIMEOUT = 30.0
+# Як часто фоновий потік дочитує нові коміти у спільний знімок
+DEFAULT_REFRESH_SECONDS = 5.0
+
+ARROW_STREAM_TYPE = "application/vnd.apache.arrow.stream"
+
+# Delta тип -> Arrow для схеми порожньої відповіді
+_DELTA_TYPES = {
+    'string': pa.string(), 'long': pa.int64(), 'integer': pa.int32(), 'short': pa.int16(), 'byte': pa.int8(),
+    'double': pa.float64(), 'float': pa.float32(), 'boolean': pa.bool_(), 'date': pa.date32(),
+    'binary': pa.binary(), 'timestamp': TIMESTAMP, 'timestamp_ntz': pa.timestamp('us'),
+}
+
+
+def _utc(value: Union[str, date, datetime, None]) -> Optional[datetime]:
+    """ISO рядок, дата чи datetime -> datetime в UTC (наївний час вважається UTC)"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    elif not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def _split(values: List[str]) -> Optional[Tuple[str, ...]]:
+    """Параметр повторами або через кому -> кортеж"""
+    items = tuple(item for value in values for item in value.split(',') if item)
+    return items or None
+
+
+class QueryFilter(NamedTuple):
+    """Фільтр запиту: турбіни, мітка часу в [start, end], колонки відповіді, максимум рядків"""
+    turbine_ids: Optional[Tuple[str, ...]] = None
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    columns: Optional[Tuple[str, ...]] = None
+    limit: Optional[int] = None
+
+    @classmethod
+    def from_params(cls, params: Dict[str, List[str]]) -> 'QueryFilter':
+        """Параметри URL: turbine_id=T1,T2, start/end (ISO), columns=a,b, limit; ValueError для некоректних"""
+        unknown = set(params) - {'turbine_id', 'start', 'end', 'columns', 'limit'}
+        if unknown:
+            raise ValueError(f"Невідомі параметри: {sorted(unknown)}")
+        limit = params.get('limit', [None])[-1]
+        query = cls(
+            turbine_ids=_split(params.get('turbine_id', [])),
+            start=_utc(params.get('start', [None])[-1]),
+            end=_utc(params.get('end', [None])[-1]),
+            columns=_split(params.get('columns', [])),
+            limit=int(limit) if limit else None,
+        )
+        if query.start and query.end and query.start > query.end:
+            raise ValueError("start пізніше за end")
+        if query.limit is not None and query.limit < 0:
+            raise ValueError("limit не може бути від'ємним")
+        return query
+
+    def to_params(self) -> Dict[str, str]:
+        params = {}
+        if self.turbine_ids:
+            params['turbine_id'] = ','.join(self.turbine_ids)
+        if self.start:
+            params['start'] = self.start.isoformat()
+        if self.end:
+            params['end'] = self.end.isoformat()
+        if self.columns:
+            params['columns'] = ','.join(self.columns)
+        if self.limit is not None:
+            params['limit'] = str(self.limit)
+        return params
+
+
+def _outside(low: Any, high: Any, query: QueryFilter, kind: str) -> bool:
+    """Діапазон [low, high] зі статистики не перетинається з фільтром (kind: 'key' або 'time')"""
+    if low is None or high is None:
+        return False
+    try:
+        if kind == 'key':
+            return bool(query.turbine_ids) and all(turbine < low or turbine > high for turbine in query.turbine_ids)
+        low, high = _utc(low), _utc(high)
+        return bool((query.start and high < query.start) or (query.end and low > query.end))
+    except (TypeError, ValueError):
+        return False
+
+
+class QueryService:
+    """
+    Спільний для всіх клієнтів стан: один знімок таблиці (оновлюється фоновим потоком), кеш файлів
+    і футерів та пул з'єднань джерела. Одночасно виконується не більше max_concurrent запитів.
+    """
+
+    def __init__(self, snapshot: CachedSnapshot, key_column: str = 'turbine_id', time_column: str = 'timestamp',
+                 max_concurrent: int = DEFAULT_MAX_CONCURRENT, queue_timeout: float = DEFAULT_QUEUE_TIMEOUT,
+                 refresh_seconds: float = DEFAULT_REFRESH_SECONDS):
+        self.snapshot = snapshot
+        self.source = snapshot.source
+        self.key_column = key_column
+        self.time_column = time_column
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self.refresh_seconds = refresh_seconds
+        self.slots = threading.BoundedSemaphore(max_concurrent)
+
+        self._stop = threading.Event()
+        self._refresher = threading.Thread(target=self._refresh_loop, daemon=True, name="snapshot-refresh")
+        self._lock = threading.Lock()
+        self._counters = {'queries': 0, 'rejected': 0, 'failed': 0, 'active': 0, 'rows_sent': 0,
+                          'files_read': 0, 'files_skipped': 0, 'row_groups_skipped': 0}
+
+    @classmethod
+    def for_reader(cls, reader, **kwargs) -> 'QueryService':
+        """Сервіс над DeltaLakeReader: його знімок, кеш файлів і BlobServiceClient"""
+        return cls(reader.snapshot, **kwargs)
+
+    def start(self):
+        self.snapshot.refresh()
+        self._refresher.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._refresher.is_alive():
+            self._refresher.join(timeout=5)
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.refresh_seconds):
+            try:
+                self.snapshot.refresh()
+            except Exception as e:
+                print(f" Помилка оновлення знімку: {e}")
+
+    def count(self, name: str, value: int = 1):
+        with self._lock:
+            self._counters[name] += value
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+        counters['snapshot'] = self.snapshot.stats()
+        file_cache = getattr(self.source, 'file_cache', None)
+        if file_cache is not None:
+            counters['file_cache'] = file_cache.stats()
+        return counters
+
+    def _file_matches(self, add: Dict[str, Any], query: QueryFilter) -> bool:
+        """
+        Відбір файлу за статистикою min/max з дії add. Дата партиції не використовується: це дата
+        обробки, а не події, тож пізні записи (опівночі, повтор зі спулу) лежать у партиції наступних днів.
+        """
+        stats = add.get('stats')
+        if not stats:
+            return True
+        stats = telemetry_json.loads(stats) if isinstance(stats, str) else stats
+        low, high = stats.get('minValues') or {}, stats.get('maxValues') or {}
+        return not (_outside(low.get(self.key_column), high.get(self.key_column), query, 'key') or
+                    _outside(low.get(self.time_column), high.get(self.time_column), query, 'time'))
+
+    def _row_groups(self, metadata: pq.FileMetaData, query: QueryFilter) -> Optional[List[int]]:
+        """Row groups, статистика яких перетинається з фільтром (None - читати всі)"""
+        if not (query.turbine_ids or query.start or query.end):
+            return None
+        positions = {metadata.schema.column(i).path: i for i in range(metadata.num_columns)}
+        selected = []
+        for index in range(metadata.num_row_groups):
+            group = metadata.row_group(index)
+            skip = False
+            for column, kind in ((self.key_column, 'key'), (self.time_column, 'time')):
+                if column in positions:
+                    statistics = group.column(positions[column]).statistics
+                    if statistics is not None and statistics.has_min_max:
+                        skip = skip or _outside(statistics.min, statistics.max, query, kind)
+            if not skip:
+                selected.append(index)
+        self.count('row_groups_skipped', metadata.num_row_groups - len(selected))
+        return selected
+
+    def _filter(self, batch: pa.RecordBatch, query: QueryFilter) -> pa.RecordBatch:
+        mask = None
+        names = batch.schema.names
+        if query.turbine_ids and self.key_column in names:
+            column = batch.column(self.key_column)
+            if pa.types.is_dictionary(column.type):
+                column = column.cast(column.type.value_type)
+            mask = pc.is_in(column, value_set=pa.array(query.turbine_ids, pa.string()))
+        if (query.start or query.end) and self.time_column in names:
+            column = batch.column(self.time_column)
+            for bound, compare in ((query.start, pc.greater_equal), (query.end, pc.less_equal)):
+                if bound is None:
+                    continue
+                if pa.types.is_timestamp(column.type):
+                    value = pa.scalar(bound if column.type.tz else bound.replace(tzinfo=None), column.type)
+                else:
+                    value = pa.scalar(bound.isoformat())
+                condition = compare(column, value)
+                mask = condition if mask is None else pc.and_(mask, condition)
+        return batch if mask is None else batch.filter(mask)
+
+    def _empty_schema(self, state, query: QueryFilter) -> pa.Schema:
+        if not state.metadata:
+            return pa.schema([])
+        fields = telemetry_json.loads(state.metadata['schemaString'])['fields']
+        types = {field['name']: _DELTA_TYPES.get(field['type'], pa.string()) for field in fields}
+        names = query.columns or [field['name'] for field in fields]
+        return pa.schema([(name, types[name]) for name in names if name in types])
+
+    def _scan(self, state, query: QueryFilter) -> Iterator[pa.RecordBatch]:
+        types = partition_types(state.metadata)
+        read_columns = None
+        if query.columns:
+            read_columns = list(dict.fromkeys(list(query.columns) + [self.key_column, self.time_column]))
+        remaining = query.limit
+        for path in sorted(state.files):
+            add = state.files[path]
+            if not self._file_matches(add, query):
+                self.count('files_skipped')
+                continue
+            row_groups = self._row_groups(self.source.file_metadata(add), query)
+            if row_groups == []:
+                self.count('files_skipped')
+                continue
+            self.count('files_read')
+            for batch in file_batches(self.source.file_path(add), add, read_columns, types, row_groups=row_groups):
+                batch = self._filter(batch, query)
+                if query.columns:
+                    batch = batch.select([name for name in query.columns if name in batch.schema.names])
+                if remaining is not None:
+                    batch = batch.slice(0, remaining)
+                    remaining -= batch.num_rows
+                if batch.num_rows:
+                    yield batch
+                if remaining == 0:
+                    return
+
+    def execute(self, query: QueryFilter) -> Tuple[int, pa.Schema, Iterator[pa.RecordBatch]]:
+        """
+        (версія, схема, пакети) на поточному знімку. Схема - з першого непорожнього пакета
+        (наступні приводяться до неї), для порожнього результату - зі схеми таблиці.
+        """
+        state = self.snapshot.state
+        batches = self._scan(state, query)
+        first = next(batches, None)
+        if first is None:
+            return state.version, self._empty_schema(state, query), iter(())
+        return state.version, first.schema, self._conformed(first, batches)
+
+    def _conformed(self, first: pa.RecordBatch, batches: Iterator[pa.RecordBatch]) -> Iterator[pa.RecordBatch]:
+        schema = first.schema
+        yield first
+        for batch in batches:
+            if batch.schema != schema:
+                arrays = []
+                for field in schema:
+                    if field.name in batch.schema.names:
+                        arrays.append(batch.column(field.name).cast(field.type, safe=False))
+                    else:
+                        arrays.append(pa.nulls(batch.num_rows, field.type))
+                batch = pa.RecordBatch.from_arrays(arrays, schema=schema)
+            yield batch
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """GET /query?turbine_id=..&start=..&end=..&columns=..&limit=.. -> Arrow IPC stream; GET /stats -> JSON"""
+
+    server_version = "TelemetryQuery/1.0"
+
+    def address_string(self) -> str:
+        # У Unix сокета адреса клієнта - порожній рядок
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):
+        print(f" [{self.address_string()}] {format % args}")
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Dict[str, str] = None):
+        body = telemetry_json.dumps_bytes(payload, pretty=False)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        service: QueryService = self.server.service
+        url = urlparse(self.path)
+        if url.path == '/stats':
+            self._send_json(200, service.stats())
+            return
+        if url.path != '/query':
+            self._send_json(404, {'error': f"Невідомий шлях {url.path}"})
+            return
+
+        try:
+            query = QueryFilter.from_params(parse_qs(url.query))
+        except ValueError as e:
+            self._send_json(400, {'error': str(e)})
+            return
+
+        if not service.slots.acquire(timeout=service.queue_timeout):
+            service.count('rejected')
+            self._send_json(503, {'error': "Забагато одночасних запитів"}, {'Retry-After': "1"})
+            return
+        service.count('queries')
+        service.count('active')
+        streaming = False
+        try:
+            version, schema, batches = service.execute(query)
+            self.send_response(200)
+            self.send_header("Content-Type", ARROW_STREAM_TYPE)
+            self.send_header("X-Delta-Version", str(version))
+            self.end_headers()
+            streaming = True
+            with pa.ipc.new_stream(self.wfile, schema) as writer:
+                for batch in batches:
+                    writer.write_batch(batch)
+                    service.count('rows_sent', batch.num_rows)
+        except (BrokenPipeError, ConnectionResetError):
+            print(f" Клієнт {self.address_string()} від'єднався під час передачі")
+        except Exception as e:
+            service.count('failed')
+            print(f" Помилка виконання запиту {url.query}: {e}")
+            if not streaming:
+                self._send_json(500, {'error': str(e)})
+        finally:
+            service.count('active', -1)
+            service.slots.release()
+
+
+class UnixQueryServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """HTTP поверх Unix сокета (доступ лише локальним процесам за правами файлу)"""
+    daemon_threads = True
+
+
+def make_server(service: QueryService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                socket_path: str = None) -> socketserver.BaseServer:
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = UnixQueryServer(socket_path, QueryHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), QueryHandler)
+        server.daemon_threads = True
+    server.service = service
+    return server
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: float = None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class QueryClient:
+    """Клієнт сервісу; address - 'http://хост:порт' або 'unix:/шлях/до/сокета'"""
+
+    def __init__(self, address: str = f"http://{DEFAULT_HOST}:{DEFAULT_PORT}", timeout: float = 300.0):
+        self.address = address
+        self.timeout = timeout
+
+    def _connection(self) -> http.client.HTTPConnection:
+        if self.address.startswith('unix:'):
+            return _UnixHTTPConnection(self.address[len('unix:'):], timeout=self.timeout)
+        url = urlparse(self.address)
+        return http.client.HTTPConnection(url.hostname, url.port or DEFAULT_PORT, timeout=self.timeout)
+
+    def _get(self, path: str) -> Tuple[http.client.HTTPConnection, http.client.HTTPResponse]:
+        connection = self._connection()
+        connection.request("GET", path)
+        response = connection.getresponse()
+        if response.status != 200:
+            body = response.read().decode('utf-8', errors='replace')
+            connection.close()
+            raise RuntimeError(f"Сервіс запитів: {response.status} {body}")
+        return connection, response
+
+    @staticmethod
+    def _query_path(turbine_id: Union[str, Sequence[str]] = None, start=None, end=None,
+                    columns: Sequence[str] = None, limit: int = None) -> str:
+        query = QueryFilter(
+            turbine_ids=(turbine_id,) if isinstance(turbine_id, str) else tuple(turbine_id) if turbine_id else None,
+            start=_utc(start), end=_utc(end), columns=tuple(columns) if columns else None, limit=limit,
+        )
+        return f"/query?{urlencode(query.to_params())}"
+
+    def batches(self, **filters) -> Iterator[pa.RecordBatch]:
+        """Пакети результату по мірі надходження; filters: turbine_id, start, end, columns, limit"""
+        connection, response = self._get(self._query_path(**filters))
+        try:
+            yield from pa.ipc.open_stream(response)
+        finally:
+            connection.close()
+
+    def query(self, **filters) -> pa.Table:
+        """Увесь результат однією таблицею (зі схемою і для порожнього результату)"""
+        connection, response = self._get(self._query_path(**filters))
+        try:
+            return pa.ipc.open_stream(response).read_all()
+        finally:
+            connection.close()
+
+    def stats(self) -> Dict[str, Any]:
+        connection, response = self._get("/stats")
+        try:
+            return telemetry_json.loads(response.read())
+        finally:
+            connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сервіс запитів до телеметрії (Arrow IPC через HTTP)")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--socket', help="Шлях Unix сокета замість TCP порту")
+    parser.add_argument('--table', help="Локальна Delta таблиця замість таблиці в Azure")
+    parser.add_argument('--max-concurrent', type=int, default=DEFAULT_MAX_CONCURRENT)
+    parser.add_argument('--refresh-seconds', type=float, default=DEFAULT_REFRESH_SECONDS)
+    args = parser.parse_args()
+
+    if args.table:
+        snapshot = CachedSnapshot(LocalDeltaSource(args.table))
+    else:
+        from read_delta import DeltaLakeReader
+        snapshot = DeltaLakeReader().snapshot
+    service = QueryService(snapshot, max_concurrent=args.max_concurrent, refresh_seconds=args.refresh_seconds)
+    service.start()
+    server = make_server(service, args.host, args.port, args.socket)
+    address = f"unix:{args.socket}" if args.socket else f"http://{args.host}:{args.port}"
+    print(f" Сервіс запитів: {address} (версія {service.snapshot.state.version}, до {args.max_concurrent} запитів одночасно)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n Зупинка сервісу")
+    finally:
+        server.server_close()
+        service.stop()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
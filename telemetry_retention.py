@@ -0,0 +1,588 @@
+"""
+Рівні зберігання історії телеметрії: сирі дані N днів, далі агрегати 1 хв та 15 хв з обвідними min/max
+"""
+
+import argparse
+import os
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Any, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+import telemetry_json
+from telemetry_delta_sink import DEFAULT_PARTITION_BY, DeltaLog, partition_dir, write_data_file
+from telemetry_schemas import FULL_TABLE, DOWNSAMPLE_TABLES, DOWNSAMPLE_METRICS, TIMESTAMP, get_schema
+from telemetry_storage import get_profile, write_delta_table
+
+STORAGE_ACCOUNT_NAME = "windfarm6storage"
+STORAGE_ACCOUNT_KEY = "X7YVa9h/iiKRdw0sYlgaUkb8RFi3U+FRnKR/86DkYxiT8WB4KVPOeBxvGdp0yHDYRMAVVa1FpyIF+AStPVbVPQ=="
+CONTAINER_NAME = "telemetry-data"
+
+# Довжина інтервалу агрегатів кожного рівня, від найдетальнішого
+TIER_SECONDS = {'1m': 60, '15m': 900}
+# Скільки днів зберігається кожен рівень (None - без обмеження)
+DEFAULT_RETENTION_DAYS = {'raw': 7, '1m': 90, '15m': None}
+
+
+def partition_date(values: Dict[str, Any]) -> Optional[date]:
+    """Дата партиції з partitionValues (рядки або числа)"""
+    try:
+        return date(int(values['partition_year']), int(values['partition_month']), int(values['partition_day']))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _day_predicate(days: Iterable[date]) -> str:
+    return " OR ".join(f"(partition_year = {day.year} AND partition_month = {day.month} AND partition_day = {day.day})"
+                       for day in sorted(days))
+
+
+def _utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _table_days(table: pa.Table) -> Set[date]:
+    return {date(*values) for values in zip(*(table.column(name).to_pylist() for name in DEFAULT_PARTITION_BY))}
+
+
+def _stats_outside(add: Dict[str, Any], column: str, start: datetime, end: datetime) -> bool:
+    """Файл точно не має міток column у [start, end] за статистикою min/max дії add"""
+    stats = add.get('stats')
+    if not stats:
+        return False
+    stats = telemetry_json.loads(stats) if isinstance(stats, str) else stats
+    low, high = (stats.get('minValues') or {}).get(column), (stats.get('maxValues') or {}).get(column)
+    if low is None or high is None:
+        return False
+    try:
+        low = _utc(datetime.fromisoformat(str(low).replace('Z', '+00:00')))
+        high = _utc(datetime.fromisoformat(str(high).replace('Z', '+00:00')))
+    except ValueError:
+        return False
+    return high < _utc(start) or low > _utc(end)
+
+
+def _decode(column: pa.ChunkedArray) -> pa.ChunkedArray:
+    return column.cast(column.type.value_type) if pa.types.is_dictionary(column.type) else column
+
+
+def _with_partitions(columns: Dict[str, Any], bucket_start: pa.ChunkedArray, seconds: int, tier: str) -> pa.Table:
+    """Колонки агрегатів + кінець інтервалу та партиції за його початком -> таблиця за схемою рівня"""
+    schema = get_schema(DOWNSAMPLE_TABLES[tier])
+    columns['bucket_start'] = bucket_start
+    columns['bucket_end'] = pc.add(bucket_start, pa.scalar(timedelta(seconds=seconds), pa.duration('us')))
+    columns['partition_year'] = pc.year(bucket_start)
+    columns['partition_month'] = pc.month(bucket_start)
+    columns['partition_day'] = pc.day(bucket_start)
+    order = pc.sort_indices(pa.table({'turbine_id': columns['turbine_id'], 'bucket_start': bucket_start}),
+                            sort_keys=[('turbine_id', 'ascending'), ('bucket_start', 'ascending')])
+    return pa.Table.from_arrays([pc.cast(columns[field.name], field.type).take(order) for field in schema], schema=schema)
+
+
+def downsample(table: pa.Table, tier: str) -> pa.Table:
+    """Сирі записи -> агрегати рівня tier: кількість, перша/остання мітка, mean/min/max кожної метрики"""
+    seconds = TIER_SECONDS[tier]
+    table = table.filter(pc.is_valid(table.column('timestamp')))
+    timestamps = table.column('timestamp').cast(TIMESTAMP)
+    work = {
+        'turbine_id': _decode(table.column('turbine_id')),
+        'bucket': pc.floor_temporal(timestamps, multiple=seconds, unit='second'),
+        'timestamp': timestamps,
+    }
+    for metric in DOWNSAMPLE_METRICS:
+        work[metric] = table.column(metric).cast(pa.float64()) if metric in table.column_names \
+            else pa.nulls(table.num_rows, pa.float64())
+
+    grouped = pa.table(work).group_by(['turbine_id', 'bucket']).aggregate(
+        [('timestamp', 'count'), ('timestamp', 'min'), ('timestamp', 'max')]
+        + [(metric, stat) for metric in DOWNSAMPLE_METRICS for stat in ('mean', 'min', 'max')]
+    )
+    columns = {
+        'turbine_id': grouped.column('turbine_id'),
+        'sample_count': grouped.column('timestamp_count'),
+        'first_timestamp': grouped.column('timestamp_min'),
+        'last_timestamp': grouped.column('timestamp_max'),
+        **{f"{metric}_{stat}": grouped.column(f"{metric}_{stat}")
+           for metric in DOWNSAMPLE_METRICS for stat in ('mean', 'min', 'max')},
+    }
+    return _with_partitions(columns, grouped.column('bucket'), seconds, tier)
+
+
+def coarsen(aggregates: pa.Table, tier: str) -> pa.Table:
+    """Агрегати детальнішого рівня -> рівень tier: середні зважуються кількістю записів, обвідні - min/max"""
+    seconds = TIER_SECONDS[tier]
+    counts = aggregates.column('sample_count').cast(pa.float64())
+    work = {
+        'turbine_id': _decode(aggregates.column('turbine_id')),
+        'bucket': pc.floor_temporal(aggregates.column('bucket_start'), multiple=seconds, unit='second'),
+        'sample_count': aggregates.column('sample_count'),
+        'first_timestamp': aggregates.column('first_timestamp'),
+        'last_timestamp': aggregates.column('last_timestamp'),
+    }
+    for metric in DOWNSAMPLE_METRICS:
+        mean = aggregates.column(f"{metric}_mean")
+        weight = pc.if_else(pc.is_valid(mean), counts, 0.0)
+        work[f"{metric}_weighted"] = pc.multiply(pc.fill_null(mean, 0.0), weight)
+        work[f"{metric}_weight"] = weight
+        work[f"{metric}_min"] = aggregates.column(f"{metric}_min")
+        work[f"{metric}_max"] = aggregates.column(f"{metric}_max")
+
+    grouped = pa.table(work).group_by(['turbine_id', 'bucket']).aggregate(
+        [('sample_count', 'sum'), ('first_timestamp', 'min'), ('last_timestamp', 'max')]
+        + [(f"{metric}_{part}", 'sum') for metric in DOWNSAMPLE_METRICS for part in ('weighted', 'weight')]
+        + [(f"{metric}_{stat}", stat) for metric in DOWNSAMPLE_METRICS for stat in ('min', 'max')]
+    )
+    columns = {
+        'turbine_id': grouped.column('turbine_id'),
+        'sample_count': grouped.column('sample_count_sum'),
+        'first_timestamp': grouped.column('first_timestamp_min'),
+        'last_timestamp': grouped.column('last_timestamp_max'),
+    }
+    for metric in DOWNSAMPLE_METRICS:
+        weight = grouped.column(f"{metric}_weight_sum")
+        columns[f"{metric}_mean"] = pc.if_else(pc.greater(weight, 0.0),
+                                               pc.divide(grouped.column(f"{metric}_weighted_sum"), weight), None)
+        columns[f"{metric}_min"] = grouped.column(f"{metric}_min_min")
+        columns[f"{metric}_max"] = grouped.column(f"{metric}_max_max")
+    return _with_partitions(columns, grouped.column('bucket'), seconds, tier)
+
+
+def merge_aggregates(existing: pa.Table, new: pa.Table, tier: str) -> pa.Table:
+    """
+    Нові агрегати рівня tier поверх уже збережених: інтервали з тим самим (turbine_id, bucket_start)
+    об'єднуються (кількості сумуються, середні зважуються, обвідні - min/max), як у coarsen на тому ж рівні
+    """
+    if existing.num_rows == 0:
+        return new
+    schema = get_schema(DOWNSAMPLE_TABLES[tier])
+    fields = [field for field in schema if field.name not in DEFAULT_PARTITION_BY and field.name != 'bucket_end']
+    parts = [pa.Table.from_arrays([_decode(table.column(field.name)).cast(field.type) for field in fields],
+                                  schema=pa.schema(fields))
+             for table in (existing, new)]
+    return coarsen(pa.concat_tables(parts), tier)
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: індекси threshold точок, що зберігають форму ряду для графіка.
+    Перша й остання точки лишаються; з кожного кошика береться точка з найбільшим трикутником
+    між попередньою вибраною точкою та середнім наступного кошика.
+    """
+    count = len(x)
+    if threshold >= count or threshold < 3:
+        return np.arange(count)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, count - 1, threshold - 1).astype(np.int64)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, count - 1
+
+    selected = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else count
+        average_x, average_y = x[end:next_end].mean(), y[end:next_end].mean()
+        area = np.abs((x[selected] - average_x) * (y[start:end] - y[selected])
+                      - (x[selected] - x[start:end]) * (average_y - y[selected]))
+        selected = start + int(np.argmax(area))
+        indices[bucket + 1] = selected
+    return indices
+
+
+class LocalTierStore:
+    """Рівень історії в локальній Delta таблиці (журнал telemetry_delta_sink)"""
+
+    def __init__(self, table_path: str, schema: pa.Schema, time_column: str = 'timestamp', profile=None):
+        self.table_path = table_path
+        self.schema = schema
+        self.time_column = time_column
+        self.data_schema = pa.schema([field for field in schema if field.name not in DEFAULT_PARTITION_BY])
+        self.profile = get_profile(profile, table_path)
+        self.log = DeltaLog(table_path)
+
+    def _files_by_day(self) -> Tuple[int, Dict[date, List[str]]]:
+        version, files = self.log.snapshot()
+        by_day: Dict[date, List[str]] = {}
+        for path, add in files.items():
+            day = partition_date(add.get('partitionValues') or {})
+            if day is not None:
+                by_day.setdefault(day, []).append(path)
+        return version, by_day
+
+    def days(self) -> Set[date]:
+        return set(self._files_by_day()[1])
+
+    def read_days(self, days: Iterable[date]) -> pa.Table:
+        _, by_day = self._files_by_day()
+        return self._read_paths(sorted(path for day in days for path in by_day.get(day, ())))
+
+    def read_range(self, start: datetime, end: datetime) -> pa.Table:
+        """
+        Файли, що можуть мати мітку часу в [start, end], за статистикою min/max, а не за партицією:
+        сирі дані партиціоновані датою обробки, тож пізні події лежать у партиції наступних днів
+        """
+        _, files = self.log.snapshot()
+        return self._read_paths(sorted(path for path, add in files.items()
+                                       if not _stats_outside(add, self.time_column, start, end)))
+
+    def _read_paths(self, paths: List[str]) -> pa.Table:
+        tables = [pq.read_table(os.path.join(self.table_path, path)) for path in paths]
+        tables = [table.select([name for name in self.data_schema.names if name in table.column_names])
+                  for table in tables]
+        if not tables:
+            return self.data_schema.empty_table()
+        return pa.concat_tables(tables, promote_options='permissive')
+
+    def _removes(self, paths: Iterable[str]) -> List[Dict[str, Any]]:
+        now = int(time.time() * 1000)
+        return [{'remove': {'path': path, 'deletionTimestamp': now, 'dataChange': True}} for path in paths]
+
+    def merged_sources(self) -> Set[str]:
+        """Джерела, вже злиті в цей рівень: дії txn комітів replace_days зі стану (checkpoint + нові коміти)"""
+        return set(self.log.state().transactions)
+
+    def replace_days(self, table: pa.Table, source: str = None):
+        """Агрегати кількох днів: файли цих днів замінюються новими одним комітом з позначкою source"""
+        self.log.ensure_table(self.schema, DEFAULT_PARTITION_BY, name=os.path.basename(self.table_path.rstrip('/')))
+        version, by_day = self._files_by_day()
+        days = sorted(_table_days(table))
+        actions = self._removes(path for day in days for path in by_day.get(day, ()))
+        for day in days:
+            mask = pc.and_(pc.and_(pc.equal(table.column('partition_year'), day.year),
+                                   pc.equal(table.column('partition_month'), day.month)),
+                           pc.equal(table.column('partition_day'), day.day))
+            part = table.filter(mask).select(self.data_schema.names)
+            values = {'partition_year': day.year, 'partition_month': day.month, 'partition_day': day.day}
+            relative_dir = partition_dir(values.keys(), values.values())
+            actions.append(write_data_file(self.table_path, relative_dir, part, self.profile, values))
+        if actions:
+            parameters = {'mode': 'Overwrite', 'predicate': _day_predicate(days)}
+            if source:
+                parameters['source'] = source
+                actions.append({'txn': {'appId': source, 'version': version + 1, 'lastUpdated': int(time.time() * 1000)}})
+            self.log.commit(actions, read_version=version, operation_parameters=parameters)
+
+    def delete_days(self, days: Iterable[date]):
+        version, by_day = self._files_by_day()
+        days = [day for day in days if day in by_day]
+        if days:
+            self.log.commit(self._removes(path for day in days for path in by_day[day]), operation="DELETE",
+                            read_version=version, operation_parameters={'predicate': _day_predicate(days)})
+
+    def vacuum(self, retention_hours: float) -> int:
+        """Фізичне видалення файлів, прибраних з таблиці раніше ніж retention_hours тому"""
+        state = self.log.state()
+        cutoff = (time.time() - retention_hours * 3600) * 1000
+        removed = 0
+        for remove in state.tombstones.values():
+            if remove['deletionTimestamp'] <= cutoff and remove['path'] not in state.files:
+                path = os.path.join(self.table_path, remove['path'])
+                if os.path.exists(path):
+                    os.remove(path)
+                    removed += 1
+        return removed
+
+
+class DeltaTierStore:
+    """Рівень історії в Delta таблиці через deltalake (az://... або локальний шлях)"""
+
+    def __init__(self, table_uri: str, schema: pa.Schema, time_column: str = 'timestamp',
+                 storage_options: Dict[str, str] = None, profile=None):
+        self.table_uri = table_uri
+        self.schema = schema
+        self.time_column = time_column
+        self.storage_options = storage_options
+        self.profile = profile
+
+    def _table(self):
+        from deltalake import DeltaTable
+        from deltalake.exceptions import TableNotFoundError
+
+        try:
+            return DeltaTable(self.table_uri, storage_options=self.storage_options)
+        except TableNotFoundError:
+            return None
+
+    def days(self) -> Set[date]:
+        table = self._table()
+        if table is None:
+            return set()
+        actions = table.get_add_actions(flatten=True).to_pydict()
+        columns = [actions.get(f"partition.{name}", []) for name in DEFAULT_PARTITION_BY]
+        return {day for day in (partition_date(dict(zip(DEFAULT_PARTITION_BY, values))) for values in zip(*columns))
+                if day is not None}
+
+    def read_days(self, days: Iterable[date]) -> pa.Table:
+        table = self._table()
+        parts = [] if table is None else [
+            table.to_pyarrow_table(partitions=[('partition_year', '=', str(day.year)),
+                                               ('partition_month', '=', str(day.month)),
+                                               ('partition_day', '=', str(day.day))])
+            for day in sorted(days)
+        ]
+        return pa.concat_tables(parts, promote_options='permissive') if parts else self.schema.empty_table()
+
+    def read_range(self, start: datetime, end: datetime) -> pa.Table:
+        """Рядки з міткою в [start, end]; файли відсікаються за статистикою, а не за партицією дати обробки"""
+        import pyarrow.dataset as ds
+
+        table = self._table()
+        if table is None:
+            return self.schema.empty_table()
+        field = ds.field(self.time_column)
+        return table.to_pyarrow_dataset().to_table(
+            filter=(field >= pa.scalar(_utc(start), TIMESTAMP)) & (field <= pa.scalar(_utc(end), TIMESTAMP)))
+
+    def merged_sources(self) -> Set[str]:
+        table = self._table()
+        if table is None:
+            return set()
+        sources = set()
+        for commit in table.history():
+            source = commit.get('source') or (commit.get('operationParameters') or {}).get('source')
+            if source:
+                sources.add(source)
+        return sources
+
+    def replace_days(self, table: pa.Table, source: str = None):
+        """Заміна днів одним комітом (overwrite з предикатом днів) з позначкою source у метаданих коміту"""
+        if not table.num_rows:
+            return
+        days = _table_days(table)
+        existing = self._table()
+        overwrite = existing is not None and bool(days & self.days())
+        write_delta_table(self.table_uri, table, self.storage_options, self.profile,
+                          mode="overwrite" if overwrite else "append", partition_by=DEFAULT_PARTITION_BY,
+                          predicate=_day_predicate(days) if overwrite else None,
+                          custom_metadata={'source': source} if source else None)
+
+    def delete_days(self, days: Iterable[date]):
+        table = self._table()
+        days = list(days)
+        if table is not None and days:
+            table.delete(_day_predicate(days))
+
+    def vacuum(self, retention_hours: float) -> int:
+        table = self._table()
+        if table is None:
+            return 0
+        return len(table.vacuum(retention_hours=int(retention_hours), enforce_retention_duration=False, dry_run=False))
+
+
+def tier_stores(base: str = "delta_lake_output", storage_options: Dict[str, str] = None,
+                raw_table: str = FULL_TABLE) -> Dict[str, Any]:
+    """Рівні від найдетальнішого: raw, 1m, 15m; з storage_options - через deltalake, інакше локальні"""
+    tables = {'raw': (raw_table, 'timestamp')}
+    tables.update({tier: (table, 'bucket_start') for tier, table in DOWNSAMPLE_TABLES.items()})
+    if storage_options is not None:
+        return {tier: DeltaTierStore(f"{base}/{table}", get_schema(table), time_column, storage_options)
+                for tier, (table, time_column) in tables.items()}
+    return {tier: LocalTierStore(f"{base}/{table}", get_schema(table), time_column)
+            for tier, (table, time_column) in tables.items()}
+
+
+class RetentionJob:
+    """
+    Перенесення історії між рівнями.
+
+    День сирих даних, старший за retention_days['raw'], агрегується в 1 хв і далі в 15 хв,
+    після чого його партиція видаляється. Сирі дані партиціоновані датою обробки, тож агрегати
+    одного сирого дня можуть потрапити в кілька днів подій: вони зливаються з уже збереженими
+    (merge_aggregates), а не замінюють їх. Коміт злиття позначається джерелом ('raw:<день>'),
+    тож повторний запуск після збою пропускає вже злиті рівні замість подвійного підрахунку.
+    День рівня 1m, старший за його строк, видаляється, коли відповідний день 15m вже записаний.
+    """
+
+    def __init__(self, stores: Dict[str, Any], retention_days: Dict[str, Optional[int]] = None,
+                 vacuum_hours: Optional[float] = None, dry_run: bool = False):
+        self.stores = stores
+        self.retention_days = {**DEFAULT_RETENTION_DAYS, **(retention_days or {})}
+        self.vacuum_hours = vacuum_hours
+        self.dry_run = dry_run
+
+    def _expired(self, tier: str, day: date, today: date) -> bool:
+        days = self.retention_days.get(tier)
+        return days is not None and day < today - timedelta(days=days)
+
+    def _merge_into(self, tier: str, aggregates: pa.Table, source: str) -> bool:
+        """Злиття агрегатів у рівень один раз на джерело; False, якщо це джерело вже злите"""
+        store = self.stores[tier]
+        if source in store.merged_sources():
+            return False
+        existing = store.read_days(_table_days(aggregates))
+        store.replace_days(merge_aggregates(existing, aggregates, tier), source=source)
+        return True
+
+    def run(self, today: date = None) -> Dict[str, Any]:
+        today = today or datetime.now(timezone.utc).date()
+        tiers = list(TIER_SECONDS)
+        summary = {'downsampled': {}, 'deleted': {tier: [] for tier in self.stores}}
+
+        raw = self.stores['raw']
+        for day in sorted(day for day in raw.days() if self._expired('raw', day, today)):
+            if self.dry_run:
+                summary['downsampled'][day] = {}
+                continue
+            source = raw.read_days([day])
+            counts = {'raw': source.num_rows}
+            aggregates = None
+            for tier in tiers:
+                aggregates = downsample(source, tier) if aggregates is None else coarsen(aggregates, tier)
+                counts[tier] = aggregates.num_rows
+                if not self._expired(tier, day, today):
+                    self._merge_into(tier, aggregates, f"raw:{day}")
+            raw.delete_days([day])
+            summary['downsampled'][day] = counts
+            summary['deleted']['raw'].append(day)
+            print(f" Зберігання: {day} - {counts['raw']} сирих записів -> "
+                  + ", ".join(f"{tier} {counts[tier]}" for tier in tiers))
+
+        # Рівень видаляється лише після того, як наступний (грубіший) має цей день
+        for tier, coarser in zip(tiers, tiers[1:] + [None]):
+            store = self.stores[tier]
+            expired = sorted(day for day in store.days() if self._expired(tier, day, today))
+            if not expired or self.dry_run:
+                summary['deleted'][tier] = expired
+                continue
+            if coarser is not None:
+                missing = [day for day in expired if day not in self.stores[coarser].days()]
+                for day in missing:
+                    self._merge_into(coarser, coarsen(store.read_days([day]), coarser), f"{tier}:{day}")
+            store.delete_days(expired)
+            summary['deleted'][tier] = expired
+            print(f" Зберігання: рівень {tier} - видалено {len(expired)} днів (до {expired[-1]})")
+
+        if self.vacuum_hours is not None and not self.dry_run:
+            for tier, days in summary['deleted'].items():
+                if days:
+                    removed = self.stores[tier].vacuum(self.vacuum_hours)
+                    print(f" Зберігання: рівень {tier} - фізично видалено {removed} файлів")
+        return summary
+
+
+class TieredReader:
+    """
+    Читання діапазону часу з найдетальнішого рівня, що має всі дні діапазону. Діапазон через межу
+    зберігання (свіжі дні лише в сирих, старі - лише в агрегатах) зшивається: кожен день береться з
+    найдетальнішого рівня, де він є, і все зводиться до найгрубішого з цих рівнів
+    """
+
+    def __init__(self, stores: Dict[str, Any]):
+        self.stores = stores
+
+    @staticmethod
+    def _days(start: datetime, end: datetime) -> Set[date]:
+        first, last = _utc(start).astimezone(timezone.utc).date(), _utc(end).astimezone(timezone.utc).date()
+        return {first + timedelta(days=offset) for offset in range((last - first).days + 1)}
+
+    def _plan(self, start: datetime, end: datetime) -> Tuple[Optional[str], Dict[str, Set[date]]]:
+        """(рівень результату, рівень-джерело -> дні, які з нього беруться)"""
+        requested = self._days(start, end)
+        available = {tier: store.days() & requested for tier, store in self.stores.items()}
+        present = set().union(*available.values())
+        if not present:
+            return None, {}
+        for tier, days in available.items():
+            if days >= present:
+                return tier, {tier: days}
+        tiers = list(self.stores)
+        sources: Dict[str, Set[date]] = {}
+        for day in present:
+            sources.setdefault(next(tier for tier in tiers if day in available[tier]), set()).add(day)
+        return max(sources, key=tiers.index), sources
+
+    def tier_for(self, start: datetime, end: datetime) -> Optional[str]:
+        """Рівень, у якому повертається результат read"""
+        return self._plan(start, end)[0]
+
+    def _source_rows(self, tier: str, start: datetime, end: datetime, turbine_id: Optional[str]) -> pa.Table:
+        store = self.stores[tier]
+        table = store.read_range(start, end)
+        times = table.column(store.time_column)
+        mask = pc.and_(pc.greater_equal(times, pa.scalar(_utc(start), TIMESTAMP)),
+                       pc.less_equal(times, pa.scalar(_utc(end), TIMESTAMP)))
+        if turbine_id is not None:
+            mask = pc.and_(mask, pc.equal(_decode(table.column('turbine_id')), turbine_id))
+        return table.filter(mask)
+
+    def read(self, start: datetime, end: datetime, turbine_id: str = None) -> Tuple[Optional[str], pa.Table]:
+        """(рівень, рядки з міткою часу в [start, end]); для агрегатів мітка - початок інтервалу"""
+        tier, sources = self._plan(start, end)
+        if tier is None:
+            return None, pa.table({})
+        time_column = self.stores[tier].time_column
+        if len(sources) == 1:
+            return tier, self._source_rows(tier, start, end, turbine_id).sort_by(time_column)
+
+        result = None
+        for source in sorted(sources, key=list(self.stores).index):
+            table = self._source_rows(source, start, end, turbine_id)
+            if source == 'raw':
+                # Сирі рядки не перетинаються з агрегатами (день злитий - партицію видалено), тож беруться всі,
+                # зокрема пізні події днів, що вже в агрегатах
+                table = downsample(table, tier)
+            else:
+                # Дні агрегатів є і в грубіших рівнях - з кожного рівня лише його дні
+                days = pc.is_in(pc.strftime(table.column(self.stores[source].time_column), format='%Y-%m-%d'),
+                                pa.array([day.isoformat() for day in sources[source]]))
+                table = table.filter(days)
+                if source != tier:
+                    table = coarsen(table, tier)
+            result = table if result is None else merge_aggregates(result, table, tier)
+        return tier, result.sort_by(time_column)
+
+    def read_series(self, turbine_id: str, metric: str, start: datetime, end: datetime,
+                    max_points: int = None) -> Tuple[Optional[str], pa.Table]:
+        """
+        Ряд для графіка: timestamp, value, min, max. Для сирих даних min = max = value,
+        для агрегатів - середнє та обвідна інтервалу. max_points - проріджування LTTB.
+        """
+        tier, table = self.read(start, end, turbine_id)
+        if tier is None:
+            return None, pa.table({'timestamp': pa.array([], TIMESTAMP), 'value': pa.array([], pa.float64()),
+                                   'min': pa.array([], pa.float64()), 'max': pa.array([], pa.float64())})
+        if tier == 'raw':
+            value = table.column(metric).cast(pa.float64())
+            series = pa.table({'timestamp': table.column('timestamp'), 'value': value, 'min': value, 'max': value})
+        else:
+            series = pa.table({'timestamp': table.column('bucket_start'), 'value': table.column(f"{metric}_mean"),
+                               'min': table.column(f"{metric}_min"), 'max': table.column(f"{metric}_max")})
+        series = series.filter(pc.is_valid(series.column('value')))
+
+        if max_points and series.num_rows > max_points:
+            x = series.column('timestamp').cast(pa.int64()).to_numpy()
+            indices = lttb(x, series.column('value').to_numpy(), max_points)
+            series = series.take(pa.array(indices))
+        return tier, series
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Зниження роздільності та видалення старої телеметрії за рівнями")
+    parser.add_argument('--base-dir', default="delta_lake_output", help="Тека локальних таблиць")
+    parser.add_argument('--azure', action='store_true', help=f"Таблиці в az://{CONTAINER_NAME}")
+    parser.add_argument('--raw-table', default=FULL_TABLE)
+    parser.add_argument('--raw-days', type=int, default=DEFAULT_RETENTION_DAYS['raw'])
+    parser.add_argument('--minute-days', type=int, default=DEFAULT_RETENTION_DAYS['1m'])
+    parser.add_argument('--vacuum-hours', type=float, default=None,
+                        help="Фізично видаляти файли, прибрані раніше ніж N годин тому")
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    if args.azure:
+        stores = tier_stores(f"az://{CONTAINER_NAME}",
+                             {'account_name': STORAGE_ACCOUNT_NAME, 'account_key': STORAGE_ACCOUNT_KEY}, args.raw_table)
+    else:
+        stores = tier_stores(args.base_dir, raw_table=args.raw_table)
+    job = RetentionJob(stores, {'raw': args.raw_days, '1m': args.minute_days},
+                       vacuum_hours=args.vacuum_hours, dry_run=args.dry_run)
+    summary = job.run()
+    print(f" Зберігання: агреговано {len(summary['downsampled'])} днів сирих даних; видалено "
+          + ", ".join(f"{tier}: {len(days)}" for tier, days in summary['deleted'].items()))
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
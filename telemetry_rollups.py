@@ -0,0 +1,358 @@
+"""
+Інкрементальні агрегати по турбінах у вікнах 1 хв / 10 хв / 1 год, що ведуться під час запису
+"""
+
+import math
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, Callable, List, Optional, Sequence, Tuple
+
+import telemetry_json
+from telemetry_metrics import OPERATIONAL_STATUSES
+from telemetry_schemas import ROLLUP_TABLES, build_table
+
+# Довжина вікон у секундах
+ROLLUP_WINDOWS = {'1m': 60, '10m': 600, '1h': 3600}
+# Ключ рядка агрегату: повторний запис того самого вікна оновлює рядок, а не додає ще один
+ROLLUP_KEY = ('turbine_id', 'window', 'window_start')
+
+# Наскільки запис може відставати від найпізнішої мітки часу своєї турбіни, щоб ще оновити вікно
+DEFAULT_ALLOWED_LATENESS = 120.0
+# Турбіна, що мовчить довше (за найпізнішою міткою парку), не тримає свої вікна відкритими
+DEFAULT_IDLE_TIMEOUT = 600.0
+# Найбільший проміжок між записами турбіни, що зараховується в енергію (довші - пропуск даних)
+DEFAULT_MAX_SAMPLE_GAP = 60.0
+# Закриті вікна передаються в emit пакетом не частіше, ніж раз на стільки секунд
+DEFAULT_EMIT_INTERVAL = 5.0
+# Відкриті вікна та водяні знаки на момент зупинки
+DEFAULT_STATE_PATH = "delta_lake_output/checkpoints/rollup_state.json"
+# Колонки рядка агрегату з мітками часу (у збереженому стані - ISO рядки)
+_TIME_COLUMNS = ('window_start', 'window_end', 'closed_at')
+
+
+def event_time(value: Any) -> Optional[float]:
+    """Мітка часу запису (ISO рядок або datetime) -> секунди UTC; мітки без зони вважаються UTC"""
+    if value is None or value == '':
+        return None
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class _WindowState:
+    """Накопичувач одного вікна однієї турбіни"""
+
+    __slots__ = ('count', 'power_sum', 'power_min', 'power_max', 'energy_kwh', 'nominal_power_kw',
+                 'status_counts', 'late_samples')
+
+    def __init__(self):
+        self.count = 0
+        self.power_sum = 0.0
+        self.power_min = math.inf
+        self.power_max = -math.inf
+        self.energy_kwh = 0.0
+        self.nominal_power_kw = 0
+        self.status_counts = [0] * (len(OPERATIONAL_STATUSES) + 1)
+        self.late_samples = 0
+
+    def dump(self) -> List[Any]:
+        return [getattr(self, name) for name in self.__slots__]
+
+    @classmethod
+    def restore(cls, values: List[Any]) -> '_WindowState':
+        state = cls()
+        for name, value in zip(cls.__slots__, values):
+            setattr(state, name, value)
+        return state
+
+
+class RollupAggregator:
+    """
+    Агрегати потужності по турбінах у вікнах фіксованої довжини (tumbling).
+
+    Водяний знак ведеться для кожної турбіни окремо: її найпізніша мітка часу мінус allowed_lateness,
+    тож турбіна, що відстає (буфер на шлюзі, повільний канал), не втрачає записів через інші.
+    Турбіна без записів довше idle_timeout за часом парку закриває свої вікна за водяним знаком парку.
+    Вікно закривається, коли водяний знак турбіни проходить його кінець; закриті рядки передаються
+    в emit(назва_вікна, рядки) пакетом раз на emit_interval секунд. Запізнілі записи в межах
+    allowed_lateness оновлюють ще відкрите вікно, старші за водяний знак - відкидаються.
+
+    close() не видає неповні вікна, а зберігає їх у state_path: після перезапуску вікно продовжується
+    і записується один раз. flush() закриває всі вікна (кінець даних).
+    """
+
+    def __init__(self, emit: Callable[[str, List[Dict[str, Any]]], None], windows: Sequence[str] = tuple(ROLLUP_WINDOWS),
+                 allowed_lateness: float = DEFAULT_ALLOWED_LATENESS, max_sample_gap: float = DEFAULT_MAX_SAMPLE_GAP,
+                 idle_timeout: float = DEFAULT_IDLE_TIMEOUT, emit_interval: float = DEFAULT_EMIT_INTERVAL,
+                 state_path: Optional[str] = DEFAULT_STATE_PATH):
+        self.emit = emit
+        self.windows = {name: ROLLUP_WINDOWS[name] for name in windows}
+        self.allowed_lateness = allowed_lateness
+        self.max_sample_gap = max_sample_gap
+        self.idle_timeout = idle_timeout
+        self.emit_interval = emit_interval
+        self.state_path = state_path
+
+        # Відкриті вікна: назва -> турбіна -> початок вікна -> накопичувач
+        self._state: Dict[str, Dict[str, Dict[int, _WindowState]]] = {name: {} for name in self.windows}
+        # Остання мітка та типовий інтервал кожної турбіни - для розрахунку енергії
+        self._last_seen: Dict[str, float] = {}
+        self._typical_interval: Dict[str, float] = {}
+        # Найпізніші мітки часу кожної турбіни та всього парку
+        self._turbine_max: Dict[str, float] = {}
+        self._max_event_time = -math.inf
+        # Межі, до яких вікна вже закриті (по турбінах і за простоєм): сканування лише коли водяний знак її перейшов
+        self._closed_until: Dict[str, Dict[str, float]] = {name: {} for name in self.windows}
+        self._idle_closed_until = {name: -math.inf for name in self.windows}
+        # Закриті, ще не передані в emit рядки за (турбіна, початок вікна)
+        self._closed: Dict[str, Dict[Tuple[str, int], Dict[str, Any]]] = {name: {} for name in self.windows}
+        self._last_emit = time.monotonic()
+        self._lock = threading.Lock()
+
+        self.samples = 0
+        self.late_dropped = 0
+        self.windows_emitted = 0
+
+        if state_path and os.path.exists(state_path):
+            self.load_state(state_path)
+
+    @property
+    def watermark(self) -> float:
+        """Водяний знак парку: нижня межа водяних знаків усіх турбін"""
+        return self._max_event_time - self.idle_timeout
+
+    def turbine_watermark(self, turbine_id: str) -> float:
+        return max(self._turbine_max.get(turbine_id, -math.inf) - self.allowed_lateness, self.watermark)
+
+    def _sample_hours(self, turbine_id: str, timestamp: float) -> float:
+        """Інтервал, який представляє запис: проміжок від попереднього запису турбіни (для запізнілих - типовий)"""
+        last = self._last_seen.get(turbine_id)
+        typical = self._typical_interval.get(turbine_id, 0.0)
+        if last is None or timestamp <= last:
+            seconds = typical
+        else:
+            seconds = min(timestamp - last, self.max_sample_gap)
+            self._typical_interval[turbine_id] = seconds if not typical else 0.9 * typical + 0.1 * seconds
+        if last is None or timestamp > last:
+            self._last_seen[turbine_id] = timestamp
+        return seconds / 3600
+
+    def update(self, records: List[Dict[str, Any]]):
+        """Плоскі записи (turbine_id, timestamp, output_power, nominal_power_kw, operational_status)"""
+        with self._lock:
+            touched = set()
+            for record in records:
+                timestamp = event_time(record.get('timestamp'))
+                if timestamp is None:
+                    continue
+                turbine_id = str(record.get('turbine_id') or 'unknown')
+                if timestamp < self.turbine_watermark(turbine_id):
+                    self.late_dropped += 1
+                    continue
+
+                power = float(record.get('output_power') or 0.0)
+                status = record.get('operational_status')
+                status_index = OPERATIONAL_STATUSES.index(status) if status in OPERATIONAL_STATUSES else len(OPERATIONAL_STATUSES)
+                energy_kwh = power * self._sample_hours(turbine_id, timestamp)
+                latest = self._turbine_max.get(turbine_id, -math.inf)
+                late = timestamp < latest
+
+                for name, size in self.windows.items():
+                    windows = self._state[name].setdefault(turbine_id, {})
+                    start = int(timestamp // size) * size
+                    state = windows.get(start)
+                    if state is None:
+                        state = windows[start] = _WindowState()
+                    state.count += 1
+                    state.power_sum += power
+                    state.power_min = min(state.power_min, power)
+                    state.power_max = max(state.power_max, power)
+                    state.energy_kwh += energy_kwh
+                    state.nominal_power_kw = int(record.get('nominal_power_kw') or state.nominal_power_kw)
+                    state.status_counts[status_index] += 1
+                    state.late_samples += late
+
+                self.samples += 1
+                self._turbine_max[turbine_id] = max(latest, timestamp)
+                self._max_event_time = max(self._max_event_time, timestamp)
+                touched.add(turbine_id)
+
+            self._close_windows(touched)
+            ready = self._take_ready()
+        self._emit(ready)
+
+    def _close_windows(self, turbines: set):
+        """Вікна, кінець яких пройшов водяний знак турбіни, переходять до закритих"""
+        closed_at = datetime.now(timezone.utc)
+        for name, size in self.windows.items():
+            candidates = set(turbines)
+            if not math.isinf(self.watermark):
+                # Водяний знак парку перейшов межу вікна - перевіряються й турбіни без нових записів
+                idle_boundary = (self.watermark // size) * size
+                if idle_boundary > self._idle_closed_until[name]:
+                    self._idle_closed_until[name] = idle_boundary
+                    candidates.update(self._state[name])
+            for turbine_id in candidates:
+                watermark = self.turbine_watermark(turbine_id)
+                if math.isinf(watermark):
+                    continue
+                boundary = (watermark // size) * size
+                if boundary <= self._closed_until[name].get(turbine_id, -math.inf):
+                    continue
+                self._closed_until[name][turbine_id] = boundary
+                windows = self._state[name].get(turbine_id, {})
+                for start in [start for start in windows if start + size <= boundary]:
+                    self._closed[name][(turbine_id, start)] = self._row(name, size, turbine_id, start,
+                                                                         windows.pop(start), closed_at)
+                if not windows:
+                    self._state[name].pop(turbine_id, None)
+
+    def _close_all(self):
+        closed_at = datetime.now(timezone.utc)
+        for name, size in self.windows.items():
+            for turbine_id, windows in self._state[name].items():
+                for start, state in windows.items():
+                    self._closed[name][(turbine_id, start)] = self._row(name, size, turbine_id, start, state, closed_at)
+            self._state[name] = {}
+
+    def _take_ready(self, force: bool = False) -> Dict[str, List[Dict[str, Any]]]:
+        """Закриті рядки для emit, якщо минув emit_interval (або force)"""
+        if not force and time.monotonic() - self._last_emit < self.emit_interval:
+            return {}
+        self._last_emit = time.monotonic()
+        ready = {name: [rows[key] for key in sorted(rows)] for name, rows in self._closed.items() if rows}
+        self._closed = {name: {} for name in self.windows}
+        return ready
+
+    def _row(self, name: str, size: int, turbine_id: str, start: int, state: _WindowState,
+             closed_at: datetime) -> Dict[str, Any]:
+        window_start = datetime.fromtimestamp(start, timezone.utc)
+        capacity_kwh = state.nominal_power_kw * size / 3600
+        return {
+            'turbine_id': turbine_id,
+            'window': name,
+            'window_start': window_start,
+            'window_end': datetime.fromtimestamp(start + size, timezone.utc),
+            'sample_count': state.count,
+            'mean_power_kw': state.power_sum / state.count,
+            'min_power_kw': state.power_min,
+            'max_power_kw': state.power_max,
+            'energy_kwh': state.energy_kwh,
+            'nominal_power_kw': state.nominal_power_kw or None,
+            'capacity_factor': state.energy_kwh / capacity_kwh if capacity_kwh > 0 else None,
+            **{f"status_{status}": count for status, count in zip(OPERATIONAL_STATUSES + ('other',), state.status_counts)},
+            'late_samples': state.late_samples,
+            'closed_at': closed_at,
+            'partition_year': window_start.year,
+            'partition_month': window_start.month,
+            'partition_day': window_start.day,
+        }
+
+    def _emit(self, ready: Dict[str, List[Dict[str, Any]]]):
+        for name, rows in ready.items():
+            try:
+                self.emit(name, rows)
+                self.windows_emitted += len(rows)
+            except Exception as e:
+                print(f" Агрегати {name}: помилка запису {len(rows)} вікон, повтор з наступним пакетом: {e}")
+                with self._lock:
+                    # Рядок вікна, закритого повторно за цей час, новіший - він і лишається
+                    for row in rows:
+                        key = (row['turbine_id'], int(row['window_start'].timestamp()))
+                        self._closed[name].setdefault(key, row)
+
+    def flush(self):
+        """Закриття всіх відкритих вікон і запис усіх закритих (кінець даних)"""
+        with self._lock:
+            self._close_all()
+            ready = self._take_ready(force=True)
+        self._emit(ready)
+
+    def save_state(self, path: str = None):
+        """Відкриті вікна, водяні знаки та ще не записані закриті вікна у JSON: тимчасовий файл і атомарна заміна"""
+        path = path or self.state_path
+        with self._lock:
+            state = {
+                'windows': self.windows,
+                'open': {name: {turbine_id: {str(start): window.dump() for start, window in windows.items()}
+                                for turbine_id, windows in turbines.items()}
+                         for name, turbines in self._state.items()},
+                'closed': {name: list(rows.values()) for name, rows in self._closed.items()},
+                'turbine_max': self._turbine_max,
+                'max_event_time': None if math.isinf(self._max_event_time) else self._max_event_time,
+                'last_seen': self._last_seen,
+                'typical_interval': self._typical_interval,
+            }
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(telemetry_json.dumps_bytes(state, pretty=False))
+        os.replace(temp_path, path)
+
+    def load_state(self, path: str = None):
+        """Відновлення відкритих вікон після перезапуску"""
+        path = path or self.state_path
+        try:
+            with open(path, 'rb') as f:
+                state = telemetry_json.loads(f.read())
+            if state['windows'] != self.windows:
+                print(f" Агрегати: стан {path} має інші вікна, не відновлено")
+                return
+            with self._lock:
+                self._state = {name: {turbine_id: {int(start): _WindowState.restore(values)
+                                                   for start, values in windows.items()}
+                                      for turbine_id, windows in turbines.items()}
+                               for name, turbines in state['open'].items()}
+                for name, rows in state['closed'].items():
+                    for row in rows:
+                        row.update({column: datetime.fromisoformat(row[column]) for column in _TIME_COLUMNS})
+                        self._closed[name][(row['turbine_id'], int(row['window_start'].timestamp()))] = row
+                self._turbine_max = state['turbine_max']
+                self._max_event_time = -math.inf if state['max_event_time'] is None else state['max_event_time']
+                self._last_seen = state['last_seen']
+                self._typical_interval = state['typical_interval']
+        except Exception as e:
+            print(f" Агрегати: помилка читання стану {path}: {e}")
+            return
+        print(f" Агрегати: відновлено {self.open_windows()} відкритих вікон з {path}")
+
+    def close(self):
+        """Зупинка: закриті вікна записуються, відкриті зберігаються у state_path (без нього - flush)"""
+        if not self.state_path:
+            self.flush()
+            return
+        with self._lock:
+            ready = self._take_ready(force=True)
+        self._emit(ready)
+        self.save_state()
+
+    def open_windows(self) -> int:
+        return sum(len(windows) for turbines in self._state.values() for windows in turbines.values())
+
+
+class LocalRollupWriter:
+    """
+    Запис закритих вікон у локальні Delta таблиці delta-lake-turbine-rollup-*: upsert за ROLLUP_KEY,
+    тож повторний запис вікна (повтор після збою, перезапуск) замінює рядок, а не дублює його
+    """
+
+    def __init__(self, base_dir: str = "delta_lake_output", windows: Sequence[str] = tuple(ROLLUP_WINDOWS)):
+        self.tables = {name: f"{base_dir}/{ROLLUP_TABLES[name]}" for name in windows}
+
+    def __call__(self, window: str, rows: List[Dict[str, Any]]):
+        from telemetry_delta_sink import DEFAULT_PARTITION_BY, merge_local_table
+
+        merge_local_table(self.tables[window], build_table(ROLLUP_TABLES[window], rows), ROLLUP_KEY,
+                          partition_by=DEFAULT_PARTITION_BY)
+
+    def close(self):
+        """Рядки пишуться одразу в __call__; метод лишено для сумісності з іншими приймачами"""
\ No newline at end of file
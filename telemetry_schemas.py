@@ -0,0 +1,284 @@
+"""
+Реєстр Arrow схем Delta таблиць: типи колонок оголошені один раз, пакети будуються без виведення типів
+"""
+
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from typing import Dict, Any, List, Sequence
+
+import pyarrow as pa
+
+TELEMETRY_TABLE = "delta-lake-turbine-telemetry"
+FULL_TABLE = "delta-lake-turbine-telemetry-full"
+VARIED_TABLE = "delta-lake-turbine-telemetry-varied"
+# Останній стан кожної турбіни (один рядок на турбіну, оновлюється MERGE)
+CURRENT_STATE_TABLE = "turbine_current_state"
+# Сповіщення потокового детектора аномалій
+ALERTS_TABLE = "turbine_alerts"
+# Відбраковані перевіркою якості записи (сирий запис зберігається JSON рядком)
+QUARANTINE_TABLE = "delta-lake-turbine-telemetry-quarantine"
+# Агрегати по турбінах у вікнах фіксованої довжини
+ROLLUP_TABLES = {
+    '1m': "delta-lake-turbine-rollup-1m",
+    '10m': "delta-lake-turbine-rollup-10m",
+    '1h': "delta-lake-turbine-rollup-1h",
+}
+# Рівні зберігання історії: сира телеметрія знижується до 1 хв, потім до 15 хв (обвідні min/max)
+DOWNSAMPLE_TABLES = {
+    '1m': "delta-lake-turbine-telemetry-1m",
+    '15m': "delta-lake-turbine-telemetry-15m",
+}
+DOWNSAMPLE_METRICS = ('output_power', 'rotor_rpm', 'voltage', 'current', 'power_factor', 'wind_speed_ms')
+
+# Колонки з малою кількістю різних значень зберігаються словником
+CATEGORY = pa.dictionary(pa.int32(), pa.string())
+TIMESTAMP = pa.timestamp('us', tz='UTC')
+
+_BASE_COLUMNS = [
+    ('record_id', pa.string()),
+    ('turbine_id', CATEGORY),
+    ('timestamp', TIMESTAMP),
+    ('processing_timestamp', TIMESTAMP),
+    ('output_power', pa.float64()),
+    ('rotor_rpm', pa.float64()),
+    ('max_power_limit', pa.float64()),
+    ('voltage', pa.float64()),
+    ('current', pa.float64()),
+    ('power_factor', pa.float64()),
+    ('partition_year', pa.int32()),
+    ('partition_month', pa.int32()),
+    ('partition_day', pa.int32()),
+]
+
+_TURBINE_COLUMNS = [
+    ('turbine_name', CATEGORY),
+    ('location_lat', pa.float64()),
+    ('location_lng', pa.float64()),
+    ('manufacturer', CATEGORY),
+    ('model', CATEGORY),
+    ('nominal_power_kw', pa.int32()),
+    ('installation_date', pa.date32()),
+    ('turbine_status', CATEGORY),
+]
+
+_METRIC_COLUMNS = [
+    ('efficiency_percent', pa.float64()),
+    ('operational_status', CATEGORY),
+    ('calculated_power_kw', pa.float64()),
+]
+
+_ENVIRONMENT_COLUMNS = [
+    ('wind_speed_ms', pa.float64()),
+    ('wind_direction_degrees', pa.int32()),
+    ('temperature_celsius', pa.float64()),
+    ('humidity_percent', pa.float64()),
+    ('air_pressure_hpa', pa.float64()),
+    ('visibility_km', pa.float64()),
+    ('precipitation_mm', pa.float64()),
+]
+
+_MAINTENANCE_COLUMNS = [
+    ('maintenance_status', CATEGORY),
+    ('last_maintenance_date', pa.date32()),
+    ('next_maintenance_date', pa.date32()),
+    ('efficiency_rating', pa.float64()),
+    ('operating_hours', pa.float64()),
+    ('maintenance_notes', pa.string()),
+    ('technician_name', CATEGORY),
+]
+
+_SOURCE_COLUMNS = [
+    ('data_quality_score', pa.float64()),
+    ('enrichment_version', CATEGORY),
+    ('source', CATEGORY),
+    ('processed_by', CATEGORY),
+]
+
+# Порядок колонок - як у відповідних prepare_flat_data
+SCHEMAS = {
+    TELEMETRY_TABLE: pa.schema(_BASE_COLUMNS + _TURBINE_COLUMNS + _METRIC_COLUMNS + [
+        ('data_quality_score', pa.float64()),
+        ('quality_flags', pa.int64()),
+        ('enrichment_version', CATEGORY),
+        ('sql_metadata_loaded', pa.bool_()),
+    ]),
+    FULL_TABLE: pa.schema(_BASE_COLUMNS + [('partition_turbine', CATEGORY)] + _TURBINE_COLUMNS + _METRIC_COLUMNS
+                          + _ENVIRONMENT_COLUMNS + _MAINTENANCE_COLUMNS + _SOURCE_COLUMNS + [
+        ('sensor_count', pa.int32()),
+        ('has_environmental_data', pa.bool_()),
+        ('has_maintenance_data', pa.bool_()),
+        ('record_version', CATEGORY),
+    ]),
+    VARIED_TABLE: pa.schema(_BASE_COLUMNS + [('partition_turbine', CATEGORY)] + _TURBINE_COLUMNS + _ENVIRONMENT_COLUMNS
+                            + _MAINTENANCE_COLUMNS + _METRIC_COLUMNS + _SOURCE_COLUMNS + [
+        ('record_version', CATEGORY),
+        ('has_time_variation', pa.bool_()),
+    ]),
+}
+
+_ROLLUP_SCHEMA = pa.schema([
+    ('turbine_id', CATEGORY),
+    ('window', CATEGORY),
+    ('window_start', TIMESTAMP),
+    ('window_end', TIMESTAMP),
+    ('sample_count', pa.int64()),
+    ('mean_power_kw', pa.float64()),
+    ('min_power_kw', pa.float64()),
+    ('max_power_kw', pa.float64()),
+    ('energy_kwh', pa.float64()),
+    ('nominal_power_kw', pa.int32()),
+    ('capacity_factor', pa.float64()),
+    ('status_stopped', pa.int64()),
+    ('status_low_generation', pa.int64()),
+    ('status_generating', pa.int64()),
+    ('status_other', pa.int64()),
+    ('late_samples', pa.int64()),
+    ('closed_at', TIMESTAMP),
+    ('partition_year', pa.int32()),
+    ('partition_month', pa.int32()),
+    ('partition_day', pa.int32()),
+])
+SCHEMAS.update({table: _ROLLUP_SCHEMA for table in ROLLUP_TABLES.values()})
+
+_DOWNSAMPLE_SCHEMA = pa.schema([
+    ('turbine_id', CATEGORY),
+    ('bucket_start', TIMESTAMP),
+    ('bucket_end', TIMESTAMP),
+    ('sample_count', pa.int64()),
+    ('first_timestamp', TIMESTAMP),
+    ('last_timestamp', TIMESTAMP),
+] + [(f"{metric}_{stat}", pa.float64()) for metric in DOWNSAMPLE_METRICS for stat in ('mean', 'min', 'max')] + [
+    ('partition_year', pa.int32()),
+    ('partition_month', pa.int32()),
+    ('partition_day', pa.int32()),
+])
+SCHEMAS.update({table: _DOWNSAMPLE_SCHEMA for table in DOWNSAMPLE_TABLES.values()})
+
+SCHEMAS[CURRENT_STATE_TABLE] = pa.schema([
+    ('turbine_id', pa.string()),
+    ('timestamp', TIMESTAMP),
+    ('output_power', pa.float64()),
+    ('rotor_rpm', pa.float64()),
+    ('voltage', pa.float64()),
+    ('current', pa.float64()),
+    ('power_factor', pa.float64()),
+    ('operational_status', CATEGORY),
+    ('efficiency_percent', pa.float64()),
+    ('calculated_power_kw', pa.float64()),
+    ('turbine_status', CATEGORY),
+    ('data_quality_score', pa.float64()),
+    ('quality_flags', pa.int64()),
+    ('updated_at', TIMESTAMP),
+])
+
+SCHEMAS[ALERTS_TABLE] = pa.schema([
+    ('alert_id', pa.string()),
+    ('turbine_id', CATEGORY),
+    ('timestamp', TIMESTAMP),
+    ('detected_at', TIMESTAMP),
+    ('metric', CATEGORY),
+    ('kind', CATEGORY),
+    ('value', pa.float64()),
+    ('expected', pa.float64()),
+    ('score', pa.float64()),
+    ('threshold', pa.float64()),
+    ('partition_year', pa.int32()),
+    ('partition_month', pa.int32()),
+    ('partition_day', pa.int32()),
+])
+
+SCHEMAS[QUARANTINE_TABLE] = pa.schema([
+    ('turbine_id', CATEGORY),
+    ('timestamp', TIMESTAMP),
+    ('output_power', pa.float64()),
+    ('rotor_rpm', pa.float64()),
+    ('max_power_limit', pa.float64()),
+    ('voltage', pa.float64()),
+    ('current', pa.float64()),
+    ('power_factor', pa.float64()),
+    ('violation_mask', pa.int32()),
+    ('violations', pa.string()),
+    ('quality_score', pa.float64()),
+    ('quarantined_at', TIMESTAMP),
+    ('raw_record', pa.string()),
+    ('partition_year', pa.int32()),
+    ('partition_month', pa.int32()),
+    ('partition_day', pa.int32()),
+])
+
+# Рядки, що у плоских записах позначають відсутнє значення
+_MISSING = ('', 'None', 'null', 'NaT')
+
+
+@lru_cache(maxsize=None)
+def get_schema(table: str) -> pa.Schema:
+    """Схема за назвою або шляхом таблиці (az://контейнер/назва, локальна тека)"""
+    name = table.rstrip('/').rsplit('/', 1)[-1]
+    if name not in SCHEMAS:
+        raise KeyError(f"Схема для таблиці {table} не зареєстрована")
+    return SCHEMAS[name]
+
+
+def _parse_datetime(value: Any) -> datetime:
+    if isinstance(value, datetime):
+        parsed = value
+    elif isinstance(value, date):
+        parsed = datetime(value.year, value.month, value.day)
+    else:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    # Мітки без зони вважаються UTC
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _temporal_array(values: List[Any], arrow_type: pa.DataType) -> pa.Array:
+    """ISO рядки -> timestamp/date: векторне приведення Arrow, для нестандартних рядків - розбір по значенню"""
+    values = [None if value is None or (isinstance(value, str) and value in _MISSING) else value for value in values]
+    if all(value is None or isinstance(value, str) for value in values):
+        try:
+            return pa.array(values, pa.string()).cast(arrow_type)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            pass
+    parsed = [None if value is None else _parse_datetime(value) for value in values]
+    if pa.types.is_date(arrow_type):
+        return pa.array([None if value is None else value.date() for value in parsed], arrow_type)
+    return pa.array(parsed, arrow_type)
+
+
+def column_array(values: List[Any], arrow_type: pa.DataType) -> pa.Array:
+    """Значення колонки -> масив заданого типу"""
+    if pa.types.is_timestamp(arrow_type) or pa.types.is_date(arrow_type):
+        return _temporal_array(values, arrow_type)
+    if pa.types.is_dictionary(arrow_type):
+        return pa.array(values, arrow_type.value_type).dictionary_encode().cast(arrow_type)
+    return pa.array(values, arrow_type)
+
+
+def records_to_table(records: Sequence[Dict[str, Any]], schema: pa.Schema) -> pa.Table:
+    """Плоскі записи -> таблиця за схемою; відсутні колонки - null, зайві ключі відкидаються"""
+    arrays = [column_array([record.get(field.name) for record in records], field.type) for field in schema]
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def build_table(table: str, records: Sequence[Dict[str, Any]]) -> pa.Table:
+    """Пакет для запису в зареєстровану таблицю"""
+    return records_to_table(records, get_schema(table))
+
+
+def _infer_array(values: List[Any]) -> pa.Array:
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Різнотипні значення однієї колонки (напр. число і рядок) передаються рядками
+        return pa.array([None if value is None else str(value) for value in values], pa.string())
+
+
+def infer_table(records: Sequence[Dict[str, Any]]) -> pa.Table:
+    """
+    Записи без зареєстрованої схеми -> таблиця. Колонки - об'єднання ключів усіх записів (у порядку
+    першої появи), тип кожної виводиться з усіх її значень, а не лише з першого запису
+    """
+    columns: Dict[str, None] = {}
+    for record in records:
+        columns.update(dict.fromkeys(record))
+    return pa.Table.from_arrays([_infer_array([record.get(name) for record in records]) for name in columns],
+                                names=list(columns))
\ No newline at end of file
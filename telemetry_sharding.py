@@ -0,0 +1,294 @@
+"""
+Багатопроцесне збагачення телеметрії з шардуванням по turbine_id (консистентне хешування)
+"""
+
+import bisect
+import hashlib
+import multiprocessing as mp
+import os
+import queue
+import time
+from typing import Dict, Any, List, Callable, Iterable, Iterator, Optional, Set, Tuple
+
+import pyarrow as pa
+
+from telemetry_schemas import infer_table
+
+DEFAULT_VIRTUAL_NODES = 64
+# Як часто producer, чекаючи на чергу, перевіряє, чи живі воркери
+LIVENESS_CHECK_SECONDS = 1.0
+# Скільки разів пакет втраченого воркера надсилається повторно (пакет, що валить воркери, не обходить увесь пул)
+MAX_BATCH_ATTEMPTS = 2
+# Скільки чекати на завершення воркера після маркера кінця, перш ніж зупинити його примусово
+JOIN_TIMEOUT_SECONDS = 10.0
+
+
+class ConsistentHashRing:
+    """Кільце консистентного хешування: турбіна завжди потрапляє до одного воркера"""
+
+    def __init__(self, nodes: Iterable[int], virtual_nodes: int = DEFAULT_VIRTUAL_NODES):
+        self.virtual_nodes = virtual_nodes
+        self._ring: List[int] = []
+        self._owners: List[int] = []
+        for node in nodes:
+            self.add_node(node)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+    def add_node(self, node: int):
+        for replica in range(self.virtual_nodes):
+            point = self._hash(f"worker-{node}#{replica}")
+            index = bisect.bisect(self._ring, point)
+            self._ring.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove_node(self, node: int):
+        keep = [(point, owner) for point, owner in zip(self._ring, self._owners) if owner != node]
+        self._ring = [point for point, _ in keep]
+        self._owners = [owner for _, owner in keep]
+
+    def node_for(self, key: str) -> int:
+        """Воркер, що відповідає за ключ (turbine_id)"""
+        if not self._ring:
+            raise ValueError("Кільце хешування порожнє")
+        index = bisect.bisect(self._ring, self._hash(key)) % len(self._ring)
+        return self._owners[index]
+
+
+def encode_batch(records: List[Dict[str, Any]]) -> bytes:
+    """Пакет записів -> Arrow IPC stream (схема з ключів і значень усіх записів пакету)"""
+    table = infer_table(records)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def decode_batch(payload: bytes) -> pa.Table:
+    """Arrow IPC stream -> таблиця"""
+    return pa.ipc.open_stream(pa.py_buffer(payload)).read_all()
+
+
+def local_enricher_worker() -> Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]:
+    """Фабрика воркера: TelemetryEnricher лише для збагачення (таблиці та контрольні точки пише головний процес)"""
+    from telemetry_enrichment_demo import TelemetryEnricher
+
+    enricher = TelemetryEnricher(enrich_only=True)
+
+    def process(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return enricher.enrich_batch_flat(records)
+
+    process.close = enricher.close
+    return process
+
+
+def _worker_main(worker_index: int, worker_factory: Callable, inbox: mp.Queue, outbox: mp.Queue):
+    """Цикл воркер-процесу: декодування, обробка та кодування пакетів"""
+    process = worker_factory()
+    try:
+        while True:
+            message = inbox.get()
+            if message is None:
+                break
+            batch_id, payload = message
+            try:
+                records = decode_batch(payload).to_pylist()
+                results = process(records)
+                outbox.put((batch_id, worker_index, encode_batch(results) if results else None, None))
+            except Exception as e:
+                outbox.put((batch_id, worker_index, None, f"{type(e).__name__}: {e}"))
+    finally:
+        close = getattr(process, 'close', None)
+        if close:
+            close()
+        # Маркер кінця: після нього від воркера нічого не прийде
+        outbox.put((None, worker_index, None, None))
+
+
+class ShardedEnrichmentPool:
+    """
+    Пул процесів збагачення.
+
+    Вхідні записи розподіляються по воркерах консистентним хешем turbine_id, тому порядок
+    і кеші кожної турбіни лишаються в одному процесі. Між процесами ходять Arrow IPC буфери.
+    """
+
+    def __init__(self, worker_factory: Callable = local_enricher_worker, workers: int = None,
+                 virtual_nodes: int = DEFAULT_VIRTUAL_NODES, max_pending_batches: int = 4):
+        self.worker_factory = worker_factory
+        self.workers = workers or os.cpu_count() or 1
+        self.ring = ConsistentHashRing(range(self.workers), virtual_nodes)
+        self.max_pending_batches = max_pending_batches
+        self._context = mp.get_context('spawn')
+        self._inboxes: List[mp.Queue] = []
+        self._outbox: Optional[mp.Queue] = None
+        self._processes: List[mp.Process] = []
+        # Живі воркери та пакети в обробці: batch_id -> (воркер, записи, спроба)
+        self._live: Set[int] = set()
+        self._pending: Dict[int, Tuple[int, List[Dict[str, Any]], int]] = {}
+        self._next_batch_id = 0
+        self.errors = 0
+
+    def start(self):
+        self._outbox = self._context.Queue()
+        for index in range(self.workers):
+            inbox = self._context.Queue(maxsize=self.max_pending_batches)
+            process = self._context.Process(
+                target=_worker_main,
+                args=(index, self.worker_factory, inbox, self._outbox),
+                name=f"enrichment-worker-{index}",
+                daemon=True
+            )
+            process.start()
+            self._inboxes.append(inbox)
+            self._processes.append(process)
+            self._live.add(index)
+        print(f" Запущено {self.workers} воркерів збагачення")
+        return self
+
+    def close(self):
+        """
+        Маркер зупинки кожному живому воркеру, потім вичитування outbox до маркерів кінця (або смерті
+        воркера): процес, у якого в черзі лишились результати, не завершиться, поки їх не заберуть
+        """
+        running = {index for index in self._live if self._put(index, None)}
+        while running:
+            try:
+                batch_id, worker_index, _, _ = self._outbox.get(timeout=LIVENESS_CHECK_SECONDS)
+            except queue.Empty:
+                running = {index for index in running if self._processes[index].is_alive()}
+                continue
+            if batch_id is None:
+                running.discard(worker_index)
+        for process in self._processes:
+            process.join(JOIN_TIMEOUT_SECONDS)
+            if process.is_alive():
+                print(f" {process.name} не завершився за {JOIN_TIMEOUT_SECONDS} с, зупинка примусово")
+                process.terminate()
+                process.join()
+        if self._pending:
+            print(f" Пул закрито з {len(self._pending)} необробленими пакетами")
+        self._inboxes, self._processes = [], []
+        self._live, self._pending = set(), {}
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def shard(self, records: List[Dict[str, Any]]) -> Dict[int, List[Dict[str, Any]]]:
+        """Розподіл записів по воркерах зі збереженням порядку всередині турбіни"""
+        shards: Dict[int, List[Dict[str, Any]]] = {}
+        owners: Dict[str, int] = {}
+        for record in records:
+            turbine_id = str(record.get('turbine_id', ''))
+            owner = owners.get(turbine_id)
+            if owner is None:
+                owner = owners[turbine_id] = self.ring.node_for(turbine_id)
+            shards.setdefault(owner, []).append(record)
+        return shards
+
+    def _put(self, worker_index: int, message) -> bool:
+        """Повідомлення в чергу воркера; False, якщо воркер завершився, поки черга була повна"""
+        inbox = self._inboxes[worker_index]
+        while self._processes[worker_index].is_alive():
+            try:
+                inbox.put(message, timeout=LIVENESS_CHECK_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _worker_lost(self, worker_index: int):
+        """Воркер завершився: турбіни переходять до інших воркерів, його пакети в обробці надсилаються повторно"""
+        if worker_index not in self._live:
+            return
+        self._live.discard(worker_index)
+        self.ring.remove_node(worker_index)
+        lost = [batch_id for batch_id, (owner, _, _) in self._pending.items() if owner == worker_index]
+        print(f" Воркер {worker_index} завершився (код {self._processes[worker_index].exitcode}), "
+              f"пакетів у обробці: {len(lost)}")
+        if not self._live:
+            raise RuntimeError("Усі воркери збагачення завершились")
+        # Черга воркера FIFO: завалити його міг лише найстаріший пакет, решта надсилається без нової спроби
+        for position, batch_id in enumerate(sorted(lost)):
+            _, records, attempt = self._pending.pop(batch_id)
+            if position == 0 and attempt >= MAX_BATCH_ATTEMPTS:
+                self.errors += 1
+                print(f" Пакет {batch_id} ({len(records)} записів) втрачено після {attempt} спроб")
+                continue
+            self._submit(records, attempt + 1 if position == 0 else attempt)
+
+    def _submit(self, records: List[Dict[str, Any]], attempt: int = 1):
+        for worker_index, shard_records in self.shard(records).items():
+            batch_id = self._next_batch_id
+            self._next_batch_id += 1
+            # Блокуюча черга обмеженого розміру дає зворотний тиск на джерело
+            if self._put(worker_index, (batch_id, encode_batch(shard_records))):
+                self._pending[batch_id] = (worker_index, shard_records, attempt)
+            else:
+                self._worker_lost(worker_index)
+                self._submit(shard_records, attempt)
+
+    def _collect(self) -> Optional[pa.Table]:
+        """Один результат; None - помилка пакету або втрачений воркер (його пакети надіслано повторно)"""
+        while True:
+            try:
+                batch_id, worker_index, payload, error = self._outbox.get(timeout=LIVENESS_CHECK_SECONDS)
+            except queue.Empty:
+                dead = [index for index in self._live if not self._processes[index].is_alive()]
+                for index in dead:
+                    self._worker_lost(index)
+                if dead:
+                    return None
+                continue
+            if batch_id is None or self._pending.pop(batch_id, None) is None:
+                # Маркер кінця або пакет, уже надісланий повторно разом із втраченим воркером
+                continue
+            if error:
+                self.errors += 1
+                print(f" Воркер {worker_index}: помилка пакету {batch_id}: {error}")
+                return None
+            return decode_batch(payload) if payload else None
+
+    def process_stream(self, batches: Iterable[List[Dict[str, Any]]]) -> Iterator[pa.Table]:
+        """Потокова обробка пакетів; результати повертаються по мірі готовності"""
+        for records in batches:
+            self._submit(records)
+            while len(self._pending) > len(self._live) * self.max_pending_batches:
+                table = self._collect()
+                if table is not None:
+                    yield table
+        while self._pending:
+            table = self._collect()
+            if table is not None:
+                yield table
+
+    def process_batch(self, records: List[Dict[str, Any]]) -> Optional[pa.Table]:
+        """Обробка одного пакету; повертає об'єднану Arrow таблицю"""
+        tables = list(self.process_stream([records]))
+        if not tables:
+            return None
+        return pa.concat_tables(tables, promote_options="permissive")
+
+
+def benchmark_sharding(num_records: int = 50_000, batch_size: int = 5_000, worker_counts: List[int] = None):
+    """Пропускна здатність залежно від кількості воркерів"""
+    from telemetry_generator import benchmark_messages
+
+    records = benchmark_messages(num_records)
+    batches = [records[i:i + batch_size] for i in range(0, num_records, batch_size)]
+
+    for workers in worker_counts or [1, 2, 4, os.cpu_count() or 1]:
+        with ShardedEnrichmentPool(workers=workers) as pool:
+            start = time.perf_counter()
+            rows = sum(table.num_rows for table in pool.process_stream(batches))
+            elapsed = time.perf_counter() - start
+        print(f" Воркерів: {workers}, записів: {rows}, {elapsed:.2f} с ({num_records / elapsed:,.0f} зап/с)")
+
+
+if __name__ == "__main__":
+    benchmark_sharding()
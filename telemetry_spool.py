@@ -0,0 +1,289 @@
+"""
+Локальний довговічний спул (write-ahead log) для записів у Delta Lake та Blob під час збоїв сховища
+"""
+
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Dict, Any, List, Callable, Iterator, Optional, Tuple
+
+import telemetry_json
+
+# Заголовок запису: довжина payload та CRC32
+ENTRY_HEADER = struct.Struct('<II')
+SEGMENT_SUFFIX = '.wal'
+DONE_SUFFIX = '.done'
+CORRUPT_SUFFIX = '.corrupt'
+
+
+def _encode_entry(target: str, record: Any) -> bytes:
+    payload = telemetry_json.dumps_bytes({'t': target, 'r': record}, pretty=False)
+    return ENTRY_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def _decode_entry(data: bytes, offset: int) -> Optional[Tuple[int, Dict[str, Any]]]:
+    """Запис за зсувом offset: (кінець запису, вміст) або None, якщо заголовок/CRC/JSON не сходяться"""
+    if offset + ENTRY_HEADER.size > len(data):
+        return None
+    length, crc = ENTRY_HEADER.unpack_from(data, offset)
+    start = offset + ENTRY_HEADER.size
+    payload = data[start:start + length]
+    if length == 0 or len(payload) < length or zlib.crc32(payload) != crc:
+        return None
+    try:
+        entry = telemetry_json.loads(payload)
+    except ValueError:
+        return None
+    if not isinstance(entry, dict) or 't' not in entry or 'r' not in entry:
+        return None
+    return start + length, entry
+
+
+def read_segment(path: str, damaged: List[Tuple[int, int]] = None) -> Iterator[Tuple[str, Any]]:
+    """
+    Читання записів сегмента з перевіркою CRC.
+
+    Після пошкодженого запису читання продовжується з наступного валідного заголовка;
+    пропущені діапазони байтів (start, end) додаються у damaged.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    offset = 0
+    while offset + ENTRY_HEADER.size <= len(data):
+        decoded = _decode_entry(data, offset)
+        if decoded is None:
+            resync = offset + 1
+            while resync + ENTRY_HEADER.size <= len(data) and _decode_entry(data, resync) is None:
+                resync += 1
+            if resync + ENTRY_HEADER.size > len(data):
+                resync = len(data)
+            print(f" Спул: пошкоджені байти {offset}-{resync} у {os.path.basename(path)} пропущено")
+            if damaged is not None:
+                damaged.append((offset, resync))
+            offset = resync
+            continue
+        offset, entry = decoded
+        yield entry['t'], entry['r']
+    if offset < len(data):
+        print(f" Спул: обірваний хвіст {len(data) - offset} байт у {os.path.basename(path)} пропущено")
+        if damaged is not None:
+            damaged.append((offset, len(data)))
+
+
+class TelemetrySpool:
+    """
+    Спул із сегментних файлів з CRC для кожного запису та груповим fsync.
+
+    append() повертається, коли запис уже на диску. Фоновий дренер пакетами передає записи
+    у replay(target, records) і видаляє сегмент після успіху; сегмент з пошкодженими байтами
+    після передачі валідних записів зберігається як .corrupt для розбору. Коли спул досягає
+    max_total_bytes, append() чекає - зворотний тиск на джерело.
+    """
+
+    def __init__(self, directory: str, replay: Callable[[str, List[Any]], None] = None,
+                 segment_max_bytes: int = 16 * 1024 * 1024, max_total_bytes: int = 512 * 1024 * 1024,
+                 drain_interval: float = 5.0, drain_batch_size: int = 5_000):
+        self.directory = directory
+        self.replay = replay
+        self.segment_max_bytes = segment_max_bytes
+        self.max_total_bytes = max_total_bytes
+        self.drain_interval = drain_interval
+        self.drain_batch_size = drain_batch_size
+        os.makedirs(directory, exist_ok=True)
+
+        self._cond = threading.Condition()
+        self._closed = False
+        self._wake_drainer = threading.Event()
+        self._segments = sorted(int(name[:-len(SEGMENT_SUFFIX)]) for name in os.listdir(directory) if name.endswith(SEGMENT_SUFFIX))
+        self._total_bytes = sum(os.path.getsize(self._segment_path(segment)) for segment in self._segments)
+        self._active = None
+        self._active_id: Optional[int] = None
+        self._active_size = 0
+        self._write_seq = 0
+        self._durable_seq = 0
+        self._syncing = False
+        # Прохід дренера одночасно лише один (фоновий потік або явний виклик drain_once)
+        self._drain_lock = threading.Lock()
+
+        self.appended = 0
+        self.replayed = 0
+        self.fsyncs = 0
+
+        if self._segments:
+            print(f" Спул: знайдено {len(self._segments)} незавершених сегментів ({self._total_bytes / 1024:.1f} KB)")
+
+        self._flusher = threading.Thread(target=self._flush_loop, name="spool-fsync", daemon=True)
+        self._flusher.start()
+        self._drainer = None
+        if replay is not None:
+            self._drainer = threading.Thread(target=self._drain_loop, name="spool-drainer", daemon=True)
+            self._drainer.start()
+
+    def _segment_path(self, segment_id: int, suffix: str = SEGMENT_SUFFIX) -> str:
+        return os.path.join(self.directory, f"{segment_id:012d}{suffix}")
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def has_pending(self) -> bool:
+        """Чи є в спулі записи, що ще не передані у сховище"""
+        return self._total_bytes > 0
+
+    def append(self, target: str, record: Any, timeout: float = None):
+        """Довговічне додавання запису; повертається після fsync"""
+        entry = _encode_entry(target, record)
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self._cond:
+            while self._total_bytes + len(entry) > self.max_total_bytes and not self._closed:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"Спул заповнений ({self._total_bytes} байт)")
+                self._cond.wait(remaining)
+            if self._closed:
+                raise RuntimeError("Спул закрито")
+
+            if self._active is None or self._active_size + len(entry) > self.segment_max_bytes:
+                self._roll()
+
+            self._active.write(entry)
+            self._active_size += len(entry)
+            self._total_bytes += len(entry)
+            self._write_seq += 1
+            sequence = self._write_seq
+            self.appended += 1
+            self._cond.notify_all()
+
+            # Груповий fsync: чекаємо, поки фоновий потік зафіксує наш запис разом з іншими
+            while self._durable_seq < sequence:
+                self._cond.wait()
+
+    def _roll(self):
+        """Закриття активного сегмента та відкриття нового (під блокуванням)"""
+        self._seal()
+        self._active_id = (self._segments[-1] + 1) if self._segments else 1
+        self._segments.append(self._active_id)
+        self._active = open(self._segment_path(self._active_id), 'ab')
+        self._active_size = 0
+
+    def _seal(self):
+        if self._active is None:
+            return
+        while self._syncing:
+            self._cond.wait()
+        self._active.flush()
+        os.fsync(self._active.fileno())
+        self._active.close()
+        self._durable_seq = self._write_seq
+        self._active = None
+        self._active_id = None
+        self._cond.notify_all()
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                while self._durable_seq >= self._write_seq and not self._closed:
+                    self._cond.wait()
+                if self._closed and self._durable_seq >= self._write_seq:
+                    return
+                target_seq = self._write_seq
+                active = self._active
+                active.flush()
+                self._syncing = True
+
+            try:
+                os.fsync(active.fileno())
+                self.fsyncs += 1
+            finally:
+                with self._cond:
+                    self._syncing = False
+                    self._durable_seq = max(self._durable_seq, target_seq)
+                    self._cond.notify_all()
+
+    def _sealed_segments(self) -> List[int]:
+        with self._cond:
+            # Активний сегмент закривається, щоб його записи теж могли бути передані
+            if self._active is not None and self._active_size > 0:
+                self._seal()
+            return [segment for segment in self._segments if segment != self._active_id]
+
+    def drain_once(self) -> int:
+        """Один прохід дренера: передача закритих сегментів; повертає кількість переданих записів"""
+        with self._drain_lock:
+            return self._drain_segments()
+
+    def _drain_segments(self) -> int:
+        drained = 0
+        for segment_id in self._sealed_segments():
+            path = self._segment_path(segment_id)
+            done_path = self._segment_path(segment_id, DONE_SUFFIX)
+            done = set()
+            if os.path.exists(done_path):
+                with open(done_path, 'r', encoding='utf-8') as f:
+                    done = set(f.read().split())
+
+            groups: Dict[str, List[Any]] = {}
+            damaged: List[Tuple[int, int]] = []
+            for target, record in read_segment(path, damaged):
+                groups.setdefault(target, []).append(record)
+
+            for target, records in groups.items():
+                for chunk_index in range(0, len(records), self.drain_batch_size):
+                    chunk_key = f"{target}#{chunk_index}"
+                    if chunk_key in done:
+                        continue
+                    chunk = records[chunk_index:chunk_index + self.drain_batch_size]
+                    try:
+                        self.replay(target, chunk)
+                    except Exception as e:
+                        print(f" Спул: сховище ще недоступне для {target}: {e}")
+                        return drained
+                    # Відмітка виконаного пакету, щоб після рестарту не дублювати його
+                    with open(done_path, 'a', encoding='utf-8') as f:
+                        f.write(chunk_key + '\n')
+                        f.flush()
+                        os.fsync(f.fileno())
+                    drained += len(chunk)
+                    self.replayed += len(chunk)
+
+            size = os.path.getsize(path)
+            if damaged:
+                corrupt_path = self._segment_path(segment_id, CORRUPT_SUFFIX)
+                os.replace(path, corrupt_path)
+                print(f" Спул: сегмент із пошкодженими записами збережено як {os.path.basename(corrupt_path)}")
+            else:
+                os.remove(path)
+            if os.path.exists(done_path):
+                os.remove(done_path)
+            with self._cond:
+                self._segments.remove(segment_id)
+                self._total_bytes -= size
+                self._cond.notify_all()
+
+        if drained:
+            print(f" Спул: передано {drained} записів у сховище")
+        return drained
+
+    def _drain_loop(self):
+        while not self._closed:
+            try:
+                self.drain_once()
+            except Exception as e:
+                print(f" Спул: помилка дренера: {e}")
+            self._wake_drainer.wait(self.drain_interval)
+            self._wake_drainer.clear()
+
+    def close(self):
+        """Фіксація активного сегмента та зупинка фонових потоків (незавершені записи лишаються на диску)"""
+        with self._cond:
+            self._seal()
+            self._closed = True
+            self._cond.notify_all()
+        self._wake_drainer.set()
+        self._flusher.join()
+        if self._drainer is not None:
+            self._drainer.join()
\ No newline at end of file
@@ -0,0 +1,274 @@
+"""
+Профілі зберігання Parquet для Delta таблиць: кодек, розмір row group і сторінок, кодування, статистика
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, Any, List, Optional, Sequence, Union
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from telemetry_schemas import TELEMETRY_TABLE, FULL_TABLE, VARIED_TABLE, DOWNSAMPLE_TABLES, CATEGORY
+
+# Профіль за замовчуванням можна перевизначити для всіх записувачів
+PROFILE_ENV = "TELEMETRY_STORAGE_PROFILE"
+# Parquet checkpoint журналу Delta кожні N комітів (0 - вимкнено)
+CHECKPOINT_INTERVAL = int(os.environ.get("TELEMETRY_CHECKPOINT_INTERVAL", "10"))
+
+
+class StorageProfile:
+    """Налаштування запису Parquet; None у списках колонок означає 'всі колонки'"""
+
+    def __init__(self, name: str, compression: str = 'zstd', compression_level: Optional[int] = None,
+                 row_group_size: int = 131_072, data_page_size: int = 1024 * 1024,
+                 dictionary_columns: Optional[Sequence[str]] = None,
+                 byte_stream_split_columns: Sequence[str] = (),
+                 statistics_columns: Optional[Sequence[str]] = None):
+        self.name = name
+        self.compression = compression
+        self.compression_level = compression_level
+        self.row_group_size = row_group_size
+        self.data_page_size = data_page_size
+        self.dictionary_columns = None if dictionary_columns is None else tuple(dictionary_columns)
+        self.byte_stream_split_columns = tuple(byte_stream_split_columns)
+        self.statistics_columns = None if statistics_columns is None else tuple(statistics_columns)
+
+    def __repr__(self):
+        level = f"-{self.compression_level}" if self.compression_level is not None else ""
+        return f"StorageProfile({self.name}: {self.compression}{level}, row group {self.row_group_size})"
+
+    def _dictionary_columns(self, schema: pa.Schema) -> List[str]:
+        # BYTE_STREAM_SPLIT несумісне зі словником для тієї ж колонки
+        names = schema.names if self.dictionary_columns is None else self.dictionary_columns
+        return [name for name in names if name in schema.names and name not in self.byte_stream_split_columns]
+
+    def parquet_options(self, schema: pa.Schema) -> Dict[str, Any]:
+        """Аргументи pyarrow.parquet.write_table для таблиці зі схемою schema"""
+        split = {name: 'BYTE_STREAM_SPLIT' for name in self.byte_stream_split_columns
+                 if name in schema.names and pa.types.is_floating(schema.field(name).type)}
+        options = {
+            'compression': self.compression,
+            'compression_level': self.compression_level,
+            'row_group_size': self.row_group_size,
+            'data_page_size': self.data_page_size,
+            'use_dictionary': self._dictionary_columns(schema),
+            'write_statistics': True if self.statistics_columns is None
+            else [name for name in self.statistics_columns if name in schema.names],
+        }
+        if split:
+            options['column_encoding'] = split
+        return options
+
+    def write_table(self, table: pa.Table, path: str):
+        pq.write_table(table, path, **self.parquet_options(table.schema))
+
+    def writer_properties(self, schema: pa.Schema):
+        """
+        WriterProperties для deltalake (delta-rs, лише з engine="rust"). Закріплена deltalake 0.18.2 не має
+        ColumnProperties, тож словник, статистика та BYTE_STREAM_SPLIT по колонках через неї не налаштовуються -
+        лише кодек, рівень, row group та сторінка; повний профіль застосовує локальний запис (write_table).
+        """
+        from deltalake import WriterProperties
+
+        return WriterProperties(
+            compression=self.compression.upper(),
+            compression_level=self.compression_level,
+            max_row_group_size=self.row_group_size,
+            data_page_size_limit=self.data_page_size,
+        )
+
+
+PROFILES = {
+    # Гарячий запис: швидкий zstd, малі row group, статистика лише для фільтрів за турбіною та часом
+    'ingest': StorageProfile(
+        'ingest', compression='zstd', compression_level=1, row_group_size=16_384, data_page_size=64 * 1024,
+        statistics_columns=('turbine_id', 'timestamp'),
+    ),
+    'balanced': StorageProfile('balanced', compression='zstd', compression_level=3),
+    # Архів: сильне стиснення, великі row group, словник для рядків, BYTE_STREAM_SPLIT для плаваючих вимірів
+    'archive': StorageProfile(
+        'archive', compression='zstd', compression_level=15, row_group_size=1_048_576,
+        dictionary_columns=('turbine_id', 'turbine_name', 'manufacturer', 'model', 'turbine_status',
+                            'operational_status', 'enrichment_version', 'maintenance_status', 'technician_name',
+                            'source', 'processed_by', 'record_version', 'partition_turbine'),
+        byte_stream_split_columns=('voltage', 'current', 'power_factor'),
+    ),
+    'snappy': StorageProfile('snappy', compression='snappy'),
+}
+
+TABLE_PROFILES = {
+    TELEMETRY_TABLE: 'ingest',
+    FULL_TABLE: 'balanced',
+    VARIED_TABLE: 'archive',
+    # Рівні історії пишуться раз на добу і зберігаються довго
+    **{table: 'archive' for table in DOWNSAMPLE_TABLES.values()},
+}
+
+
+def get_profile(profile: Union[str, StorageProfile, None] = None, table: str = None) -> StorageProfile:
+    """Профіль: явний (назва чи об'єкт) > TELEMETRY_STORAGE_PROFILE > профіль таблиці > balanced"""
+    if isinstance(profile, StorageProfile):
+        return profile
+    if profile is None:
+        name = table.rstrip('/').rsplit('/', 1)[-1] if table else None
+        profile = os.getenv(PROFILE_ENV) or TABLE_PROFILES.get(name, 'balanced')
+    if profile not in PROFILES:
+        raise KeyError(f"Невідомий профіль зберігання: {profile} (доступні: {', '.join(PROFILES)})")
+    return PROFILES[profile]
+
+
+def decode_dictionaries(table: pa.Table) -> pa.Table:
+    """Словникові колонки -> звичайні (Delta схема не має словникового типу; Parquet кодує словником сам)"""
+    columns = [column.cast(column.type.value_type) if pa.types.is_dictionary(column.type) else column
+               for column in table.columns]
+    fields = [pa.field(field.name, field.type.value_type if pa.types.is_dictionary(field.type) else field.type,
+                       field.nullable) for field in table.schema]
+    return pa.Table.from_arrays(columns, schema=pa.schema(fields))
+
+
+def write_delta_table(table_uri: str, table: pa.Table, storage_options: Dict[str, str] = None,
+                      profile: Union[str, StorageProfile, None] = None, mode: str = "append",
+                      partition_by: Sequence[str] = None, checkpoint_interval: int = CHECKPOINT_INTERVAL,
+                      predicate: str = None, custom_metadata: Dict[str, str] = None):
+    """
+    Запис пакету у Delta таблицю через deltalake з налаштуваннями профілю. predicate з mode="overwrite"
+    замінює лише відповідні рядки (одним комітом); custom_metadata потрапляє в commitInfo.
+    """
+    from deltalake import DeltaTable, write_deltalake
+    from deltalake.exceptions import TableNotFoundError
+
+    table = decode_dictionaries(table)
+    profile = get_profile(profile, table_uri)
+    # Відкритий об'єкт таблиці write_deltalake оновлює до щойно записаної версії - без повторного читання журналу
+    try:
+        target = DeltaTable(table_uri, storage_options=storage_options)
+    except TableNotFoundError:
+        target = None
+    write_deltalake(target if target is not None else table_uri, table, mode=mode, storage_options=storage_options,
+                    partition_by=list(partition_by) if partition_by else None, predicate=predicate,
+                    custom_metadata=custom_metadata, engine="rust",
+                    writer_properties=profile.writer_properties(table.schema))
+    if target is not None:
+        checkpoint_delta_table(target, checkpoint_interval)
+
+
+def merge_delta_table(table_uri: str, table: pa.Table, key: Union[str, Sequence[str]], order_by: str = None,
+                      storage_options: Dict[str, str] = None, profile: Union[str, StorageProfile, None] = None,
+                      checkpoint_interval: int = CHECKPOINT_INTERVAL):
+    """Пакетний upsert (MERGE) за ключем (колонка або кілька); рядок оновлюється, лише якщо order_by джерела не старший"""
+    from deltalake import DeltaTable, write_deltalake
+    from deltalake.exceptions import TableNotFoundError
+
+    table = decode_dictionaries(table)
+    profile = get_profile(profile, table_uri)
+    writer_properties = profile.writer_properties(table.schema)
+    try:
+        target = DeltaTable(table_uri, storage_options=storage_options)
+    except TableNotFoundError:
+        write_deltalake(table_uri, table, mode="append", storage_options=storage_options,
+                        engine="rust", writer_properties=writer_properties)
+        return
+
+    keys = (key,) if isinstance(key, str) else tuple(key)
+    # Імена в лапках: серед ключів бувають слова SQL (window)
+    predicate = ' AND '.join(f'target."{column}" = source."{column}"' for column in keys)
+    (target.merge(source=table, predicate=predicate, source_alias="source",
+                  target_alias="target", writer_properties=writer_properties)
+     .when_matched_update_all(predicate=f'source."{order_by}" >= target."{order_by}"' if order_by else None)
+     .when_not_matched_insert_all()
+     .execute())
+    # execute() уже оновив target до версії, створеної MERGE
+    checkpoint_delta_table(target, checkpoint_interval)
+
+
+def checkpoint_delta_table(delta_table, interval: int = CHECKPOINT_INTERVAL) -> bool:
+    """
+    Parquet checkpoint, якщо версія відкритої таблиці (щойно створена записом) кратна interval: читачі
+    відновлюють стан таблиці з checkpoint і кількох останніх комітів замість усіх JSON журналу.
+    Помилка не зриває запис.
+    """
+    if not interval:
+        return False
+    try:
+        if delta_table.version() % interval:
+            return False
+        delta_table.create_checkpoint()
+        return True
+    except Exception as e:
+        print(f" Помилка створення checkpoint {delta_table.table_uri}: {e}")
+        return False
+
+
+def _benchmark_table(fleet_size: int, records_per_turbine: int) -> pa.Table:
+    """Згенерована телеметрія парку з колонками, як у delta-lake-turbine-telemetry"""
+    from telemetry_generator import SeededTelemetryGenerator
+
+    table = SeededTelemetryGenerator(fleet_size=fleet_size).load_or_create_fixture(records_per_turbine)
+    count = table.num_rows
+    turbine_ids = table.column('turbine_id')
+    record_ids = pa.array([f"{turbine}_{i}" for i, turbine in enumerate(turbine_ids.to_pylist())], pa.string())
+    return table.set_column(0, 'turbine_id', turbine_ids.cast(pa.string()).dictionary_encode().cast(CATEGORY)) \
+        .append_column('record_id', record_ids) \
+        .append_column('operational_status', pa.array(['generating'] * count, pa.string()).dictionary_encode().cast(CATEGORY))
+
+
+def benchmark_profiles(fleet_size: int = 100, records_per_turbine: int = 2880,
+                       profiles: Sequence[str] = None) -> List[Dict[str, Any]]:
+    """Розмір, час запису та час сканування (уся таблиця і вибірка колонок з фільтром) для кожного профілю"""
+    table = _benchmark_table(fleet_size, records_per_turbine)
+    uncompressed = table.nbytes
+    results = []
+    directory = tempfile.mkdtemp(prefix="storage_profiles_")
+    try:
+        for name in profiles or PROFILES:
+            profile = get_profile(name)
+            path = os.path.join(directory, f"{name}.parquet")
+
+            start = time.perf_counter()
+            profile.write_table(table, path)
+            write_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            pq.read_table(path)
+            scan_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            pq.read_table(path, columns=['turbine_id', 'timestamp', 'output_power'],
+                          filters=[('turbine_id', '=', 'TURBINE_001')])
+            filtered_seconds = time.perf_counter() - start
+
+            results.append({
+                'profile': name,
+                'size_bytes': os.path.getsize(path),
+                'write_seconds': write_seconds,
+                'scan_seconds': scan_seconds,
+                'filtered_scan_seconds': filtered_seconds,
+                'row_groups': pq.ParquetFile(path).num_row_groups,
+            })
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print(f" Профілі зберігання: {table.num_rows} записів, {uncompressed / 1024 / 1024:.1f} MB в Arrow")
+    print(f"   {'профіль':<10} {'розмір MB':>10} {'стиск':>7} {'запис с':>9} {'скан с':>8} {'фільтр с':>9} {'row groups':>11}")
+    for result in results:
+        print(f"   {result['profile']:<10} {result['size_bytes'] / 1024 / 1024:>10.2f} "
+              f"{uncompressed / result['size_bytes']:>6.1f}x {result['write_seconds']:>9.3f} "
+              f"{result['scan_seconds']:>8.3f} {result['filtered_scan_seconds']:>9.3f} {result['row_groups']:>11}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк профілів зберігання Parquet")
+    parser.add_argument('--turbines', type=int, default=100)
+    parser.add_argument('--records', type=int, default=2880, help="Записів на турбіну")
+    parser.add_argument('--profiles', default=None, help="Список через кому (за замовчуванням - усі)")
+    args = parser.parse_args()
+    benchmark_profiles(args.turbines, args.records, args.profiles.split(',') if args.profiles else None)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
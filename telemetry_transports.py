@@ -0,0 +1,320 @@
+"""
+Транспорти для пакетної відправки телеметрії: IoT Hub, MQTT, локальний файл або TCP сокет
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import time
+from typing import Dict, Any, List, Optional
+
+from telemetry_codec import JSON, decode_body, encode_batch, encode_frame, negotiate
+
+# Ліміт розміру повідомлення IoT Hub (256 KB) з запасом на властивості
+MAX_MESSAGE_BYTES = 250 * 1024
+# Повторні спроби частини пакету (щоразу через наступне з'єднання пулу) і пауза перед першою з них
+SEND_RETRIES = 2
+RETRY_DELAY_SECONDS = 0.5
+
+
+class TransportSendError(ConnectionError):
+    """Частини пакету не відправлено після всіх спроб; lost_messages - кількість втрачених повідомлень"""
+
+    def __init__(self, message: str, lost_messages: int):
+        super().__init__(message)
+        self.lost_messages = lost_messages
+
+
+class TelemetryTransport:
+    """Базовий транспорт: пул з'єднань, частини пакету йдуть паралельно з округленням по з'єднаннях"""
+
+    name = "transport"
+
+    def __init__(self, pool_size: int = 1, content_type: str = JSON, retries: int = SEND_RETRIES):
+        self.pool_size = max(1, pool_size)
+        self.retries = retries
+        # Формат тіла (contentType): JSON, msgpack або Arrow IPC; недоступний формат -> JSON
+        self.content_type = negotiate(content_type)
+        self.messages_sent = 0
+        self.payloads_sent = 0
+        self.bytes_sent = 0
+        self.payloads_retried = 0
+        self._connections: List[Any] = []
+        self._next_connection = None
+        self._locks: List[asyncio.Lock] = []
+
+    async def _open(self, index: int) -> Any:
+        raise NotImplementedError
+
+    async def _send(self, connection: Any, payload: bytes):
+        raise NotImplementedError
+
+    async def _close(self, connection: Any):
+        pass
+
+    async def connect(self):
+        self._connections = [await self._open(index) for index in range(self.pool_size)]
+        self._locks = [asyncio.Lock() for _ in self._connections]
+        self._next_connection = itertools.cycle(range(len(self._connections)))
+        print(f" {self.name}: відкрито з'єднань: {len(self._connections)} ({self.content_type})")
+
+    async def _send_payload(self, payload: bytes) -> Optional[Exception]:
+        """Одна частина пакету з повторами на наступних з'єднаннях; повертає помилку останньої спроби"""
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.payloads_retried += 1
+                await asyncio.sleep(RETRY_DELAY_SECONDS * 2 ** (attempt - 1))
+            index = next(self._next_connection)
+            try:
+                async with self._locks[index]:
+                    await self._send(self._connections[index], payload)
+            except Exception as e:
+                error = e
+                continue
+            self.payloads_sent += 1
+            self.bytes_sent += len(payload)
+            return None
+        return error
+
+    async def send_batch(self, messages: List[Dict[str, Any]]):
+        """
+        Відправка пакету; великі пакети діляться на частини за MAX_MESSAGE_BYTES, які йдуть одночасно
+        різними з'єднаннями пулу. Частини, не відправлені після повторів, - TransportSendError.
+        """
+        if not messages:
+            return
+        chunks = encode_batch(messages, self.content_type, MAX_MESSAGE_BYTES)
+        errors = await asyncio.gather(*(self._send_payload(payload) for payload in chunks))
+        failed = [payload for payload, error in zip(chunks, errors) if error is not None]
+        if not failed:
+            self.messages_sent += len(messages)
+            return
+        lost = sum(len(decode_body(payload, self.content_type)) for payload in failed)
+        self.messages_sent += len(messages) - lost
+        last_error = [error for error in errors if error is not None][-1]
+        raise TransportSendError(f"не відправлено {len(failed)} з {len(chunks)} частин пакету: {last_error}", lost)
+
+    # Транспорт можна передати як приймач у FleetSimulator.run
+    __call__ = send_batch
+
+    async def disconnect(self):
+        for connection in self._connections:
+            try:
+                await self._close(connection)
+            except Exception as e:
+                print(f" {self.name}: Помилка закриття з'єднання: {e}")
+        self._connections = []
+        print(f" {self.name}: відправлено {self.messages_sent} повідомлень у {self.payloads_sent} пакетах "
+              f"({self.bytes_sent / 1024:.1f} KB)")
+
+
+class IoTHubTransport(TelemetryTransport):
+    """Пул клієнтів IoT Hub (шлюзові пристрої); кожне повідомлення - пакет записів"""
+
+    name = "IoT Hub"
+
+    def __init__(self, connection_strings: List[str], pool_size: int = None, content_type: str = JSON):
+        super().__init__(pool_size or len(connection_strings), content_type)
+        if not connection_strings:
+            raise ValueError("Потрібен хоча б один connection string")
+        self.connection_strings = connection_strings
+
+    async def _open(self, index: int):
+        from azure.iot.device.aio import IoTHubDeviceClient
+
+        client = IoTHubDeviceClient.create_from_connection_string(self.connection_strings[index % len(self.connection_strings)])
+        await client.connect()
+        return client
+
+    async def _send(self, client, payload: bytes):
+        from azure.iot.device import Message
+
+        message = Message(payload)
+        if self.content_type == JSON:
+            message.content_encoding = "utf-8"
+        message.content_type = self.content_type
+        message.custom_properties['batch'] = 'true'
+        await client.send_message(message)
+
+    async def _close(self, client):
+        await client.disconnect()
+
+
+class MqttTransport(TelemetryTransport):
+    """Пул клієнтів paho-mqtt до брокера (напр. локальний mosquitto); contentType - властивість MQTT 5"""
+
+    name = "MQTT"
+
+    def __init__(self, host: str = "localhost", port: int = 1883, topic: str = "turbines/telemetry",
+                 pool_size: int = 2, qos: int = 1, client_prefix: str = "fleet-gateway", content_type: str = JSON):
+        super().__init__(pool_size, content_type)
+        self.host = host
+        self.port = port
+        self.topic = topic
+        self.qos = qos
+        self.client_prefix = client_prefix
+
+    async def _open(self, index: int):
+        import paho.mqtt.client as mqtt
+
+        client = mqtt.Client(client_id=f"{self.client_prefix}-{os.getpid()}-{index}", protocol=mqtt.MQTTv5)
+        client.max_inflight_messages_set(100)
+        await asyncio.to_thread(client.connect, self.host, self.port)
+        # Мережевий цикл paho працює у власному потоці
+        client.loop_start()
+        return client
+
+    async def _send(self, client, payload: bytes):
+        from paho.mqtt.packettypes import PacketTypes
+        from paho.mqtt.properties import Properties
+
+        properties = Properties(PacketTypes.PUBLISH)
+        properties.ContentType = self.content_type
+        info = client.publish(self.topic, payload, qos=self.qos, properties=properties)
+        if self.qos > 0:
+            await asyncio.to_thread(info.wait_for_publish)
+        if info.rc != 0:
+            raise ConnectionError(f"MQTT publish повернув код {info.rc}")
+
+    async def _close(self, client):
+        client.loop_stop()
+        client.disconnect()
+
+
+class FileTransport(TelemetryTransport):
+    """Локальний приймач: JSON пакет - рядок у файлі, бінарні формати - кадри telemetry_codec"""
+
+    name = "Файл"
+
+    def __init__(self, path: str, content_type: str = JSON):
+        super().__init__(1, content_type)
+        self.path = path
+
+    async def _open(self, index: int):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        return open(self.path, 'ab')
+
+    async def _send(self, file, payload: bytes):
+        file.write(payload + b'\n' if self.content_type == JSON else encode_frame(payload, self.content_type))
+        file.flush()
+
+    async def _close(self, file):
+        file.close()
+
+
+class SocketTransport(TelemetryTransport):
+    """TCP приймач: JSON пакети, розділені переводом рядка, або кадри бінарних форматів"""
+
+    name = "Сокет"
+
+    def __init__(self, host: str = "localhost", port: int = 9000, pool_size: int = 2, content_type: str = JSON):
+        super().__init__(pool_size, content_type)
+        self.host = host
+        self.port = port
+
+    async def _open(self, index: int):
+        _, writer = await asyncio.open_connection(self.host, self.port)
+        return writer
+
+    async def _send(self, writer, payload: bytes):
+        writer.write(payload + b'\n' if self.content_type == JSON else encode_frame(payload, self.content_type))
+        await writer.drain()
+
+    async def _close(self, writer):
+        writer.close()
+        await writer.wait_closed()
+
+
+def create_transport(spec: str, pool_size: int = 2, content_type: str = JSON) -> TelemetryTransport:
+    """
+    Транспорт за рядком: 'file:шлях', 'socket:хост:порт', 'mqtt:хост:порт[/топік]',
+    'iothub:файл_connections.json' (пул із перших pool_size пристроїв)
+    """
+    kind, _, target = spec.partition(':')
+    if kind == 'file':
+        return FileTransport(target or 'fleet_telemetry.jsonl', content_type)
+    if kind == 'socket':
+        host, _, port = target.rpartition(':')
+        return SocketTransport(host or 'localhost', int(port or 9000), pool_size, content_type)
+    if kind == 'mqtt':
+        address, _, topic = target.partition('/')
+        host, _, port = address.partition(':')
+        return MqttTransport(host or 'localhost', int(port or 1883), topic or 'turbines/telemetry', pool_size,
+                             content_type=content_type)
+    if kind == 'iothub':
+        with open(target or 'all_connections.json', 'r', encoding='utf-8') as f:
+            connections = json.load(f)
+        devices = sorted(key for key in connections if key.startswith('TURBINE_'))
+        return IoTHubTransport([connections[device] for device in devices[:pool_size]], content_type=content_type)
+    raise ValueError(f"Невідомий транспорт: {spec}")
+
+
+class BatchingSender:
+    """
+    Шлюз: збирає повідомлення багатьох турбін і відправляє їх пакетами через спільний транспорт.
+
+    Пакет іде, коли набралось max_batch повідомлень або минуло max_delay секунд. Пакети збирають і
+    відправляють pool_size задач, тож усі з'єднання транспорту зайняті одночасно.
+    """
+
+    def __init__(self, transport: TelemetryTransport, max_batch: int = 500, max_delay: float = 0.5,
+                 max_pending: int = 50_000):
+        self.transport = transport
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.queue: Optional[asyncio.Queue] = None
+        self.max_pending = max_pending
+        self._flushers: List[asyncio.Task] = []
+        self.errors = 0
+        self.messages_lost = 0
+
+    async def start(self):
+        await self.transport.connect()
+        self.queue = asyncio.Queue(maxsize=self.max_pending)
+        self._flushers = [asyncio.create_task(self._flush_loop()) for _ in range(self.transport.pool_size)]
+        return self
+
+    async def submit(self, message: Dict[str, Any]):
+        """Додати повідомлення до наступного пакету (чекає, якщо черга переповнена)"""
+        await self.queue.put(message)
+
+    async def _flush_loop(self):
+        while True:
+            batch = [await self.queue.get()]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch and batch[-1] is not None:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            closing = batch[-1] is None
+            batch = [message for message in batch if message is not None]
+            try:
+                await self.transport.send_batch(batch)
+            except Exception as e:
+                # Повтори вже зроблено транспортом; тут лише облік втрачених повідомлень
+                lost = getattr(e, 'lost_messages', len(batch))
+                self.errors += 1
+                self.messages_lost += lost
+                print(f" {self.transport.name}: Помилка відправки пакету, втрачено {lost} з {len(batch)} "
+                      f"повідомлень: {e}")
+            if closing:
+                return
+
+    async def close(self):
+        """Відправити залишок і закрити з'єднання"""
+        if self._flushers:
+            # Кожна задача відправки завершується на своєму None
+            for _ in self._flushers:
+                await self.queue.put(None)
+            await asyncio.gather(*self._flushers)
+            self._flushers = []
+        if self.messages_lost:
+            print(f" {self.transport.name}: втрачено повідомлень: {self.messages_lost}")
+        await self.transport.disconnect()
\ No newline at end of file
@@ -0,0 +1,8 @@
+"""
+Спільне для тестів: модулі проєкту лежать у корені репозиторію
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
\ No newline at end of file
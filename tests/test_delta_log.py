@@ -0,0 +1,95 @@
+"""
+Журнал транзакцій локальної Delta таблиці: коміти, checkpoint та знімки
+"""
+
+import os
+
+import pyarrow as pa
+import pytest
+
+from telemetry_delta_sink import DeltaConflictError, DeltaLog, LocalDeltaSink, read_local_table
+from telemetry_schemas import TELEMETRY_TABLE, get_schema
+
+SCHEMA = pa.schema([('turbine_id', pa.string()), ('partition_day', pa.int32())])
+
+
+def add(path, day=1):
+    return {'add': {'path': path, 'partitionValues': {'partition_day': str(day)}, 'size': 10,
+                    'modificationTime': 0, 'dataChange': True}}
+
+
+def remove(path):
+    return {'remove': {'path': path, 'deletionTimestamp': 0, 'dataChange': True}}
+
+
+@pytest.fixture
+def log(tmp_path):
+    log = DeltaLog(str(tmp_path / "table"), checkpoint_interval=3)
+    log.ensure_table(SCHEMA, ['partition_day'], name="table")
+    return log
+
+
+def test_commits_take_consecutive_versions(log):
+    assert log.latest_version() == 0
+    assert log.commit([add('a.parquet')]) == 1
+    assert log.commit([add('b.parquet')]) == 2
+    assert set(log.state().files) == {'a.parquet', 'b.parquet'}
+    assert log.state().metadata['partitionColumns'] == ['partition_day']
+
+
+def test_commit_on_stale_read_version_conflicts(log):
+    version = log.commit([add('a.parquet')])
+    log.commit([add('b.parquet')])
+    with pytest.raises(DeltaConflictError):
+        log.commit([remove('a.parquet')], read_version=version)
+    assert 'a.parquet' in log.state().files
+
+
+def test_checkpoint_state_matches_full_replay(log):
+    log.commit([add('a.parquet'), add('b.parquet', day=2)])
+    log.commit([remove('a.parquet'), add('c.parquet'), {'txn': {'appId': 'raw:2026-01-01', 'version': 1,
+                                                                  'lastUpdated': 0}}])
+    log.commit([add('d.parquet')])
+    assert os.path.exists(log.checkpoint_path(3))
+    assert log.last_checkpoint() == 3
+    log.commit([remove('d.parquet')])
+
+    replayed = log.state()
+    # Коміти до checkpoint більше не потрібні
+    for version in range(0, 4):
+        os.remove(log.version_path(version))
+    state = log.state()
+
+    assert state.version == replayed.version == 4
+    assert set(state.files) == {'b.parquet', 'c.parquet'}
+    assert state.files['b.parquet']['partitionValues'] == {'partition_day': '2'}
+    assert set(state.tombstones) == {'a.parquet', 'd.parquet'}
+    assert set(state.transactions) == {'raw:2026-01-01'}
+    assert state.metadata['partitionColumns'] == ['partition_day']
+
+
+def test_snapshot_reads_older_versions(log):
+    log.commit([add('a.parquet')])
+    log.commit([remove('a.parquet'), add('b.parquet')])
+    log.commit([add('c.parquet')])
+    log.commit([add('d.parquet')])
+
+    assert log.snapshot(1) == (1, {'a.parquet': add('a.parquet')['add']})
+    version, files = log.snapshot(2)
+    assert version == 2 and set(files) == {'b.parquet'}
+    version, files = log.snapshot()
+    assert version == 4 and set(files) == {'b.parquet', 'c.parquet', 'd.parquet'}
+
+
+def test_sink_writes_readable_partitioned_table(tmp_path):
+    path = str(tmp_path / TELEMETRY_TABLE)
+    sink = LocalDeltaSink(path, max_age=3600)
+    sink.write([{'record_id': str(i), 'turbine_id': 'TURBINE_001', 'timestamp': f'2026-01-0{day}T00:00:0{i}Z',
+                 'output_power': float(i), 'partition_year': 2026, 'partition_month': 1, 'partition_day': day}
+                for day in (1, 2) for i in range(3)])
+    sink.close()
+
+    table = read_local_table(path, get_schema(TELEMETRY_TABLE))
+    assert table.num_rows == 6
+    assert sorted(set(table.column('partition_day').to_pylist())) == [1, 2]
+    assert DeltaLog(path).latest_version() == 1
\ No newline at end of file
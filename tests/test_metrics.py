@@ -0,0 +1,40 @@
+"""
+Розрахункові метрики: скалярний і пакетний шляхи дають однакові результати
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+from telemetry_metrics import (OPERATIONAL_STATUSES, UNKNOWN_STATUS, UNKNOWN_STATUS_CODE, calculate_metrics,
+                               calculate_metrics_batch)
+
+POWER = [float('nan'), 0.0, 50.0, 100.0, 1500.0]
+
+
+def test_status_matches_between_scalar_and_batch():
+    batch = calculate_metrics_batch({'output_power': np.array(POWER)})
+    scalar = [calculate_metrics({'output_power': power})['operational_status'] for power in POWER]
+    assert list(batch['operational_status']) == scalar
+    assert scalar == [UNKNOWN_STATUS, 'stopped', 'low_generation', 'low_generation', 'generating']
+
+
+def test_missing_power_has_explicit_unknown_code():
+    codes = calculate_metrics_batch({'output_power': np.array(POWER)})['status_code']
+    assert codes[0] == UNKNOWN_STATUS_CODE
+    assert [OPERATIONAL_STATUSES[code] for code in codes[1:]] == ['stopped', 'low_generation', 'low_generation',
+                                                                   'generating']
+
+
+def test_batch_metrics_match_scalar_values():
+    columns = {'output_power': np.array([1000.0, 0.0]), 'voltage': np.array([690.0, 400.0]),
+               'current': np.array([1200.0, 0.0]), 'power_factor': np.array([0.9, 0.85])}
+    batch = calculate_metrics_batch(columns, nominal_power_kw=np.array([2000.0, 0.0]))
+    for i in range(2):
+        record = {name: values[i] for name, values in columns.items()}
+        scalar = calculate_metrics(record, [2000.0, 0.0][i])
+        assert batch['efficiency_percent'][i] == pytest.approx(scalar['efficiency_percent'])
+        assert batch['calculated_power_kw'][i] == pytest.approx(scalar['calculated_power_kw'])
+    assert math.isnan(calculate_metrics_batch({'output_power': np.array([np.nan])},
+                                              nominal_power_kw=2000.0)['efficiency_percent'][0])
\ No newline at end of file
@@ -0,0 +1,128 @@
+"""
+Оцінка якості телеметрії та карантин
+"""
+
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import telemetry_json
+from telemetry_quality import (QuarantineWriter, TelemetryValidator, describe_violations, field_bit,
+                               quarantine_rows, record_bit)
+from telemetry_schemas import QUARANTINE_TABLE, build_table
+
+NOW = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def reading(turbine_id='TURBINE_001', seconds=0, **values):
+    record = {
+        'turbine_id': turbine_id,
+        'timestamp': (NOW + timedelta(seconds=seconds)).isoformat(),
+        'output_power': 1000.0,
+        'rotor_rpm': 15.0,
+        'max_power_limit': 1500.0,
+        'voltage': 500.0,
+        'current': 1500.0,
+        'power_factor': 0.9,
+    }
+    record.update(values)
+    return record
+
+
+@pytest.fixture
+def validator():
+    return TelemetryValidator()
+
+
+def test_clean_record_scores_one(validator):
+    result = validator.validate([reading()], now=NOW)
+    assert int(result['violation_mask'][0]) == 0
+    assert result['quality_score'][0] == 1.0
+    assert result['valid'][0]
+
+
+def test_violations_set_bits_and_penalties(validator):
+    result = validator.validate([reading(voltage=1000.0, output_power=None, seconds=-3600)], now=NOW)
+    mask = int(result['violation_mask'][0])
+    assert mask & field_bit('voltage', 'range')
+    assert mask & field_bit('output_power', 'missing')
+    assert mask & record_bit('stale')
+    assert set(describe_violations(mask)) == {'voltage:range', 'output_power:missing', 'stale'}
+    # 1.0 - range 0.15 - обов'язкове поле 0.2 - застарілість 0.2
+    assert result['quality_score'][0] == pytest.approx(0.45)
+
+
+def test_clock_skew_and_missing_identity(validator):
+    result = validator.validate([reading(turbine_id=None, seconds=3600)], now=NOW)
+    mask = int(result['violation_mask'][0])
+    assert mask & record_bit('missing_turbine_id')
+    assert mask & record_bit('clock_skew')
+
+
+def test_start_from_zero_is_not_a_rate_violation(validator):
+    records = [reading(seconds=0, output_power=0.0), reading(seconds=10, output_power=150.0),
+               reading(seconds=20, output_power=300.0)]
+    result = validator.validate(records, now=NOW)
+    assert not any(int(mask) & field_bit('output_power', 'rate') for mask in result['violation_mask'])
+
+
+def test_spike_is_a_rate_violation_across_batches(validator):
+    validator.validate([reading(seconds=0, output_power=1000.0)], now=NOW)
+    result = validator.validate([reading(seconds=10, output_power=1900.0)], now=NOW)
+    assert int(result['violation_mask'][0]) & field_bit('output_power', 'rate')
+
+
+def test_rate_is_checked_per_turbine_in_time_order(validator):
+    records = [reading('A', 10, output_power=1050.0), reading('B', 0, output_power=200.0),
+               reading('A', 0, output_power=1000.0)]
+    result = validator.validate(records, now=NOW)
+    assert not any(int(mask) & field_bit('output_power', 'rate') for mask in result['violation_mask'])
+
+
+def test_failed_writes_are_spilled_not_dropped(tmp_path):
+    def write_batch(batch):
+        raise IOError("сховище недоступне")
+
+    spill_path = tmp_path / "spill.jsonl"
+    writer = QuarantineWriter(write_batch, batch_size=2, flush_interval=0.05, spill_path=str(spill_path))
+    for i in range(5):
+        writer.submit(reading(seq=i), 1, 0.1)
+    writer.close()
+
+    spilled = [telemetry_json.loads(line) for line in spill_path.read_text(encoding='utf-8').splitlines()]
+    assert sorted(entry['seq'] for entry in spilled) == list(range(5))
+    assert writer.spilled == 5 and writer.written == 0 and writer.dropped == 0
+    assert spilled[0]['violations'] == 'output_power:missing'
+
+
+def test_full_queue_spills_after_timeout(tmp_path):
+    release = threading.Event()
+    written = []
+
+    def write_batch(batch):
+        release.wait(5)
+        written.extend(batch)
+
+    spill_path = tmp_path / "spill.jsonl"
+    writer = QuarantineWriter(write_batch, batch_size=1, flush_interval=0.01, max_pending=1,
+                              submit_timeout=0.01, spill_path=str(spill_path))
+    for i in range(6):
+        writer.submit(reading(seq=i), 1, 0.1)
+    release.set()
+    writer.close()
+
+    spilled = [telemetry_json.loads(line)['seq'] for line in spill_path.read_text(encoding='utf-8').splitlines()]
+    assert writer.spilled > 0 and writer.dropped == 0
+    assert sorted([entry['seq'] for entry in written] + spilled) == list(range(6))
+
+
+def test_quarantine_rows_match_registered_schema():
+    entry = {**reading(output_power='n/a', timestamp='not-a-time'), 'violation_mask': 5,
+             'violations': 'output_power:missing', 'quality_score': 0.3, 'quarantined_at': NOW.isoformat()}
+    table = build_table(QUARANTINE_TABLE, quarantine_rows([entry]))
+    row = table.to_pylist()[0]
+    assert row['output_power'] is None and row['timestamp'] is None
+    assert row['voltage'] == 500.0
+    assert telemetry_json.loads(row['raw_record'])['output_power'] == 'n/a'
+    assert (row['partition_year'], row['partition_month'], row['partition_day']) == (2026, 1, 1)
\ No newline at end of file
@@ -0,0 +1,100 @@
+"""
+Рівні зберігання історії: перенесення сирих днів в агрегати та читання через межу зберігання
+"""
+
+from datetime import date, datetime, time, timedelta, timezone
+
+import pyarrow.compute as pc
+import pytest
+
+from telemetry_retention import RetentionJob, TieredReader, tier_stores
+from telemetry_schemas import FULL_TABLE, build_table
+
+FIRST_DAY = date(2026, 1, 1)
+DAYS = 6
+TURBINES = ('TURBINE_001', 'TURBINE_002')
+# Відлік кожні 24 хвилини: 60 на добу для кожної турбіни
+STEP = timedelta(minutes=24)
+
+
+def raw_day(day):
+    start = datetime.combine(day, time(), timezone.utc)
+    return [{'record_id': f"{turbine_id}-{day}-{i}", 'turbine_id': turbine_id, 'timestamp': start + i * STEP,
+             'output_power': 1000.0 + i, 'rotor_rpm': 15.0, 'voltage': 500.0, 'current': 1500.0,
+             'power_factor': 0.9, 'wind_speed_ms': 8.0,
+             'partition_year': day.year, 'partition_month': day.month, 'partition_day': day.day}
+            for turbine_id in TURBINES for i in range(60)]
+
+
+def day_start(offset):
+    return datetime.combine(FIRST_DAY + timedelta(days=offset), time(), timezone.utc)
+
+
+@pytest.fixture
+def stores(tmp_path):
+    stores = tier_stores(str(tmp_path))
+    for offset in range(DAYS):
+        stores['raw'].replace_days(build_table(FULL_TABLE, raw_day(FIRST_DAY + timedelta(days=offset))))
+    return stores
+
+
+def days(*offsets):
+    return {FIRST_DAY + timedelta(days=offset) for offset in offsets}
+
+
+def samples(table):
+    return pc.sum(table.column('sample_count')).as_py()
+
+
+def test_recent_range_is_read_from_raw(stores):
+    tier, table = TieredReader(stores).read(day_start(0), day_start(1) - timedelta(microseconds=1))
+    assert tier == 'raw'
+    assert table.num_rows == 60 * len(TURBINES)
+
+
+def test_range_across_raw_boundary_is_stitched(stores):
+    summary = RetentionJob(stores, retention_days={'raw': 3}).run(today=FIRST_DAY + timedelta(days=DAYS))
+    assert summary['deleted']['raw'] == sorted(days(0, 1, 2))
+    assert stores['raw'].days() == days(3, 4, 5)
+
+    reader = TieredReader(stores)
+    end = day_start(DAYS) - timedelta(microseconds=1)
+    tier, table = reader.read(day_start(0), end)
+    assert tier == '1m' == reader.tier_for(day_start(0), end)
+    assert samples(table) == DAYS * 60 * len(TURBINES)
+
+    tier, table = reader.read(day_start(0), end, turbine_id='TURBINE_002')
+    assert samples(table) == DAYS * 60
+    assert set(table.column('turbine_id').to_pylist()) == {'TURBINE_002'}
+
+
+def test_range_over_all_tiers_uses_coarsest(stores):
+    today = FIRST_DAY + timedelta(days=DAYS)
+    RetentionJob(stores, retention_days={'raw': 4}).run(today=today)
+    # Наступного дня: ще один сирий день іде в 1m і 15m, найстаріші дні 1m - лише в 15m
+    RetentionJob(stores, retention_days={'raw': 4, '1m': 5}).run(today=today + timedelta(days=1))
+    assert stores['15m'].days() == days(0, 1, 2)
+    assert stores['1m'].days() == days(2)
+    assert stores['raw'].days() == days(3, 4, 5)
+
+    tier, table = TieredReader(stores).read(day_start(0), day_start(DAYS) - timedelta(microseconds=1))
+    assert tier == '15m'
+    assert samples(table) == DAYS * 60 * len(TURBINES)
+    # Відліки через 24 хв: кожен 15-хвилинний інтервал має рівно один
+    assert table.num_rows == DAYS * 60 * len(TURBINES)
+
+
+def test_rerun_does_not_double_count(stores):
+    today = FIRST_DAY + timedelta(days=DAYS)
+    job = RetentionJob(stores, retention_days={'raw': 3})
+    job.run(today=today)
+    # Збій після злиття, але до видалення сирого дня: день повертається в сирі дані
+    stores['raw'].replace_days(build_table(FULL_TABLE, raw_day(FIRST_DAY)))
+    stores['1m'].log.write_checkpoint()
+    assert 'raw:2026-01-01' in stores['1m'].merged_sources()
+
+    summary = job.run(today=today)
+    assert summary['deleted']['raw'] == [FIRST_DAY]
+    tier, table = TieredReader(stores).read(day_start(0), day_start(1) - timedelta(microseconds=1))
+    assert tier == '1m'
+    assert samples(table) == 60 * len(TURBINES)
\ No newline at end of file
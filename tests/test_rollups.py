@@ -0,0 +1,112 @@
+"""
+Агрегати у вікнах: водяні знаки по турбінах, збереження стану та upsert рядків
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from telemetry_delta_sink import read_local_table
+from telemetry_rollups import LocalRollupWriter, RollupAggregator
+from telemetry_schemas import ROLLUP_TABLES, get_schema
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def sample(turbine_id, seconds, power=1000.0):
+    return {'turbine_id': turbine_id, 'timestamp': (START + timedelta(seconds=seconds)).isoformat(),
+            'output_power': power, 'nominal_power_kw': 2000, 'operational_status': 'generating'}
+
+
+class Collector:
+    def __init__(self):
+        self.rows = []
+
+    def __call__(self, window, rows):
+        self.rows.extend(rows)
+
+    def windows(self, turbine_id):
+        return [(int((row['window_start'] - START).total_seconds()), row['sample_count'])
+                for row in self.rows if row['turbine_id'] == turbine_id]
+
+
+def aggregator(emit, **options):
+    options = {'windows': ('1m',), 'allowed_lateness': 0.0, 'idle_timeout': 3600.0, 'emit_interval': 0.0,
+               'state_path': None, **options}
+    return RollupAggregator(emit, **options)
+
+
+def test_window_closes_when_turbine_watermark_passes_its_end():
+    emitted = Collector()
+    rollups = aggregator(emitted)
+    rollups.update([sample('A', seconds) for seconds in (0, 20, 40)])
+    assert emitted.rows == []
+
+    rollups.update([sample('A', 61)])
+    assert emitted.windows('A') == [(0, 3)]
+    row = emitted.rows[0]
+    assert row['mean_power_kw'] == pytest.approx(1000.0)
+    assert row['status_generating'] == 3
+    assert rollups.open_windows() == 1
+
+
+def test_lagging_turbine_keeps_its_records():
+    emitted = Collector()
+    rollups = aggregator(emitted)
+    rollups.update([sample('A', 0), sample('B', 0)])
+    # A пішла на 10 хвилин уперед; B відстає, але її водяний знак власний
+    rollups.update([sample('A', 600)])
+    rollups.update([sample('B', 30)])
+    assert rollups.late_dropped == 0
+
+    rollups.update([sample('B', 61)])
+    assert emitted.windows('B') == [(0, 2)]
+
+
+def test_records_behind_turbine_watermark_are_dropped():
+    emitted = Collector()
+    rollups = aggregator(emitted, allowed_lateness=30.0)
+    rollups.update([sample('A', 100)])
+    rollups.update([sample('A', 80)])
+    rollups.update([sample('A', 10)])
+    assert rollups.late_dropped == 1
+    rollups.flush()
+    assert emitted.windows('A') == [(60, 2)]
+    assert emitted.rows[0]['late_samples'] == 1
+
+
+def test_idle_turbine_windows_close_on_fleet_watermark():
+    emitted = Collector()
+    rollups = aggregator(emitted, idle_timeout=300.0)
+    rollups.update([sample('A', 0), sample('B', 0)])
+    rollups.update([sample('A', 1000)])
+    assert (0, 1) in emitted.windows('B')
+
+
+def test_open_windows_continue_after_restart(tmp_path):
+    state_path = str(tmp_path / "rollup_state.json")
+    emitted = Collector()
+    first = aggregator(emitted, state_path=state_path)
+    first.update([sample('A', 0), sample('A', 20)])
+    first.close()
+    assert emitted.rows == []
+
+    second = aggregator(emitted, state_path=state_path)
+    assert second.open_windows() == 1
+    second.update([sample('A', 40), sample('A', 70)])
+    assert emitted.windows('A') == [(0, 3)]
+
+
+def test_rewritten_window_replaces_row(tmp_path):
+    writer = LocalRollupWriter(str(tmp_path), windows=('1m',))
+    for count in (2, 5):
+        rollups = aggregator(writer)
+        rollups.update([sample('A', seconds) for seconds in range(0, count * 10, 10)])
+        rollups.update([sample('B', 0)])
+        rollups.flush()
+
+    table = read_local_table(writer.tables['1m'], get_schema(ROLLUP_TABLES['1m']))
+    rows = {row['turbine_id']: row for row in table.to_pylist()}
+    assert table.num_rows == 2
+    assert rows['A']['sample_count'] == 5
+    assert rows['B']['sample_count'] == 1
\ No newline at end of file
@@ -0,0 +1,100 @@
+"""
+Локальний спул: довговічний запис, передача у сховище та пошкоджені сегменти
+"""
+
+import os
+
+import pytest
+
+from telemetry_spool import CORRUPT_SUFFIX, DONE_SUFFIX, ENTRY_HEADER, SEGMENT_SUFFIX, TelemetrySpool, read_segment
+
+
+def spooled(directory, records, **options):
+    """Спул без фонового дренера з уже записаними records ((target, record))"""
+    spool = TelemetrySpool(str(directory), **options)
+    for target, record in records:
+        spool.append(target, record)
+    return spool
+
+
+def segment_files(directory, suffix):
+    return sorted(name for name in os.listdir(directory) if name.endswith(suffix))
+
+
+def test_drain_replays_grouped_records_and_removes_segments(tmp_path):
+    spool = spooled(tmp_path, [('delta', {'i': 0}), ('blob', {'name': 'a'}), ('delta', {'i': 1})])
+    replayed = []
+    spool.replay = lambda target, records: replayed.append((target, records))
+
+    assert spool.drain_once() == 3
+    spool.close()
+
+    assert replayed == [('delta', [{'i': 0}, {'i': 1}]), ('blob', [{'name': 'a'}])]
+    assert segment_files(tmp_path, SEGMENT_SUFFIX) == []
+    assert not spool.has_pending()
+
+
+def test_records_survive_restart(tmp_path):
+    spooled(tmp_path, [('delta', {'i': i}) for i in range(3)]).close()
+
+    spool = TelemetrySpool(str(tmp_path))
+    assert spool.has_pending()
+    replayed = []
+    spool.replay = lambda target, records: replayed.extend(records)
+    spool.drain_once()
+    spool.close()
+    assert replayed == [{'i': 0}, {'i': 1}, {'i': 2}]
+
+
+def test_failed_replay_resumes_without_duplicates(tmp_path):
+    spool = spooled(tmp_path, [('delta', {'i': 0}), ('blob', {'name': 'a'})])
+    calls = []
+
+    def replay(target, records):
+        calls.append(target)
+        if target == 'blob' and calls.count('blob') == 1:
+            raise ConnectionError("blob недоступний")
+
+    spool.replay = replay
+    assert spool.drain_once() == 1
+    # Сегмент лишається, виконаний пакет delta позначений у .done
+    assert segment_files(tmp_path, SEGMENT_SUFFIX) and segment_files(tmp_path, DONE_SUFFIX)
+
+    assert spool.drain_once() == 1
+    spool.close()
+    assert calls == ['delta', 'blob', 'blob']
+    assert os.listdir(tmp_path) == []
+
+
+def test_corrupt_entry_is_skipped_and_segment_kept(tmp_path):
+    spooled(tmp_path, [('delta', {'i': i}) for i in range(4)]).close()
+    (segment,) = segment_files(tmp_path, SEGMENT_SUFFIX)
+    path = tmp_path / segment
+    data = bytearray(path.read_bytes())
+    # Псування payload другого запису та обірваний хвіст
+    first_length, _ = ENTRY_HEADER.unpack_from(data, 0)
+    data[ENTRY_HEADER.size + first_length + ENTRY_HEADER.size + 2] ^= 0xFF
+    data += b'\x07\x00'
+    path.write_bytes(bytes(data))
+
+    damaged = []
+    assert [record['i'] for _, record in read_segment(str(path), damaged)] == [0, 2, 3]
+    assert len(damaged) == 2
+
+    spool = TelemetrySpool(str(tmp_path))
+    replayed = []
+    spool.replay = lambda target, records: replayed.extend(records)
+    spool.drain_once()
+    spool.close()
+
+    assert [record['i'] for record in replayed] == [0, 2, 3]
+    assert segment_files(tmp_path, SEGMENT_SUFFIX) == []
+    assert segment_files(tmp_path, CORRUPT_SUFFIX) == [segment.replace(SEGMENT_SUFFIX, CORRUPT_SUFFIX)]
+    assert not spool.has_pending()
+
+
+def test_full_spool_applies_backpressure(tmp_path):
+    spool = spooled(tmp_path, [('delta', {'i': 0})], max_total_bytes=64)
+    with pytest.raises(TimeoutError):
+        spool.append('delta', {'i': 1, 'payload': 'x' * 64}, timeout=0.05)
+    spool.close()
\ No newline at end of file
@@ -1,11 +1,15 @@
+import argparse
 import asyncio
 import json
-import random
 import time
 from datetime import datetime
 from azure.iot.device.aio import IoTHubDeviceClient
 from azure.iot.device import Message
 
+from telemetry_codec import JSON, encode_message, negotiate
+from telemetry_generator import turbine_rng
+from telemetry_transports import BatchingSender, create_transport
+
 TELEMETRY_MIN_INTERVAL = 6
 TELEMETRY_MAX_INTERVAL = 56
 MAX_VARIATION = 0.1  # 10% максимальна варіація між відліками
@@ -21,9 +25,16 @@ SENSOR_RANGES = {
 }
 
 class TurbineSimulator:
-    def __init__(self, turbine_id, connection_string):
+    def __init__(self, turbine_id, connection_string=None, sender: BatchingSender = None, seed=None,
+                 content_type=JSON):
         self.turbine_id = turbine_id
+        # Формат тіла повідомлення (JSON, msgpack, Arrow IPC); споживач обирає декодер за contentType
+        self.content_type = negotiate(content_type)
+        # Власний потік випадкових чисел турбіни: з seed симуляція відтворювана
+        self.rng = turbine_rng(seed, turbine_id)
         self.connection_string = connection_string
+        # Шлюзовий режим: спільний пакетний відправник замість власного клієнта IoT Hub
+        self.sender = sender
         self.client = None
         self.previous_values = {}
         self.is_running = False
@@ -38,7 +49,7 @@ class TurbineSimulator:
             # Початкові значення близько до типових
             typical = config['typical']
             variation = typical * 0.2  # 20% варіація від типового
-            initial_value = random.uniform(typical - variation, typical + variation)
+            initial_value = float(self.rng.uniform(typical - variation, typical + variation))
             
             # Обмеження в межах допустимого діапазону
             initial_value = max(config['min'], min(config['max'], initial_value))
@@ -61,10 +72,10 @@ class TurbineSimulator:
                 min_val = max(config['min'], prev_value - variation)
                 max_val = min(config['max'], prev_value + variation)
                 
-                new_value = random.uniform(min_val, max_val)
+                new_value = float(self.rng.uniform(min_val, max_val))
             else:
                 # Якщо немає попереднього значення, генеруємо нове
-                new_value = random.uniform(config['min'], config['max'])
+                new_value = float(self.rng.uniform(config['min'], config['max']))
             
             # Округлення для кращого вигляду
             if param == 'power_factor':
@@ -97,12 +108,14 @@ class TurbineSimulator:
         
         # max_power_limit має бути більшим за поточну потужність
         if data['max_power_limit'] < data['output_power']:
-            data['max_power_limit'] = data['output_power'] * random.uniform(1.1, 1.3)
+            data['max_power_limit'] = data['output_power'] * float(self.rng.uniform(1.1, 1.3))
             data['max_power_limit'] = round(data['max_power_limit'], 1)
             self.previous_values['max_power_limit'] = data['max_power_limit']
     
     async def connect(self):
         """Підключення до IoT Hub"""
+        if self.sender is not None:
+            return True
         try:
             self.client = IoTHubDeviceClient.create_from_connection_string(self.connection_string)
             await self.client.connect()
@@ -120,10 +133,14 @@ class TurbineSimulator:
     
     async def send_telemetry(self, data):
         """Відправка телеметрії в IoT Hub"""
+        if self.sender is not None:
+            await self.sender.submit(data)
+            return True
         try:
-            message = Message(json.dumps(data))
-            message.content_encoding = "utf-8"
-            message.content_type = "application/json" # Використовує MQTT
+            message = Message(encode_message(data, self.content_type))
+            if self.content_type == JSON:
+                message.content_encoding = "utf-8"
+            message.content_type = self.content_type # Використовує MQTT
             
             await self.client.send_message(message)
             print(f" {self.turbine_id}: Відправлено телеметрію - Power: {data['output_power']}kW, RPM: {data['rotor_rpm']}")
@@ -134,7 +151,7 @@ class TurbineSimulator:
     
     def get_next_interval(self):
         """Генерація випадкового інтервалу передачі"""
-        return random.randint(TELEMETRY_MIN_INTERVAL, TELEMETRY_MAX_INTERVAL)
+        return int(self.rng.integers(TELEMETRY_MIN_INTERVAL, TELEMETRY_MAX_INTERVAL + 1))
     
     async def run_simulation(self):
         """Головний цикл симуляції"""
@@ -142,7 +159,8 @@ class TurbineSimulator:
             return
         
         self.is_running = True
-        print(f" {self.turbine_id}: Розпочато симуляцію телеметрії")
+        if self.sender is None:
+            print(f" {self.turbine_id}: Розпочато симуляцію телеметрії")
         
         try:
             while self.is_running:
@@ -152,7 +170,8 @@ class TurbineSimulator:
                 
                 # Чекання до наступної передачі
                 next_interval = self.get_next_interval()
-                print(f" {self.turbine_id}: Наступна передача через {next_interval} секунд")
+                if self.sender is None:
+                    print(f" {self.turbine_id}: Наступна передача через {next_interval} секунд")
                 await asyncio.sleep(next_interval)
                 
         except KeyboardInterrupt:
@@ -175,13 +194,9 @@ async def run_multiple_turbines():
     
     # Створення симуляторів для всіх турбін
     simulators = []
-    for i in range(1, 8):  # TURBINE_001 до TURBINE_007
-        turbine_id = f"TURBINE_{str(i).zfill(3)}"
-        if turbine_id in connections:
-            simulator = TurbineSimulator(turbine_id, connections[turbine_id])
-            simulators.append(simulator)
-        else:
-            print(f" Connection string для {turbine_id} не знайдено")
+    for turbine_id in sorted(key for key in connections if key.startswith('TURBINE_')):
+        simulator = TurbineSimulator(turbine_id, connections[turbine_id])
+        simulators.append(simulator)
     
     if not simulators:
         print(" Жодного симулятора не створено!")
@@ -203,7 +218,43 @@ async def run_multiple_turbines():
         for simulator in simulators:
             simulator.is_running = False
 
+async def run_gateway_turbines(transport_spec, turbine_count, pool_size=2, max_batch=500, max_delay=0.5,
+                               content_type=JSON):
+    """Шлюзовий режим: багато турбін відправляють пакетами через невеликий пул з'єднань"""
+    transport = create_transport(transport_spec, pool_size, content_type)
+    sender = await BatchingSender(transport, max_batch, max_delay).start()
+    simulators = [
+        TurbineSimulator(f"TURBINE_{str(i).zfill(3)}", sender=sender)
+        for i in range(1, turbine_count + 1)
+    ]
+    
+    print(f" Запуск {len(simulators)} симуляторів через шлюз {transport_spec} (пакети до {max_batch})")
+    print("Ctrl+C для зупинки\n")
+    
+    try:
+        await asyncio.gather(*(simulator.run_simulation() for simulator in simulators))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        print("\n Зупинка всіх симуляторів...")
+    finally:
+        for simulator in simulators:
+            simulator.is_running = False
+        await sender.close()
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Симулятор вітрових турбін")
+    parser.add_argument('--gateway', default=None,
+                        help="шлюзовий режим: file:шлях, socket:хост:порт, mqtt:хост:порт[/топік], iothub:all_connections.json")
+    parser.add_argument('--turbines', type=int, default=1000, help="кількість турбін у шлюзовому режимі")
+    parser.add_argument('--pool-size', type=int, default=2, help="кількість з'єднань шлюзу")
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--encoding', choices=['json', 'msgpack', 'arrow'], default='json',
+                        help="формат тіла повідомлень (arrow - пакети Arrow IPC у шлюзовому режимі)")
+    args = parser.parse_args()
+    
     print(" Симулятор вітрових турбін - Варіант 3: Електричні параметри")
     print("=" * 70)
-    asyncio.run(run_multiple_turbines())
\ No newline at end of file
+    if args.gateway:
+        asyncio.run(run_gateway_turbines(args.gateway, args.turbines, args.pool_size, args.batch_size,
+                                         content_type=args.encoding))
+    else:
+        asyncio.run(run_multiple_turbines())
\ No newline at end of file